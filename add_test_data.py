@@ -1,4 +1,6 @@
-from app import app, db, User, Post
+from app import create_app, db, User, Post
+
+app = create_app()
 from passlib.hash import sha256_crypt
 from datetime import datetime
 
@@ -1,23 +1,171 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, render_template, redirect, url_for, request, flash, abort, jsonify
+from flask import Flask, Blueprint, current_app, render_template, stream_with_context, redirect, url_for, request, flash, abort, jsonify, make_response, session, send_from_directory, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, BooleanField, RadioField
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, BooleanField, RadioField, SelectField
 from wtforms.validators import InputRequired, Length, EqualTo
-from passlib.hash import sha256_crypt
+from sqlalchemy import func, case, event, inspect, text, tuple_, select, delete, table, column, bindparam, literal_column
+from sqlalchemy.orm import joinedload, defer, validates
+from markupsafe import Markup
+import click
+import hmac
+import math
+import mimetypes
 import os
-from datetime import datetime
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import partial, wraps
+from werkzeug.http import http_date
+from werkzeug.middleware.proxy_fix import ProxyFix
+import archive
+import fulltext
+import migrations
+import ranking
+import rendering
+from pagecache import PageCache
+from avatars import AvatarProcessor, avatar_filename, image_format, is_digest
+from passwords import PasswordHasher, HasherBusy
+import dbengine
+import assets
+from compression import ResponseCompressor
+from metrics import Metrics, Sampler, dump_stacks
+from broadcast import Broadcaster
+from ratelimit import RateLimiter, MemoryStore, SQLiteStore, RateLimited, Overloaded, queue_seconds
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///blog.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+DEFAULT_AVATAR_URL = 'https://huohuo90.com/images/avatar.png'
 
-db = SQLAlchemy(app)
+# 列表页摘要长度（字符），与迁移中回填摘要的规则共用
+EXCERPT_LENGTH = rendering.EXCERPT_LENGTH
+
+db = SQLAlchemy()
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'blog.login'
+bp = Blueprint('blog', __name__, cli_group=None)
+
+# 应用工厂：每个 worker 进程调用一次。这里不访问数据库、不导入 PIL 等重量级模块，
+# 建表和初始数据由 flask --app app bootstrap 在部署时执行一次
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your-secret-key'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///blog.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # 数据库引擎配置档（见 dbengine.PROFILES）：production 启用 WAL 和连接池，default 为驱动默认设置
+    app.config['DATABASE_PROFILE'] = os.environ.get('DATABASE_PROFILE', 'production')
+    app.config['POSTS_PER_PAGE'] = 20
+    app.config['SEARCH_RESULTS_PER_PAGE'] = 20
+    # 管理面板：表格每页行数和仪表盘统计的天数
+    app.config['ADMIN_PER_PAGE'] = 50
+    app.config['ADMIN_ACTIVITY_DAYS'] = 30
+    # 订阅源（RSS / Atom / JSON Feed）的文章数，站点地图每页覆盖的文章 id 区间大小
+    app.config['FEED_ITEMS'] = 20
+    app.config['SITEMAP_PAGE_SIZE'] = 5000
+    app.config['PAGE_CACHE_MAX_BYTES'] = 32 * 1024 * 1024
+    # 请求带上 ?nocache=1 时跳过页面缓存，便于调试
+    app.config['PAGE_CACHE_BYPASS_PARAM'] = 'nocache'
+    app.config['AVATAR_FOLDER'] = os.path.join(app.root_path, 'static', 'profile_pics')
+    app.config['AVATAR_MAX_BYTES'] = 5 * 1024 * 1024
+
+    # 密码哈希：新密码使用的算法和轮数，旧哈希在登录成功时自动升级
+    app.config['PASSWORD_HASH_SCHEME'] = 'sha256_crypt'
+    app.config['PASSWORD_HASH_ROUNDS'] = 535000
+    # 哈希进程数（0 表示在请求线程内计算）、同时提交给进程池的最大任务数和等待名额的超时（秒）。
+    # 超出 MAX_IN_FLIGHT 的请求在请求线程中阻塞等待，不是排队上限
+    app.config['PASSWORD_HASH_WORKERS'] = 2
+    app.config['PASSWORD_HASH_MAX_IN_FLIGHT'] = 16
+    app.config['PASSWORD_HASH_TIMEOUT'] = 5.0
+    # 限流（令牌桶，格式为 "次数/second|minute|hour|day"）：ip 按客户端地址、user 按登录用户计数，只限制提交请求。
+    # 部署在反向代理之后时需要设置 PROXY_FIX_HOPS，让 request.remote_addr 为真实客户端地址
+    app.config['RATE_LIMIT_ENABLED'] = True
+    app.config['RATE_LIMITS'] = {
+        'login': {'ip': '10/minute'},
+        'register': {'ip': '10/hour'},
+        'comment': {'ip': '30/minute', 'user': '10/minute'},
+        'preferences': {'user': '30/minute'},
+    }
+    # 限流状态的存储：memory 保存在进程内，sqlite 保存在 RATE_LIMIT_SQLITE_PATH，多个 worker 共享限额
+    app.config['RATE_LIMIT_STORAGE'] = os.environ.get('RATE_LIMIT_STORAGE', 'memory')
+    app.config['RATE_LIMIT_SQLITE_PATH'] = os.path.join(app.instance_path, 'ratelimit.db')
+    # 降载：请求排队（按反向代理写入的 X-Request-Start 头计算）超过该秒数时拒绝受限流的写请求，None 表示关闭
+    app.config['LOAD_SHED_QUEUE_SECONDS'] = 2.0
+    # 列表页边渲染边发送，每累计 STREAM_CHUNK_SIZE 字节刷新一次；关闭后整页渲染完再发送
+    app.config['STREAM_TEMPLATES'] = True
+    app.config['STREAM_CHUNK_SIZE'] = 8192
+    # 响应压缩：按 Accept-Encoding 压缩 HTML、JSON 和订阅源，小于 COMPRESS_MIN_SIZE 字节的响应不压缩
+    app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json', 'application/xml',
+                                        'application/rss+xml', 'application/atom+xml', 'application/feed+json']
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['COMPRESS_BROTLI_QUALITY'] = 5
+    # 评论实时推送（SSE）：空闲连接的心跳间隔（秒）和单个进程的最大订阅数
+    app.config['SSE_HEARTBEAT_SECONDS'] = 15
+    app.config['SSE_MAX_SUBSCRIBERS'] = 5000
+    # 反向代理的层数：大于 0 时用 ProxyFix 按 X-Forwarded-For / X-Forwarded-Proto 取真实客户端地址，0 表示直接对外服务
+    app.config['PROXY_FIX_HOPS'] = int(os.environ.get('PROXY_FIX_HOPS', '0'))
+    # 性能指标（/metrics）：管理员、带 "Authorization: Bearer <METRICS_TOKEN>" 的请求，或直接来自 METRICS_ALLOWED_IPS 的请求可以访问。
+    # 未设置 PROXY_FIX_HOPS 时带转发头的请求来自代理，remote_addr 是代理的地址，不按地址放行。超过阈值的请求和 SQL 写入日志
+    app.config['METRICS_ALLOWED_IPS'] = ['127.0.0.1', '::1']
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+    app.config['METRICS_SLOW_REQUEST_SECONDS'] = 1.0
+    app.config['METRICS_SLOW_QUERY_SECONDS'] = 0.1
+    # 采样分析器默认关闭（环境变量 PROFILER_ENABLED=1 开启），耗时超过 PROFILER_THRESHOLD 秒的请求按路由保存调用栈
+    app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED') == '1'
+    app.config['PROFILER_INTERVAL'] = 0.005
+    app.config['PROFILER_THRESHOLD'] = 0.5
+    app.config['PROFILER_FOLDER'] = os.path.join(app.instance_path, 'profiles')
+    if config:
+        app.config.update(config)
+    if app.config['PROXY_FIX_HOPS']:
+        hops = app.config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', dbengine.engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], app.config['DATABASE_PROFILE']))
+
+    db.init_app(app)
+    with app.app_context():
+        dbengine.install_pragmas(db.engine, app.config['DATABASE_PROFILE'])
+        # 热度增量更新用到的 SQL 函数（见 ranking.py）
+        event.listen(db.engine, 'connect', ranking.register_functions)
+        event.listen(db.engine, 'before_cursor_execute', start_query_timer)
+        event.listen(db.engine, 'after_cursor_execute', record_query)
+    login_manager.init_app(app)
+
+    # 以下对象都是按需启动的：进程池、线程池在第一次使用时才创建，预派生的 worker 各自拥有一份
+    os.makedirs(app.instance_path, exist_ok=True)
+    app.extensions['password_hasher'] = PasswordHasher(
+        scheme=app.config['PASSWORD_HASH_SCHEME'],
+        rounds=app.config['PASSWORD_HASH_ROUNDS'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_in_flight=app.config['PASSWORD_HASH_MAX_IN_FLIGHT'],
+        timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+    )
+    app.extensions['page_cache'] = PageCache(app.config['PAGE_CACHE_MAX_BYTES'],
+                                             os.path.join(app.instance_path, 'page_cache.log'))
+    app.extensions['compressor'] = ResponseCompressor(
+        app.config['COMPRESS_MIMETYPES'],
+        min_size=app.config['COMPRESS_MIN_SIZE'],
+        gzip_level=app.config['COMPRESS_LEVEL'],
+        brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+    )
+    app.extensions['metrics'] = Metrics()
+    if app.config['RATE_LIMIT_STORAGE'] == 'sqlite':
+        rate_limit_store = SQLiteStore(app.config['RATE_LIMIT_SQLITE_PATH'])
+    else:
+        rate_limit_store = MemoryStore()
+    app.extensions['rate_limiter'] = RateLimiter(rate_limit_store, app.config['RATE_LIMITS'])
+    app.extensions['broadcaster'] = Broadcaster(max_subscribers=app.config['SSE_MAX_SUBSCRIBERS'])
+    if app.config['PROFILER_ENABLED']:
+        app.extensions['sampler'] = Sampler(app.config['PROFILER_INTERVAL'])
+    app.extensions['avatar_processor'] = AvatarProcessor(app.config['AVATAR_FOLDER'], partial(apply_avatar, app))
+
+    # 静态资源：模板中的 url_for('static', ...) 按构建清单解析为带摘要的文件名（见 assets.py）
+    app.extensions['asset_manifest'] = assets.load_manifest(app.static_folder)
+    app.view_functions['static'] = static_file
+
+    app.register_blueprint(bp)
+    return app
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -25,6 +173,11 @@ def load_user(user_id):
 
 # 数据库模型
 class User(UserMixin, db.Model):
+    __table_args__ = (
+        db.Index('ix_user_username_nocase', text('username COLLATE NOCASE')),
+        db.Index('ix_user_post_count', 'post_count'),
+        db.Index('ix_user_comment_count', 'comment_count'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), unique=True, nullable=False)
     password = db.Column(db.String(100), nullable=False)
@@ -34,6 +187,14 @@ class User(UserMixin, db.Model):
     blur_effect_enabled = db.Column(db.Boolean, default=True)
     posts = db.relationship('Post', backref='author', lazy=True)
     comments = db.relationship('Comment', backref='author', lazy=True)
+    post_count = db.Column(db.Integer, nullable=False, default=0)
+    comment_count = db.Column(db.Integer, nullable=False, default=0)
+    # 作者的文章收到的评论数，个人主页的“评论”统计；数据库默认值的用途同 Post.hot_score
+    received_comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @property
+    def is_admin(self):
+        return self.username == 'admin'
 
 class Theme(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -47,6 +208,13 @@ class Theme(db.Model):
     text_secondary = db.Column(db.String(20), nullable=False)
 
 class Post(db.Model):
+    __table_args__ = (
+        db.Index('ix_post_date_posted_id', 'date_posted', 'id'),
+        db.Index('ix_post_user_id_date_posted', 'user_id', 'date_posted', 'id'),
+        db.Index('ix_post_title_nocase', text('title COLLATE NOCASE')),
+        db.Index('ix_post_hot_score_id', 'hot_score', 'id'),
+        db.Index('ix_post_comment_count_id', 'comment_count', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -54,8 +222,39 @@ class Post(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     comment_count = db.Column(db.Integer, default=0)
+    excerpt = db.Column(db.Text)
+    content_html = db.Column(db.Text)
+    renderer_version = db.Column(db.Integer)
+    # 热度（见 ranking.py），随评论的增删在同一事务中增量更新。
+    # 与迁移添加的列一样带数据库默认值，导入没有该列的旧版本归档时可以省略，导入后重新计算
+    hot_score = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+
+    # 正文写入时同步生成摘要和渲染后的 HTML，列表页和详情页都无需处理正文
+    @validates('content')
+    def validate_content(self, key, content):
+        self.excerpt = make_excerpt(content)
+        self.content_html = str(rendering.render(content))
+        self.renderer_version = rendering.RENDERER_VERSION
+        return content
+
+    # 渲染规则升级后、批量重新渲染之前，旧版本的文章按新规则临时渲染
+    @property
+    def body_html(self):
+        if self.renderer_version != rendering.RENDERER_VERSION or self.content_html is None:
+            return rendering.render(self.content)
+        return Markup(self.content_html)
+
+def make_excerpt(content):
+    if len(content) > EXCERPT_LENGTH:
+        return content[:EXCERPT_LENGTH] + '...'
+    return content
 
 class Comment(db.Model):
+    __table_args__ = (
+        db.Index('ix_comment_post_id_pinned', 'post_id', 'is_pinned', 'date_posted'),
+        db.Index('ix_comment_user_id', 'user_id'),
+        db.Index('ix_comment_date_posted', 'date_posted', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     date_posted = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -100,69 +299,411 @@ class PasswordForm(FlaskForm):
     confirm_new_password = PasswordField('确认新密码', validators=[InputRequired(), EqualTo('new_password')])
     submit = SubmitField('修改密码')
 
+class BulkCommentForm(FlaskForm):
+    action = SelectField('批量操作', choices=[('delete', '删除'), ('pin', '置顶'), ('unpin', '取消置顶')])
+    submit = SubmitField('执行')
+
+class RemovePostsForm(FlaskForm):
+    submit = SubmitField('删除全部文章')
+
 class CommentForm(FlaskForm):
     content = TextAreaField('评论内容', validators=[InputRequired(), Length(min=1, max=500)])
     submit = SubmitField('发表评论')
 
+# 游标分页：按 (排序列, id) 定位，翻到任意深度的代价都与第一页相同
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+# 文章列表的排序方式：(排序列, 游标中排序值的编码函数, 解码函数)，都以 id 作为第二排序键，降序排列
+FeedOrder = namedtuple('FeedOrder', ['column', 'encode', 'decode'])
+FEED_ORDERS = {
+    'new': FeedOrder(Post.date_posted, lambda value: value.strftime(CURSOR_FORMAT),
+                     lambda value: datetime.strptime(value, CURSOR_FORMAT)),
+    # repr 保留浮点数的全部精度，解码后与数据库中的值完全相等
+    'hot': FeedOrder(Post.hot_score, repr, float),
+    'discussed': FeedOrder(Post.comment_count, str, int),
+}
+
+def encode_cursor(post, sort='new'):
+    order = FEED_ORDERS[sort]
+    return '%s_%d' % (order.encode(getattr(post, order.column.key)), post.id)
+
+def decode_cursor(cursor, sort='new'):
+    try:
+        value, post_id = cursor.rsplit('_', 1)
+        return FEED_ORDERS[sort].decode(value), int(post_id)
+    except ValueError:
+        abort(400)
+
+class CursorPage:
+    def __init__(self, items, has_older, has_newer, sort='new'):
+        self.items = items
+        self.sort = sort
+        self.has_older = has_older and bool(items)
+        self.has_newer = has_newer and bool(items)
+        self.older_cursor = encode_cursor(items[-1], sort) if self.has_older else None
+        self.newer_cursor = encode_cursor(items[0], sort) if self.has_newer else None
+
+# ?before=<游标> 取排在后面（更早）的文章，?after=<游标> 取排在前面（更新）的文章
+def paginate_posts(query, per_page=None, sort='new'):
+    per_page = per_page or current_app.config['POSTS_PER_PAGE']
+    before = request.args.get('before')
+    after = request.args.get('after')
+    column = FEED_ORDERS[sort].column
+
+    # 使用行值比较，SQLite 才能在 (排序列, id) 索引上做范围查找
+    if after:
+        value, post_id = decode_cursor(after, sort)
+        query = query.filter(tuple_(column, Post.id) > (value, post_id))
+        rows = query.order_by(column.asc(), Post.id.asc()).limit(per_page + 1).all()
+        return CursorPage(rows[:per_page][::-1], has_older=True, has_newer=len(rows) > per_page, sort=sort)
+
+    if before:
+        value, post_id = decode_cursor(before, sort)
+        query = query.filter(tuple_(column, Post.id) < (value, post_id))
+    rows = query.order_by(column.desc(), Post.id.desc()).limit(per_page + 1).all()
+    return CursorPage(rows[:per_page], has_older=len(rows) > per_page, has_newer=bool(before), sort=sort)
+
+# 社区文章流：?sort=hot 按热度、?sort=discussed 按评论数排序，默认按发布时间
+def feed_sort():
+    sort = request.args.get('sort', 'new')
+    return sort if sort in FEED_ORDERS else 'new'
+
+# 列表页一次性取出作者，避免模板逐条懒加载；正文只在详情页读取
+def feed_query():
+    return Post.query.options(joinedload(Post.author), defer(Post.content), defer(Post.content_html))
+
+def detail_query():
+    return Post.query.options(joinedload(Post.author), defer(Post.content))
+
+def post_to_dict(post):
+    return {
+        'id': post.id,
+        'title': post.title,
+        'excerpt': post.excerpt or '',
+        'date_posted': post.date_posted.isoformat(),
+        'comment_count': post.comment_count or 0,
+        'author': {'id': post.author.id, 'username': post.author.username, 'avatar_url': avatar_url(post.author)},
+        'url': url_for('blog.community_post', post_id=post.id),
+        'author_url': url_for('blog.user_profile', user_id=post.author.id),
+    }
+
+def comment_to_dict(comment):
+    return {
+        'id': comment.id,
+        'post_id': comment.post_id,
+        'content': comment.content,
+        'date_posted': comment.date_posted.isoformat(),
+        'is_pinned': bool(comment.is_pinned),
+        'author': {'id': comment.author.id, 'username': comment.author.username,
+                   'avatar_url': avatar_url(comment.author, 'comment')},
+        'author_url': url_for('blog.user_profile', user_id=comment.author.id),
+    }
+
+# 密码哈希进程池排队已满
+@bp.app_errorhandler(HasherBusy)
+def hasher_busy(error):
+    response = make_response('服务器繁忙，请稍后再试', 503)
+    response.headers['Retry-After'] = '5'
+    return response
+
+# 限流和降载：只检查提交（POST）请求，浏览页面不消耗令牌
+def rate_limited(scope):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'POST':
+                admit_write(scope)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def admit_write(scope):
+    config = current_app.config
+    metrics = current_app.extensions['metrics']
+    header = request.headers.get('X-Request-Start')
+    if header and config['LOAD_SHED_QUEUE_SECONDS'] is not None:
+        waited = queue_seconds(header, time.time())
+        if waited is not None and waited > config['LOAD_SHED_QUEUE_SECONDS']:
+            metrics.count_rejected('overload', scope)
+            raise Overloaded()
+    if not config['RATE_LIMIT_ENABLED']:
+        return
+    identities = {'ip': request.remote_addr, 'user': current_user.id if current_user.is_authenticated else None}
+    wait = current_app.extensions['rate_limiter'].hit(scope, identities)
+    if wait:
+        metrics.count_rejected('rate_limit', scope)
+        raise RateLimited(wait)
+
+def rejection_response(message, status, retry_after):
+    # API 请求返回 JSON，表单提交返回文本
+    if request.is_json or request.path.startswith('/api/'):
+        response = jsonify({'status': 'error', 'message': message})
+        response.status_code = status
+    else:
+        response = make_response(message, status)
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@bp.app_errorhandler(RateLimited)
+def too_many_requests(error):
+    return rejection_response('请求过于频繁，请稍后再试', 429, math.ceil(error.retry_after))
+
+@bp.app_errorhandler(Overloaded)
+def overloaded(error):
+    return rejection_response('服务器繁忙，请稍后再试', 503, 5)
+
+# 头像：后台处理完成后替换用户头像，并清理不再被引用的旧文件
+def apply_avatar(app, user_id, digest, ensure_files):
+    with app.app_context():
+        user = User.query.get(user_id)
+        if user is None or user.profile_picture == digest:
+            return
+        old = user.profile_picture
+        user.profile_picture = digest
+        # flush 取得数据库写锁，直到提交都没有其他进程能修改头像引用：在此期间确认新头像的文件存在、
+        # 旧头像无人使用后再删除，其他用户同时换用被清理的头像时不会引用到已删除的文件
+        db.session.flush()
+        ensure_files()
+        if old and old != 'default.jpg' and not User.query.filter_by(profile_picture=old).first():
+            app.extensions['avatar_processor'].remove(old)
+        db.session.commit()
+
+@bp.app_template_global()
+def avatar_url(user, size='feed'):
+    name = user.profile_picture
+    if not name or name == 'default.jpg':
+        return DEFAULT_AVATAR_URL
+    if is_digest(name):
+        return url_for('blog.avatar', filename=avatar_filename(name, size))
+    return url_for('static', filename='profile_pics/' + name)
+
+@bp.app_url_defaults
+def hashed_static_url(endpoint, values):
+    if endpoint == 'static':
+        hashed = current_app.extensions['asset_manifest'].get(values.get('filename'))
+        if hashed:
+            values['filename'] = hashed
+
+# 带摘要的静态资源内容不会变化，可以长期缓存；按 Accept-Encoding 返回预先压缩的版本
+def static_file(filename):
+    if not assets.is_hashed(filename):
+        return current_app.send_static_file(filename)
+    encoding, path = assets.pick_encoding(current_app.static_folder, filename, request.accept_encodings)
+    response = send_from_directory(current_app.static_folder, path, max_age=365 * 24 * 3600,
+                                   mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+# 头像文件按内容命名，内容不会变化，可以长期缓存
+@bp.route('/avatars/<path:filename>')
+def avatar(filename):
+    response = send_from_directory(current_app.config['AVATAR_FOLDER'], filename, max_age=365 * 24 * 3600)
+    response.cache_control.immutable = True
+    return response
+
+# 流式渲染：页头和前几篇文章渲染完就发送，首字节时间不随页面长度增加
+def stream_page(template_name, **context):
+    app = current_app._get_current_object()
+    if not app.config['STREAM_TEMPLATES']:
+        return render_template(template_name, **context)
+    app.update_template_context(context)
+    template = app.jinja_env.get_or_select_template(template_name)
+    chunks = buffered(template.generate(context), app.config['STREAM_CHUNK_SIZE'])
+    return app.response_class(stream_with_context(chunks), mimetype='text/html')
+
+def buffered(chunks, size):
+    # Jinja 每个模板语句产生一小段文本，合并后再发送，减少系统调用和压缩开销
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+# 性能指标：请求开始时计时，SQL 事件把次数和耗时累加到当前请求，请求上下文结束时记录
+# 流式响应的上下文在发送完毕后才结束，因此耗时包括整个响应的发送时间
+@bp.before_app_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.sql_queries, g.sql_seconds, g.slowest_query = 0, 0.0, (0.0, None)
+    sampler = current_app.extensions.get('sampler')
+    if sampler is not None:
+        sampler.start(threading.get_ident())
+
+@bp.after_app_request
+def remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+@bp.teardown_app_request
+def finish_request_metrics(error):
+    if 'request_started' not in g:
+        return
+    elapsed = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or 'unknown'
+    config = current_app.config
+    metrics = current_app.extensions['metrics']
+    metrics.observe_request(endpoint, request.method, g.get('response_status', 500), elapsed,
+                            g.sql_queries, g.sql_seconds)
+    if elapsed >= config['METRICS_SLOW_REQUEST_SECONDS']:
+        metrics.count_slow('requests')
+        query_seconds, statement = g.slowest_query
+        current_app.logger.warning('慢请求 %.3f 秒：%s %s，%d 条 SQL 共 %.3f 秒，最慢 %.3f 秒：%s',
+                                   elapsed, request.method, request.full_path, g.sql_queries, g.sql_seconds,
+                                   query_seconds, statement)
+    sampler = current_app.extensions.get('sampler')
+    if sampler is not None:
+        stacks = sampler.stop(threading.get_ident())
+        if stacks and elapsed >= config['PROFILER_THRESHOLD']:
+            dump_stacks(config['PROFILER_FOLDER'], endpoint, stacks)
+
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context() or 'request_started' not in g:
+        return
+    elapsed = time.perf_counter() - context.query_started
+    g.sql_queries += 1
+    g.sql_seconds += elapsed
+    if elapsed > g.slowest_query[0]:
+        g.slowest_query = (elapsed, statement)
+    if elapsed >= current_app.config['METRICS_SLOW_QUERY_SECONDS']:
+        current_app.extensions['metrics'].count_slow('queries')
+        # 只记录 SQL 文本，参数中可能有密码哈希等敏感数据
+        current_app.logger.warning('慢查询 %.3f 秒（%s）：%s', elapsed, request.endpoint, statement)
+
+@bp.after_app_request
+def compress_response(response):
+    return current_app.extensions['compressor'].compress(request, response)
+
+# 匿名访问的页面整页缓存，并支持 ETag / Last-Modified 条件请求
+# tags 根据视图参数给出缓存标签，写操作提交后按标签失效（见 invalidate_page_cache）
+def cached_page(tags):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            bypass = request.args.get(current_app.config['PAGE_CACHE_BYPASS_PARAM']) == '1'
+            if request.method != 'GET' or bypass or current_user.is_authenticated or session.get('_flashes'):
+                response = make_response(view(**kwargs))
+                if bypass:
+                    response.headers['X-Cache'] = 'BYPASS'
+                return response
+
+            key = request.full_path
+            page_cache = current_app.extensions['page_cache']
+            entry = page_cache.get(key)
+            status = 'HIT'
+            if entry is None:
+                generation = page_cache.generation
+                rendered = make_response(view(**kwargs))
+                if rendered.status_code != 200:
+                    return rendered
+                if rendered.is_streamed:
+                    # 流式响应边发送边收集，完整发送后再写入缓存
+                    rendered.response = tee_to_cache(rendered.iter_encoded(), rendered.response, page_cache, key,
+                                                     rendered.mimetype, tags(**kwargs), generation)
+                    rendered.headers['Cache-Control'] = 'no-cache'
+                    rendered.headers['X-Cache'] = 'MISS'
+                    rendered.vary.add('Cookie')
+                    return rendered
+                entry = page_cache.set(key, rendered.get_data(), rendered.mimetype, tags(**kwargs), generation)
+                status = 'MISS'
+
+            response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+            response.set_etag(entry.etag)
+            response.last_modified = entry.last_modified
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Cache'] = status
+            response.vary.add('Cookie')
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+def tee_to_cache(chunks, source, page_cache, key, mimetype, tags, generation):
+    body = []
+    try:
+        for chunk in chunks:
+            body.append(chunk)
+            yield chunk
+    finally:
+        close = getattr(source, 'close', None)
+        if close is not None:
+            close()
+    # 客户端中途断开时不会执行到这里，不完整的页面不会进入缓存
+    page_cache.set(key, b''.join(body), mimetype, tags, generation)
+
+def feed_tags(**kwargs):
+    return ['feed']
+
+def post_tags(post_id):
+    return ['post:%d' % post_id]
+
 # 路由
-@app.route('/')
-@app.route('/home')
+@bp.route('/')
+@bp.route('/home')
+@cached_page(feed_tags)
 def home():
     if current_user.is_authenticated:
-        posts = Post.query.filter_by(author=current_user).order_by(Post.date_posted.desc()).all()
+        query = feed_query().filter_by(author=current_user)
     else:
-        posts = Post.query.order_by(Post.date_posted.desc()).all()
-    return render_template('index.html', posts=posts)
+        query = feed_query()
+    page = paginate_posts(query)
+    return stream_page('index.html', posts=page.items, page=page)
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
+@rate_limited('register')
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('blog.home'))
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = sha256_crypt.hash(form.password.data)
+        hashed_password = current_app.extensions['password_hasher'].hash(form.password.data)
         user = User(username=form.username.data, password=hashed_password)
         db.session.add(user)
         db.session.commit()
         flash('Your account has been created! You are now able to log in', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('blog.login'))
     return render_template('register.html', form=form)
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
+@rate_limited('login')
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('home'))
+        return redirect(url_for('blog.home'))
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and sha256_crypt.verify(form.password.data, user.password):
+        verified, new_hash = current_app.extensions['password_hasher'].verify_and_update(form.password.data, user.password) if user else (False, None)
+        if verified:
+            # 旧算法或轮数不足的哈希在登录成功时升级
+            if new_hash:
+                user.password = new_hash
+                db.session.commit()
             login_user(user)
-            return redirect(url_for('home'))
+            return redirect(url_for('blog.home'))
         else:
             flash('Login Unsuccessful. Please check username and password', 'danger')
     return render_template('login.html', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     logout_user()
     flash('You have been logged out.', 'success')
-    return redirect(url_for('home'))
+    return redirect(url_for('blog.home'))
 
-@app.route('/settings', methods=['GET', 'POST'])
+@bp.route('/settings', methods=['GET', 'POST'])
 @login_required
 def settings():
     settings_form = SettingsForm(prefix='settings')
     password_form = PasswordForm(prefix='password')
     
-    import secrets
-    import os
-    from PIL import Image
-    
-    # 头像保存路径
-    UPLOAD_FOLDER = 'static/profile_pics'
-    if not os.path.exists(UPLOAD_FOLDER):
-        os.makedirs(UPLOAD_FOLDER)
-    
     if request.method == 'GET':
         settings_form.username.data = current_user.username
         settings_form.bio.data = current_user.bio
@@ -170,28 +711,6 @@ def settings():
         settings_form.theme_preference.data = current_user.theme_preference
     
     if settings_form.validate_on_submit():
-        # 处理头像上传
-        if settings_form.profile_picture.data:
-            # 生成随机文件名
-            random_hex = secrets.token_hex(8)
-            _, f_ext = os.path.splitext(settings_form.profile_picture.data.filename)
-            picture_fn = random_hex + f_ext
-            picture_path = os.path.join(app.root_path, UPLOAD_FOLDER, picture_fn)
-            
-            # 调整图片大小
-            output_size = (200, 200)
-            i = Image.open(settings_form.profile_picture.data)
-            i.thumbnail(output_size)
-            i.save(picture_path)
-            
-            # 删除旧头像（如果不是默认头像）
-            if current_user.profile_picture != 'default.jpg':
-                old_picture_path = os.path.join(app.root_path, UPLOAD_FOLDER, current_user.profile_picture)
-                if os.path.exists(old_picture_path):
-                    os.remove(old_picture_path)
-            
-            current_user.profile_picture = picture_fn
-        
         # 检查用户名是否已被使用
         if settings_form.username.data != current_user.username and User.query.filter_by(username=settings_form.username.data).first():
             flash('用户名已被使用', 'danger')
@@ -201,25 +720,38 @@ def settings():
             current_user.blur_effect_enabled = settings_form.blur_effect.data
             current_user.theme_preference = settings_form.theme_preference.data
             db.session.commit()
-            flash('设置已保存', 'success')
-            return redirect(url_for('settings'))
+            # 头像交给后台线程处理，处理完成后自动替换
+            if settings_form.profile_picture.data:
+                data = settings_form.profile_picture.data.read()
+                if len(data) > current_app.config['AVATAR_MAX_BYTES']:
+                    flash('头像文件过大', 'danger')
+                    return redirect(url_for('blog.settings'))
+                # 后台处理失败时用户看不到，能在请求中发现的问题先检查
+                if image_format(data) is None:
+                    flash('头像文件不是有效的 JPG 或 PNG 图片', 'danger')
+                    return redirect(url_for('blog.settings'))
+                current_app.extensions['avatar_processor'].submit(current_user.id, data)
+                flash('设置已保存，新头像处理完成后自动生效', 'success')
+            else:
+                flash('设置已保存', 'success')
+            return redirect(url_for('blog.settings'))
     
     if password_form.validate_on_submit():
         # 验证当前密码
-        if not sha256_crypt.verify(password_form.current_password.data, current_user.password):
+        if not current_app.extensions['password_hasher'].verify(password_form.current_password.data, current_user.password):
             flash('当前密码错误', 'danger')
         else:
-            current_user.password = sha256_crypt.hash(password_form.new_password.data)
+            current_user.password = current_app.extensions['password_hasher'].hash(password_form.new_password.data)
             db.session.commit()
             flash('密码已修改', 'success')
-            return redirect(url_for('settings'))
+            return redirect(url_for('blog.settings'))
     
     # 获取所有主题
     themes = Theme.query.all()
     
     return render_template('settings.html', settings_form=settings_form, password_form=password_form, themes=themes)
 
-@app.route('/post/new', methods=['GET', 'POST'])
+@bp.route('/post/new', methods=['GET', 'POST'])
 @login_required
 def new_post():
     form = PostForm()
@@ -228,15 +760,16 @@ def new_post():
         db.session.add(post)
         db.session.commit()
         flash('Your post has been created!', 'success')
-        return redirect(url_for('home'))
+        return redirect(url_for('blog.home'))
     return render_template('create_post.html', form=form, legend='New Post')
 
-@app.route('/post/<int:post_id>')
+@bp.route('/post/<int:post_id>')
+@cached_page(post_tags)
 def post(post_id):
-    post = Post.query.get_or_404(post_id)
+    post = detail_query().get_or_404(post_id)
     return render_template('post.html', title=post.title, post=post)
 
-@app.route('/post/<int:post_id>/update', methods=['GET', 'POST'])
+@bp.route('/post/<int:post_id>/update', methods=['GET', 'POST'])
 @login_required
 def update_post(post_id):
     post = Post.query.get_or_404(post_id)
@@ -248,13 +781,13 @@ def update_post(post_id):
         post.content = form.content.data
         db.session.commit()
         flash('Your post has been updated!', 'success')
-        return redirect(url_for('post', post_id=post.id))
+        return redirect(url_for('blog.post', post_id=post.id))
     elif request.method == 'GET':
         form.title.data = post.title
         form.content.data = post.content
     return render_template('create_post.html', form=form, legend='Update Post')
 
-@app.route('/post/<int:post_id>/delete', methods=['POST'])
+@bp.route('/post/<int:post_id>/delete', methods=['POST'])
 @login_required
 def delete_post(post_id):
     post = Post.query.get_or_404(post_id)
@@ -263,59 +796,408 @@ def delete_post(post_id):
     db.session.delete(post)
     db.session.commit()
     flash('Your post has been deleted!', 'success')
-    return redirect(url_for('home'))
+    return redirect(url_for('blog.home'))
 
-@app.route('/user_profile/<int:user_id>')
+@bp.route('/user_profile/<int:user_id>')
 @login_required
 def user_profile(user_id):
     user = User.query.get_or_404(user_id)
-    posts = Post.query.filter_by(author=user).order_by(Post.date_posted.desc()).all()
-    return render_template('user_posts.html', user=user, posts=posts)
+    return render_user_posts(user)
 
-@app.route('/user/<string:username>')
+@bp.route('/user/<string:username>')
+@cached_page(feed_tags)
 def user_posts(username):
     user = User.query.filter_by(username=username).first_or_404()
-    posts = Post.query.filter_by(author=user).order_by(Post.date_posted.desc()).all()
-    return render_template('user_posts.html', posts=posts, user=user)
+    return render_user_posts(user)
 
-@app.route('/admin')
-@login_required
+def render_user_posts(user):
+    page = paginate_posts(feed_query().filter_by(author=user))
+    return render_template('user_posts.html', user=user, posts=page.items, page=page)
+
+# 订阅源和站点地图：只随文章的增删改失效（评论不影响），轮询大多由页面缓存直接返回 304
+def syndication_tags(**kwargs):
+    return ['syndication']
+
+def syndication_query(username):
+    query = Post.query
+    if username:
+        user = User.query.filter_by(username=username).first_or_404()
+        query = query.filter_by(author=user)
+    return query
+
+def feed_posts(username):
+    posts = syndication_query(username).options(joinedload(Post.author), defer(Post.content)) \
+        .order_by(Post.date_posted.desc(), Post.id.desc()).limit(current_app.config['FEED_ITEMS']).all()
+    feed = {
+        'title': f'{username} - 逸刻时光' if username else '逸刻时光',
+        'home_url': url_for('blog.user_posts', username=username, _external=True) if username
+                    else url_for('blog.community', _external=True),
+        'feed_url': request.base_url,
+        'updated': posts[0].date_posted if posts else datetime.utcnow(),
+    }
+    return feed, posts
+
+def render_feed(template, mimetype, username):
+    feed, posts = feed_posts(username)
+    body = render_template(template, feed=feed, posts=posts, http_date=http_date)
+    return current_app.response_class(body, mimetype=mimetype)
+
+@bp.route('/feed.xml', defaults={'username': None})
+@bp.route('/user/<string:username>/feed.xml')
+@cached_page(syndication_tags)
+def rss_feed(username):
+    return render_feed('feed_rss.xml', 'application/rss+xml', username)
+
+@bp.route('/atom.xml', defaults={'username': None})
+@bp.route('/user/<string:username>/atom.xml')
+@cached_page(syndication_tags)
+def atom_feed(username):
+    return render_feed('feed_atom.xml', 'application/atom+xml', username)
+
+@bp.route('/feed.json', defaults={'username': None})
+@bp.route('/user/<string:username>/feed.json')
+@cached_page(syndication_tags)
+def json_feed(username):
+    feed, posts = feed_posts(username)
+    body = current_app.json.dumps({
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': feed['title'],
+        'home_page_url': feed['home_url'],
+        'feed_url': feed['feed_url'],
+        'items': [{
+            'id': str(post.id),
+            'url': url_for('blog.post', post_id=post.id, _external=True),
+            'title': post.title,
+            'content_html': str(post.body_html),
+            'summary': post.excerpt or '',
+            'date_published': post.date_posted.isoformat() + 'Z',
+            'authors': [{'name': post.author.username,
+                         'url': url_for('blog.user_posts', username=post.author.username, _external=True)}],
+        } for post in posts],
+    })
+    return current_app.response_class(body, mimetype='application/feed+json')
+
+# 站点地图按文章 id 区间分页，页面地址固定，新文章只会出现在最后一页
+@bp.route('/sitemap.xml', defaults={'username': None})
+@bp.route('/user/<string:username>/sitemap.xml')
+@cached_page(syndication_tags)
+def sitemap(username):
+    query = syndication_query(username)
+    size = current_app.config['SITEMAP_PAGE_SIZE']
+    page = request.args.get('page', type=int)
+    if page is None:
+        if username:
+            # 作者的文章分散在全站的 id 区间里，只列出含有该作者文章的区间
+            bucket = (Post.id - 1) // size + 1
+            pages = [row[0] for row in query.with_entities(bucket).distinct().order_by(bucket)]
+        else:
+            last_id = query.with_entities(func.max(Post.id)).scalar() or 0
+            pages = range(1, math.ceil(last_id / size) + 1)
+        body = render_template('sitemap_index.xml', username=username, pages=pages)
+    elif page < 1:
+        abort(404)
+    else:
+        rows = query.with_entities(Post.id, Post.date_posted) \
+            .filter(Post.id > (page - 1) * size, Post.id <= page * size).order_by(Post.id).all()
+        body = render_template('sitemap.xml', rows=rows)
+    return current_app.response_class(body, mimetype='application/xml')
+
+def admin_required(view):
+    @wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if not current_user.is_admin:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+# 管理面板表格：筛选、排序和分页都在数据库中完成，每页只取 ADMIN_PER_PAGE 行
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        abort(400)
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def prefix_filter(column, prefix):
+    # 前缀作为独立的绑定参数传入，SQLite 才能使用 NOCASE 索引做范围查找
+    return column.collate('NOCASE').like(escape_like(prefix) + '%', escape='\\')
+
+def filter_admin_rows(query, model, title_column):
+    author = request.args.get('author', '').strip()
+    if author:
+        query = query.filter(model.user_id == select(User.id).where(User.username == author).scalar_subquery())
+    start, end = parse_date_arg('from'), parse_date_arg('to')
+    if start:
+        query = query.filter(model.date_posted >= start)
+    if end:
+        query = query.filter(model.date_posted < end + timedelta(days=1))
+    prefix = request.args.get('q', '').strip()
+    if prefix:
+        query = query.filter(prefix_filter(title_column, prefix))
+    return query
+
+def sort_admin_rows(query, model, columns, default):
+    sort = request.args.get('sort', default)
+    if sort not in columns:
+        sort = default
+    order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+    # 以 id 作为第二排序键，翻页时顺序稳定
+    if order == 'asc':
+        query = query.order_by(columns[sort].asc(), model.id.asc())
+    else:
+        query = query.order_by(columns[sort].desc(), model.id.desc())
+    return query, sort, order
+
+class AdminPage:
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.total = total
+        self.pages = (total + per_page - 1) // per_page
+        self.has_prev = page > 1
+        self.has_next = page < self.pages
+        self.prev_num = page - 1
+        self.next_num = page + 1
+
+def paginate_admin_rows(query, model):
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['ADMIN_PER_PAGE']
+    # 总数只统计主键，不带预加载和排序
+    total = query.order_by(None).with_entities(func.count(model.id)).scalar()
+    items = query.limit(per_page).offset((page - 1) * per_page).all()
+    return AdminPage(items, page, per_page, total)
+
+def daily_counts(model, since):
+    day = func.date(model.date_posted)
+    return dict(db.session.query(day, func.count(model.id)).filter(model.date_posted >= since).group_by(day).all())
+
+def top_users(counter, limit=10):
+    return db.session.query(User.id, User.username, counter).filter(counter > 0) \
+        .order_by(counter.desc()).limit(limit).all()
+
+@bp.route('/admin')
+@admin_required
 def admin():
-    if current_user.username != 'admin':
-        abort(403)
-    users = User.query.all()
-    posts = Post.query.all()
-    return render_template('admin.html', users=users, posts=posts)
+    totals = db.session.query(
+        select(func.count(User.id)).scalar_subquery().label('users'),
+        select(func.count(Post.id)).scalar_subquery().label('posts'),
+        select(func.count(Comment.id)).scalar_subquery().label('comments'),
+    ).one()
+    days = current_app.config['ADMIN_ACTIVITY_DAYS']
+    since = datetime.combine(datetime.utcnow().date() - timedelta(days=days - 1), datetime.min.time())
+    post_days, comment_days = daily_counts(Post, since), daily_counts(Comment, since)
+    activity = []
+    for offset in range(days):
+        day = (since + timedelta(days=offset)).strftime('%Y-%m-%d')
+        activity.append((day, post_days.get(day, 0), comment_days.get(day, 0)))
+    peak = max([posts + comments for _, posts, comments in activity] + [1])
+    return render_template('admin.html', totals=totals, activity=activity[::-1], peak=peak,
+                           top_posters=top_users(User.post_count), top_commenters=top_users(User.comment_count))
 
-@app.route('/community')
+@bp.route('/admin/users')
+@admin_required
+def admin_users():
+    query = User.query
+    prefix = request.args.get('q', '').strip()
+    if prefix:
+        query = query.filter(prefix_filter(User.username, prefix))
+    query, sort, order = sort_admin_rows(query, User, {
+        'id': User.id, 'username': User.username, 'posts': User.post_count, 'comments': User.comment_count,
+    }, 'id')
+    return render_template('admin_users.html', pagination=paginate_admin_rows(query, User), sort=sort, order=order,
+                           remove_form=RemovePostsForm())
+
+@bp.route('/admin/posts')
+@admin_required
+def admin_posts():
+    query = filter_admin_rows(feed_query(), Post, Post.title)
+    query, sort, order = sort_admin_rows(query, Post, {
+        'date': Post.date_posted, 'id': Post.id, 'comments': Post.comment_count,
+    }, 'date')
+    return stream_page('admin_posts.html', pagination=paginate_admin_rows(query, Post), sort=sort, order=order)
+
+@bp.route('/admin/comments')
+@admin_required
+def admin_comments():
+    query = Comment.query.options(joinedload(Comment.author), joinedload(Comment.post).load_only(Post.id, Post.title))
+    query = filter_admin_rows(query, Comment, Post.title)
+    if request.args.get('q', '').strip():
+        query = query.join(Comment.post)
+    query, sort, order = sort_admin_rows(query, Comment, {'date': Comment.date_posted, 'id': Comment.id}, 'date')
+    return stream_page('admin_comments.html', pagination=paginate_admin_rows(query, Comment), sort=sort, order=order,
+                       bulk_form=BulkCommentForm())
+
+# 批量管理：每个操作都是针对一组行的几条 SQL 语句，在同一个事务中提交
+post_fts = table('post_fts', column('rowid'))
+comment_fts = table('comment_fts', column('rowid'))
+
+def delete_comment_rows(condition):
+    # 先按文章和作者统计要删除的评论数，删除后一次性扣减计数
+    deltas = {}
+    for model, name, child, key in COUNTERS:
+        if child is Comment:
+            column = getattr(Comment, key)
+            rows = db.session.execute(select(column, func.count()).where(condition).group_by(column))
+            deltas[model, name] = {row_id: -total for row_id, total in rows}
+    rows = db.session.execute(select(Comment.post_id, func.count()).where(condition).group_by(Comment.post_id))
+    received = {post_id: -total for post_id, total in rows}
+    removed = {}
+    for post_id, date_posted in db.session.execute(select(Comment.post_id, Comment.date_posted).where(condition)):
+        removed.setdefault(post_id, []).append(ranking.activity(date_posted))
+    db.session.execute(delete(comment_fts).where(comment_fts.c.rowid.in_(select(Comment.id).where(condition))))
+    deleted = Comment.query.filter(condition).delete(synchronize_session=False)
+    adjust_counters(db.session.connection(), deltas)
+    adjust_received_comments(db.session.connection(), received)
+    adjust_hot_scores(db.session.connection(), {}, removed)
+    return deleted
+
+def add_cache_tags(tags):
+    # 批量语句不经过 ORM 的 flush 事件，受影响的页面缓存标签需要手动登记
+    db.session.info.setdefault('cache_tags', set()).update(tags)
+
+@bp.route('/admin/comments/bulk', methods=['POST'])
+@admin_required
+def admin_comments_bulk():
+    form = BulkCommentForm()
+    comment_ids = request.form.getlist('ids', type=int)
+    if not form.validate_on_submit() or not comment_ids:
+        flash('请选择要处理的评论', 'danger')
+        return redirect(request.referrer or url_for('blog.admin_comments'))
+
+    rows = db.session.execute(select(Comment.id, Comment.post_id).where(Comment.id.in_(comment_ids))).all()
+    post_ids = {post_id for _, post_id in rows}
+    if form.action.data == 'delete':
+        changed = delete_comment_rows(Comment.id.in_(comment_ids))
+        add_cache_tags(['feed'])
+        for comment_id, post_id in rows:
+            add_comment_event(post_id, 'deleted', {'id': comment_id})
+    else:
+        pinned = form.action.data == 'pin'
+        changed = Comment.query.filter(Comment.id.in_(comment_ids)).update(
+            {Comment.is_pinned: pinned}, synchronize_session=False)
+        for comment_id, post_id in rows:
+            add_comment_event(post_id, 'pinned', {'id': comment_id, 'is_pinned': pinned})
+    add_cache_tags('post:%d' % post_id for post_id in post_ids)
+    db.session.commit()
+    flash(f'已处理 {changed} 条评论', 'success')
+    return redirect(request.referrer or url_for('blog.admin_comments'))
+
+@bp.route('/admin/users/<int:user_id>/remove-posts', methods=['POST'])
+@admin_required
+def admin_remove_user_posts(user_id):
+    user = User.query.get_or_404(user_id)
+    if not RemovePostsForm().validate_on_submit():
+        abort(400)
+    post_ids = select(Post.id).where(Post.user_id == user.id)
+    delete_comment_rows(Comment.post_id.in_(post_ids))
+    db.session.execute(delete(post_fts).where(post_fts.c.rowid.in_(post_ids)))
+    removed = Post.query.filter(Post.user_id == user.id).delete(synchronize_session=False)
+    adjust_counters(db.session.connection(), {(User, 'post_count'): {user.id: -removed}})
+    # 涉及的文章页可能很多，直接清空页面缓存
+    add_cache_tags(['*'])
+    db.session.commit()
+    flash(f'已删除 {user.username} 的 {removed} 篇文章', 'success')
+    return redirect(request.referrer or url_for('blog.admin_users'))
+
+@bp.route('/community')
+@cached_page(feed_tags)
 def community():
-    posts = Post.query.order_by(Post.date_posted.desc()).all()
-    return render_template('community.html', posts=posts)
+    sort = feed_sort()
+    page = paginate_posts(feed_query(), sort=sort)
+    return stream_page('community.html', posts=page.items, page=page, sort=sort)
+
+# API路由 - 社区文章流（无限滚动），与页面使用相同的游标
+@bp.route('/api/posts')
+def api_posts():
+    query = feed_query()
+    username = request.args.get('user')
+    if username:
+        user = User.query.filter_by(username=username).first_or_404()
+        query = query.filter_by(author=user)
+    page = paginate_posts(query, sort=feed_sort())
+    return jsonify({
+        'posts': [post_to_dict(post) for post in page.items],
+        'older_cursor': page.older_cursor,
+        'newer_cursor': page.newer_cursor,
+    })
 
-@app.route('/community/post/<int:post_id>', methods=['GET', 'POST'])
+@bp.route('/community/post/<int:post_id>', methods=['GET', 'POST'])
+@rate_limited('comment')
+@cached_page(post_tags)
 def community_post(post_id):
-    post = Post.query.get_or_404(post_id)
+    post = detail_query().get_or_404(post_id)
     comment_form = CommentForm()
     
     if comment_form.validate_on_submit() and current_user.is_authenticated:
         comment = Comment(content=comment_form.content.data, author=current_user, post=post)
         db.session.add(comment)
-        
-        # 更新评论计数
-        post.comment_count = Comment.query.filter_by(post_id=post.id).count()
         db.session.commit()
         
         flash('评论已发表', 'success')
-        return redirect(url_for('community_post', post_id=post.id))
+        return redirect(url_for('blog.community_post', post_id=post.id))
     
     # 获取所有评论
-    comments = Comment.query.filter_by(post_id=post.id).order_by(Comment.is_pinned.desc(), Comment.date_posted.desc()).all()
+    comments = Comment.query.options(joinedload(Comment.author)).filter_by(post_id=post.id).order_by(Comment.is_pinned.desc(), Comment.date_posted.desc()).all()
     
     return render_template('community_post.html', title=post.title, post=post, comment_form=comment_form, comments=comments)
 
+# 评论实时推送：浏览器通过 EventSource 订阅，断线重连时带上 Last-Event-ID 补发错过的事件
+# 响应体不需要请求上下文，数据库连接在返回响应时就已释放，空闲连接只占用一个订阅对象
+@bp.route('/community/post/<int:post_id>/events')
+def comment_events(post_id):
+    if Post.query.with_entities(Post.id).filter_by(id=post_id).first() is None:
+        abort(404)
+    broadcaster = current_app.extensions['broadcaster']
+    subscription = broadcaster.subscribe('post:%d' % post_id, request.headers.get('Last-Event-ID', type=int))
+    if subscription is None:
+        response = current_app.response_class('订阅数已满，请稍后重试', status=503, mimetype='text/plain')
+        response.headers['Retry-After'] = '30'
+        return response
+    stream = comment_event_stream(broadcaster, subscription, current_app.config['SSE_HEARTBEAT_SECONDS'])
+    response = current_app.response_class(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 关闭反向代理的响应缓冲
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(partial(broadcaster.unsubscribe, subscription))
+    return response
+
+def comment_event_stream(broadcaster, subscription, heartbeat):
+    yield 'retry: 3000\n\n'
+    while True:
+        events = broadcaster.listen(subscription, heartbeat)
+        if events is None:
+            # 积压溢出：结束连接，浏览器重连后按 Last-Event-ID 补发
+            return
+        if not events:
+            # 心跳让服务器及时发现已断开的连接
+            yield ': ping\n\n'
+        for event_id, name, data in events:
+            yield f'id: {event_id}\nevent: {name}\ndata: {data}\n\n'
+
+# API路由 - 发表评论，页面无需刷新，其他读者通过评论推送看到新评论
+@bp.route('/api/posts/<int:post_id>/comments', methods=['POST'])
+@login_required
+@rate_limited('comment')
+def api_create_comment(post_id):
+    post = Post.query.with_entities(Post.id).filter_by(id=post_id).first_or_404()
+    form = CommentForm()
+    if not form.validate_on_submit():
+        return jsonify({'status': 'error', 'errors': form.errors}), 400
+    comment = Comment(content=form.content.data, author=current_user, post_id=post.id)
+    db.session.add(comment)
+    db.session.commit()
+    return jsonify({'status': 'success', 'comment': comment_to_dict(comment)}), 201
+
 # API路由 - 更新主题设置
-@app.route('/api/update-theme', methods=['POST'])
+@bp.route('/api/update-theme', methods=['POST'])
 @login_required
+@rate_limited('preferences')
 def update_theme():
     data = request.get_json()
     theme = data.get('theme')
@@ -327,8 +1209,9 @@ def update_theme():
     else:
         return jsonify({'status': 'error', 'message': 'Invalid theme'}), 400
 
-@app.route('/api/update-blur-effect', methods=['POST'])
+@bp.route('/api/update-blur-effect', methods=['POST'])
 @login_required
+@rate_limited('preferences')
 def update_blur_effect():
     data = request.get_json()
     blur_effect = data.get('blur_effect')
@@ -340,8 +1223,9 @@ def update_blur_effect():
     else:
         return jsonify({'status': 'error', 'message': 'Invalid blur_effect value'}), 400
 
-@app.route('/api/update-theme-preference', methods=['POST'])
+@bp.route('/api/update-theme-preference', methods=['POST'])
 @login_required
+@rate_limited('preferences')
 def update_theme_preference():
     data = request.get_json()
     theme_preference = data.get('theme_preference')
@@ -353,7 +1237,7 @@ def update_theme_preference():
     else:
         return jsonify({'status': 'error', 'message': 'Invalid theme_preference'}), 400
 
-@app.route('/comment/<int:comment_id>/delete', methods=['POST'])
+@bp.route('/comment/<int:comment_id>/delete', methods=['POST'])
 @login_required
 def delete_comment(comment_id):
     comment = Comment.query.get_or_404(comment_id)
@@ -364,16 +1248,12 @@ def delete_comment(comment_id):
         abort(403)
     
     db.session.delete(comment)
-    
-    # 更新评论计数
-    post = Post.query.get(post_id)
-    post.comment_count = Comment.query.filter_by(post_id=post_id).count()
     db.session.commit()
     
     flash('评论已删除', 'success')
-    return redirect(url_for('community_post', post_id=post_id))
+    return redirect(url_for('blog.community_post', post_id=post_id))
 
-@app.route('/comment/<int:comment_id>/pin', methods=['POST'])
+@bp.route('/comment/<int:comment_id>/pin', methods=['POST'])
 @login_required
 def pin_comment(comment_id):
     comment = Comment.query.get_or_404(comment_id)
@@ -389,33 +1269,459 @@ def pin_comment(comment_id):
     
     action = '置顶' if comment.is_pinned else '取消置顶'
     flash(f'评论已{action}', 'success')
-    return redirect(url_for('community_post', post_id=post_id))
+    return redirect(url_for('blog.community_post', post_id=post_id))
+
+# 全文搜索索引：在同一事务中随文章和评论的增删改同步更新
+@event.listens_for(db.session, 'after_flush')
+def update_search_index(session, flush_context):
+    conn = session.connection()
+    for obj in session.deleted:
+        if isinstance(obj, Post):
+            conn.execute(text('DELETE FROM post_fts WHERE rowid = :id'), {'id': obj.id})
+        elif isinstance(obj, Comment):
+            conn.execute(text('DELETE FROM comment_fts WHERE rowid = :id'), {'id': obj.id})
+
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Post):
+            state = inspect(obj)
+            if obj in session.dirty and not (state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes()):
+                continue
+            conn.execute(text('DELETE FROM post_fts WHERE rowid = :id'), {'id': obj.id})
+            conn.execute(text('INSERT INTO post_fts (rowid, title, content) VALUES (:id, :title, :content)'),
+                         {'id': obj.id, 'title': fulltext.index_text(obj.title), 'content': fulltext.index_text(obj.content)})
+        elif isinstance(obj, Comment):
+            if obj in session.dirty and not inspect(obj).attrs.content.history.has_changes():
+                continue
+            conn.execute(text('DELETE FROM comment_fts WHERE rowid = :id'), {'id': obj.id})
+            conn.execute(text('INSERT INTO comment_fts (rowid, content) VALUES (:id, :content)'),
+                         {'id': obj.id, 'content': fulltext.index_text(obj.content)})
+
+# 反规范化计数器：(计数所在的模型, 计数列, 被计数的模型, 外键列)
+# 增删行时在同一事务中原子地加减，读取计数不需要 COUNT
+COUNTERS = [
+    (Post, 'comment_count', Comment, 'post_id'),
+    (User, 'post_count', Post, 'user_id'),
+    (User, 'comment_count', Comment, 'user_id'),
+]
+
+def adjust_counters(conn, deltas):
+    # deltas 为 {(模型, 计数列): {行 id: 增量}}，每个计数列执行一条批量 UPDATE
+    for (model, name), changes in deltas.items():
+        params = [{'row_id': row_id, 'delta': delta} for row_id, delta in changes.items() if delta]
+        if not params:
+            continue
+        columns = model.__table__.c
+        conn.execute(model.__table__.update().where(columns.id == bindparam('row_id'))
+                     .values({name: columns[name] + bindparam('delta')}), params)
+
+def adjust_received_comments(conn, deltas, authors=None):
+    # 作者收到的评论数：deltas 为 {文章 id: 增量}，按文章的作者加减；
+    # authors 为同一次 flush 中已删除的文章 {文章 id: 作者 id}，这些文章的行已经不在表中
+    authors = authors or {}
+    by_author = {}
+    for post_id, delta in deltas.items():
+        if post_id in authors:
+            by_author[authors[post_id]] = by_author.get(authors[post_id], 0) + delta
+    adjust_counters(conn, {(User, 'received_comment_count'): by_author})
+    params = [{'post_id': post_id, 'delta': delta} for post_id, delta in deltas.items()
+              if delta and post_id not in authors]
+    if params:
+        columns = User.__table__.c
+        author = select(Post.user_id).where(Post.id == bindparam('post_id')).scalar_subquery()
+        conn.execute(User.__table__.update().where(columns.id == author)
+                     .values(received_comment_count=columns.received_comment_count + bindparam('delta')), params)
+
+@event.listens_for(db.session, 'after_flush')
+def update_counters(session, flush_context):
+    deltas, received = {}, {}
+    for objects, step in ((session.new, 1), (session.deleted, -1)):
+        for obj in objects:
+            for model, name, child, key in COUNTERS:
+                if isinstance(obj, child):
+                    changes = deltas.setdefault((model, name), {})
+                    row_id = getattr(obj, key)
+                    changes[row_id] = changes.get(row_id, 0) + step
+            if isinstance(obj, Comment):
+                received[obj.post_id] = received.get(obj.post_id, 0) + step
+    adjust_counters(session.connection(), deltas)
+    authors = {obj.id: obj.user_id for obj in session.deleted if isinstance(obj, Post)}
+    adjust_received_comments(session.connection(), received, authors)
+
+# 热度：新文章以发布本身作为第一次活动，评论的增删在同一事务中对所在文章做对数加减（见 ranking.py）
+@event.listens_for(db.session, 'before_flush')
+def init_hot_scores(session, flush_context, instances):
+    for obj in session.new:
+        if isinstance(obj, Post) and obj.hot_score is None:
+            # 发布时间的列默认值在 INSERT 时才生成，这里提前填好
+            if obj.date_posted is None:
+                obj.date_posted = datetime.utcnow()
+            obj.hot_score = ranking.activity(obj.date_posted)
+
+def adjust_hot_scores(conn, added, removed):
+    # added / removed 为 {文章 id: [活动分数, ...]}，同一篇文章的多条评论先合并，每个方向执行一条批量 UPDATE
+    columns = Post.__table__.c
+    floor = literal_column(ranking.activity_sql('date_posted'))
+    for activities, score in ((added, func.hot_add(columns.hot_score, bindparam('amount'))),
+                              (removed, func.hot_sub(columns.hot_score, bindparam('amount'), floor))):
+        params = [{'row_id': post_id, 'amount': ranking.log_sum(values)} for post_id, values in activities.items()]
+        if params:
+            conn.execute(Post.__table__.update().where(columns.id == bindparam('row_id'))
+                         .values(hot_score=score), params)
+
+@event.listens_for(db.session, 'after_flush')
+def update_hot_scores(session, flush_context):
+    added, removed = {}, {}
+    for objects, activities in ((session.new, added), (session.deleted, removed)):
+        for obj in objects:
+            if isinstance(obj, Comment):
+                activities.setdefault(obj.post_id, []).append(ranking.activity(obj.date_posted))
+    adjust_hot_scores(session.connection(), added, removed)
+
+# 评论推送：flush 时为有人订阅的文章记录事件，事务提交后再广播，回滚则丢弃
+def add_comment_event(post_id, name, data):
+    channel = 'post:%d' % post_id
+    if current_app.extensions['broadcaster'].watched(channel):
+        db.session.info.setdefault('comment_events', []).append((channel, name, data))
+
+@event.listens_for(db.session, 'after_flush')
+def collect_comment_events(session, flush_context):
+    if not has_request_context():
+        return
+    for obj in session.new:
+        if isinstance(obj, Comment):
+            add_comment_event(obj.post_id, 'created', comment_to_dict(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Comment):
+            add_comment_event(obj.post_id, 'deleted', {'id': obj.id})
+    for obj in session.dirty:
+        if isinstance(obj, Comment) and inspect(obj).attrs.is_pinned.history.has_changes():
+            add_comment_event(obj.post_id, 'pinned', {'id': obj.id, 'is_pinned': bool(obj.is_pinned)})
+
+@event.listens_for(db.session, 'after_commit')
+def publish_comment_events(session):
+    events = session.info.pop('comment_events', None)
+    if not events:
+        return
+    broadcaster = current_app.extensions['broadcaster']
+    for channel, name, data in events:
+        broadcaster.publish(channel, name, current_app.json.dumps(data))
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_comment_events(session):
+    session.info.pop('comment_events', None)
+
+# 页面缓存：flush 时记录受影响的标签，事务提交后再失效，回滚则丢弃
+@event.listens_for(db.session, 'after_flush')
+def collect_cache_tags(session, flush_context):
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Post):
+            # 以 post= 关联新评论时文章也会出现在 dirty 中，列没有变化时不影响列表页和订阅源
+            if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            tags.update(['feed', 'syndication', 'post:%d' % obj.id])
+        elif isinstance(obj, Comment):
+            tags.add('post:%d' % obj.post_id)
+            # 置顶只影响文章详情页；新增和删除还会改变列表页上的评论数
+            if obj not in session.dirty:
+                tags.add('feed')
+        elif isinstance(obj, User) and obj in session.dirty:
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in ('username', 'bio', 'profile_picture')):
+                tags.add('*')
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_page_cache(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        current_app.extensions['page_cache'].invalidate(tags)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_cache_tags(session):
+    session.info.pop('cache_tags', None)
+
+FORWARDED_HEADERS = ('X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+
+def metrics_allowed():
+    config = current_app.config
+    if current_user.is_authenticated and current_user.is_admin:
+        return True
+    token = config['METRICS_TOKEN']
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+        return True
+    if not config['PROXY_FIX_HOPS'] and any(name in request.headers for name in FORWARDED_HEADERS):
+        return False
+    return request.remote_addr in config['METRICS_ALLOWED_IPS']
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    if not metrics_allowed():
+        abort(403)
+    cache = current_app.extensions['page_cache'].snapshot()
+    extra = [
+        ('blog_page_cache_hits_total', 'counter', '页面缓存命中次数', cache['hits']),
+        ('blog_page_cache_misses_total', 'counter', '页面缓存未命中次数', cache['misses']),
+        ('blog_page_cache_evictions_total', 'counter', '页面缓存淘汰次数', cache['evictions']),
+        ('blog_page_cache_bytes', 'gauge', '页面缓存占用的字节数', cache['bytes']),
+        ('blog_sse_subscribers', 'gauge', '当前的评论推送连接数', current_app.extensions['broadcaster'].snapshot()['subscribers']),
+    ]
+    body = current_app.extensions['metrics'].render(extra)
+    return current_app.response_class(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@bp.route('/admin/cache')
+@admin_required
+def admin_cache():
+    return jsonify(current_app.extensions['page_cache'].snapshot())
+
+@bp.route('/admin/hasher')
+@admin_required
+def admin_hasher():
+    return jsonify(current_app.extensions['password_hasher'].snapshot())
+
+def search_index(query, page, per_page):
+    expression = fulltext.match_expression(query)
+    if not expression:
+        return [], False
+    rows = db.session.execute(text(
+        f"SELECT 'post' AS kind, rowid AS id, {fulltext.POST_RANK} AS rank FROM post_fts WHERE post_fts MATCH :q "
+        f"UNION ALL SELECT 'comment', rowid, {fulltext.COMMENT_RANK} FROM comment_fts WHERE comment_fts MATCH :q "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"
+    ), {'q': expression, 'limit': per_page + 1, 'offset': (page - 1) * per_page}).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    # 按类型批量取出命中的文章和评论，再按排名顺序组装结果
+    post_ids = [row.id for row in rows if row.kind == 'post']
+    comment_ids = [row.id for row in rows if row.kind == 'comment']
+    posts = {post.id: post for post in Post.query.options(
+        joinedload(Post.author), defer(Post.content_html)
+    ).filter(Post.id.in_(post_ids))} if post_ids else {}
+    comments = {comment.id: comment for comment in Comment.query.options(
+        joinedload(Comment.author), joinedload(Comment.post).defer(Post.content).defer(Post.content_html)
+    ).filter(Comment.id.in_(comment_ids))} if comment_ids else {}
+
+    results = []
+    for row in rows:
+        if row.kind == 'post' and row.id in posts:
+            post = posts[row.id]
+            results.append({
+                'kind': 'post',
+                'id': post.id,
+                'title': fulltext.highlight(post.title, query, width=100),
+                'snippet': fulltext.highlight(post.content, query),
+                'author': post.author.username,
+                'date_posted': post.date_posted,
+                'url': url_for('blog.community_post', post_id=post.id),
+            })
+        elif row.kind == 'comment' and row.id in comments:
+            comment = comments[row.id]
+            results.append({
+                'kind': 'comment',
+                'id': comment.id,
+                'title': comment.post.title,
+                'snippet': fulltext.highlight(comment.content, query),
+                'author': comment.author.username,
+                'date_posted': comment.date_posted,
+                'url': url_for('blog.community_post', post_id=comment.post_id),
+            })
+    return results, has_next
+
+@bp.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_next = search_index(query, page, current_app.config['SEARCH_RESULTS_PER_PAGE']) if query else ([], False)
+    return render_template('search.html', query=query, results=results, page=page, has_next=has_next)
+
+# API路由 - 搜索
+@bp.route('/api/search')
+def api_search():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    results, has_next = search_index(query, page, current_app.config['SEARCH_RESULTS_PER_PAGE']) if query else ([], False)
+    for result in results:
+        result['title'] = str(result['title'])
+        result['snippet'] = str(result['snippet'])
+        result['date_posted'] = result['date_posted'].isoformat()
+    return jsonify({'query': query, 'page': page, 'has_next': has_next, 'results': results})
+
+def rebuild_search_index(batch_size=1000):
+    counts = fulltext.rebuild_index(db.session.connection(), batch_size)
+    db.session.commit()
+    return counts
+
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    ensure_schema()
+    started = time.perf_counter()
+    counts = rebuild_search_index()
+    elapsed = time.perf_counter() - started
+    print(f"已索引 {counts['post_fts']} 篇文章、{counts['comment_fts']} 条评论，用时 {elapsed:.2f} 秒")
+
+# 按顺序执行尚未应用的迁移（见 migrations.py）
+def ensure_schema():
+    return migrations.upgrade(db.engine, db.metadata)
+
+# 按实际行数重新计算所有计数器，返回每个计数列偏差的行数和偏差总量
+def counter_sources():
+    # (模型, 计数列, 按实际行数计算的关联子查询)
+    for model, name, child, key in COUNTERS:
+        yield model, name, select(func.count(child.id)).where(getattr(child, key) == model.id).scalar_subquery()
+    yield User, 'received_comment_count', select(func.count(Comment.id)) \
+        .join(Post, Comment.post_id == Post.id).where(Post.user_id == User.id).scalar_subquery()
+
+def reconcile_counters(fix=True):
+    report = {}
+    for model, name, actual in counter_sources():
+        counter = getattr(model, name)
+        drifted = counter.is_distinct_from(actual)
+        rows, drift = db.session.query(
+            func.count(model.id), func.coalesce(func.sum(func.abs(func.coalesce(counter, 0) - actual)), 0)
+        ).filter(drifted).one()
+        if fix and rows:
+            model.query.filter(drifted).update({counter: actual}, synchronize_session=False)
+            add_cache_tags(['*'])
+        report[f'{model.__tablename__}.{name}'] = (rows, drift)
+    if fix:
+        db.session.commit()
+    return report
+
+@bp.cli.command('reconcile-counters')
+@click.option('--dry-run', is_flag=True, help='只报告偏差，不修正')
+def reconcile_counters_command(dry_run):
+    ensure_schema()
+    for name, (rows, drift) in reconcile_counters(fix=not dry_run).items():
+        print(f'{name}：{rows} 行不一致，偏差合计 {drift}')
+
+# 按评论日期重新计算热度，修正对数减法累积的浮点误差和直接改库造成的偏差，可由 cron 定期执行
+@bp.cli.command('refresh-hot-scores')
+@click.option('--batch-size', default=1000, show_default=True)
+def refresh_hot_scores_command(batch_size):
+    ensure_schema()
+    started = time.perf_counter()
+    checked, updated = ranking.refresh_scores(db.session.connection(), batch_size)
+    if updated:
+        add_cache_tags(['feed'])
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    print(f'已检查 {checked} 篇文章，修正 {updated} 篇的热度，用时 {elapsed:.2f} 秒')
+
+@bp.cli.command('build-assets')
+def build_assets_command():
+    for name, hashed, sizes in assets.build(current_app.static_folder):
+        compressed = '，'.join(f'{encoding} {sizes[encoding]} 字节' for encoding in ('gzip', 'br') if encoding in sizes)
+        print(f"{name} -> {hashed}：{sizes['source']} -> {sizes['minified']} 字节，{compressed}")
+
+@bp.cli.command('rerender-posts')
+@click.option('--batch-size', default=500, show_default=True)
+def rerender_posts_command(batch_size):
+    ensure_schema()
+    started = time.perf_counter()
+    rendered = rendering.rerender_stale(db.session.connection(), batch_size)
+    if rendered:
+        add_cache_tags(['*'])
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    print(f'已按第 {rendering.RENDERER_VERSION} 版规则重新渲染 {rendered} 篇文章，用时 {elapsed:.2f} 秒')
+
+# 归档导出和导入（见 archive.py），路径以 .zip 结尾时附带头像文件
+@bp.cli.command('export-archive')
+@click.argument('path')
+@click.option('--batch-size', default=5000, show_default=True)
+def export_archive_command(path, batch_size):
+    ensure_schema()
+    avatar_folder = current_app.config['AVATAR_FOLDER'] if path.endswith('.zip') else None
+    started = time.perf_counter()
+    with db.engine.connect() as conn:
+        counts = archive.export_archive(conn, path, avatar_folder, batch_size)
+    elapsed = time.perf_counter() - started
+    rows = sum(counts[table] for table in archive.TABLES)
+    print('，'.join(f'{table} {counts[table]} 行' for table in archive.TABLES)
+          + (f"，头像文件 {counts['avatars']} 个" if 'avatars' in counts else ''))
+    print(f'共 {rows} 行，用时 {elapsed:.1f} 秒（{rows / max(elapsed, 1e-9):.0f} 行/秒），'
+          f'文件 {os.path.getsize(path) / 1024 / 1024:.1f} MB')
+
+@bp.cli.command('import-archive')
+@click.argument('path')
+@click.option('--batch-size', default=20000, show_default=True)
+def import_archive_command(path, batch_size):
+    ensure_schema()
+
+    def report(table, rows, seconds):
+        print(f'{table}：导入 {rows} 行，用时 {seconds:.1f} 秒（{rows / max(seconds, 1e-9):.0f} 行/秒）', flush=True)
+
+    started = time.perf_counter()
+    try:
+        with db.engine.connect() as conn:
+            counts = archive.import_archive(conn, path, current_app.config['AVATAR_FOLDER'], batch_size, report)
+    except archive.ArchiveError as error:
+        raise click.ClickException(str(error))
+    current_app.extensions['page_cache'].invalidate({'*'})
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    print(f'共导入 {rows} 行，用时 {elapsed:.1f} 秒（含重新计算热度和重建搜索索引，{rows / max(elapsed, 1e-9):.0f} 行/秒）')
+
+@bp.cli.command('upgrade-db')
+def upgrade_db_command():
+    applied = ensure_schema()
+    for version, description in applied:
+        print(f'已应用迁移 {version}：{description}')
+    with db.engine.connect() as conn:
+        print(f'当前数据库版本：{migrations.current_version(conn)}')
+
+def backfill_excerpts():
+    # 一条 UPDATE 语句在数据库内完成截取，不把正文读入 Python
+    excerpt = case(
+        (func.length(Post.content) > EXCERPT_LENGTH, func.substr(Post.content, 1, EXCERPT_LENGTH).concat('...')),
+        else_=Post.content,
+    )
+    updated = Post.query.filter(Post.excerpt.is_(None)).update({Post.excerpt: excerpt}, synchronize_session=False)
+    db.session.commit()
+    return updated
+
+@bp.cli.command('backfill-excerpts')
+def backfill_excerpts_command():
+    ensure_schema()
+    updated = backfill_excerpts()
+    print(f'已为 {updated} 篇文章生成摘要')
+
+# 初始化数据库：执行迁移、创建管理员账户和示例文章。可以重复执行，已存在的数据不会改动
+def bootstrap():
+    # 更新数据库结构（执行尚未应用的迁移）
+    ensure_schema()
+    
+    # 检查并更新管理员用户，确保新字段有值
+    admin_user = User.query.filter_by(username='admin').first()
+    if not admin_user:
+        admin_password = current_app.extensions['password_hasher'].hash('admin123')
+        admin_user = User(username='admin', password=admin_password, bio='网站管理员')
+        db.session.add(admin_user)
+        db.session.commit()
+    else:
+        # 确保现有用户有默认值
+        if admin_user.bio is None:
+            admin_user.bio = '网站管理员'
+            db.session.commit()
+    
+    # 检查并添加示例文章
+    if not Post.query.first():
+        sample_post = Post(
+            title='关于拥有一辆车的思考',
+            content='已经起床，可身体还未苏醒。其实如果早起出门跑个步是很好的一个选择。在这样的清晨，在广州还有些热，或许需要更早一些。看看不同上班时那炙热的阳光。还可以呼吸下或许不够新鲜的城市晨光空气。\n\n要不去偏离城市更远一点的地方跑步？离我现在住的不远其实就有这样一个地方。那里有很大的小区，有大道，现在还是道路的尽头。或许为了以后不久的时间拓展为车水马龙的街道，但是现在还没有。崭新的道路，稀少的行人，几乎没有车辆。只有路尽头边上停放了好多私家车。\n\n我还没有属于自己的小车。其实总间隔一段时间我就有欲望自己能拥有一台属于自己的车。这段时间往往是在老家。老家虽是在村里，但现在四通的都是宽宽的水泥路。在家没有车去哪都不方便。以前有拉客的三轮，去镇上很方便，现在母亲有时候实在没有人载她一程还会走路去镇上，跟我还很小时候一样。我妈不会骑电动车。电动车家里有，是妹妹买的。\n\n每年回家，总会由于没有车错过一些事情似的。同学群里约的聚会、亲戚家走走...甚至是时同学朋友都跟我说："你该有辆车，没有房子这车还是要有的，平时带个女孩，她都更愿意跟你接触。"每每在家我都会有几天的动摇。\n\n其实我总有另一个想法，我出了门来广州打工。用车的需求不大。大城市道路虽宽广，可是公共交通更适合我这随性的人。即便是只坐地铁去哪也都方便。出了地铁即使离目的地还有一段距离。这共享单车不就派上用场了。\n\n我有一辆美利达公爵山地车。19寸的架子，现在是我的上下班代步工具，去公司现在只有3公里的路程。骑车只需要十几分钟。骑车很方便。偶而周末也会骑，边骑车边听电台。这两年听歌很少，倒是很喜欢听电台。听几个会说话的人聊各种话题的电台。就边听边漫无目的的骑车，或许去城市中心，或许去城市边缘，很适合我。\n\n我想，如果我有车了，我会周末开车去哪哪吗？或许能远远扩大我的活动范围。但骑行我可以漫无目的去任何可以去的地方，不管道路好坏，不管道路限行、拥挤，不考虑停车，不考虑消耗，用钱就是个大问题，出门没目的的瞎逛还花钱，还有还有还能当作锻炼，还有还能随时停下来看看。当然有车有更多可能。我现在还没有，我设想有些狭隘。',
+            author=admin_user
+        )
+        db.session.add(sample_post)
+        db.session.commit()
+
+@bp.cli.command('bootstrap')
+def bootstrap_command():
+    bootstrap()
+    with db.engine.connect() as conn:
+        print(f'数据库已初始化，当前版本：{migrations.current_version(conn)}')
 
 if __name__ == '__main__':
+    # 开发服务器：单进程运行，启动前顺便初始化数据库
+    app = create_app()
     with app.app_context():
-        # 更新数据库结构，添加新字段
-        db.create_all()
-        
-        # 检查并更新管理员用户，确保新字段有值
-        admin_user = User.query.filter_by(username='admin').first()
-        if not admin_user:
-            admin_password = sha256_crypt.hash('admin123')
-            admin_user = User(username='admin', password=admin_password, bio='网站管理员')
-            db.session.add(admin_user)
-            db.session.commit()
-        else:
-            # 确保现有用户有默认值
-            if admin_user.bio is None:
-                admin_user.bio = '网站管理员'
-                db.session.commit()
-        
-        # 检查并添加示例文章
-        if not Post.query.first():
-            sample_post = Post(
-                title='关于拥有一辆车的思考',
-                content='已经起床，可身体还未苏醒。其实如果早起出门跑个步是很好的一个选择。在这样的清晨，在广州还有些热，或许需要更早一些。看看不同上班时那炙热的阳光。还可以呼吸下或许不够新鲜的城市晨光空气。\n\n要不去偏离城市更远一点的地方跑步？离我现在住的不远其实就有这样一个地方。那里有很大的小区，有大道，现在还是道路的尽头。或许为了以后不久的时间拓展为车水马龙的街道，但是现在还没有。崭新的道路，稀少的行人，几乎没有车辆。只有路尽头边上停放了好多私家车。\n\n我还没有属于自己的小车。其实总间隔一段时间我就有欲望自己能拥有一台属于自己的车。这段时间往往是在老家。老家虽是在村里，但现在四通的都是宽宽的水泥路。在家没有车去哪都不方便。以前有拉客的三轮，去镇上很方便，现在母亲有时候实在没有人载她一程还会走路去镇上，跟我还很小时候一样。我妈不会骑电动车。电动车家里有，是妹妹买的。\n\n每年回家，总会由于没有车错过一些事情似的。同学群里约的聚会、亲戚家走走...甚至是时同学朋友都跟我说："你该有辆车，没有房子这车还是要有的，平时带个女孩，她都更愿意跟你接触。"每每在家我都会有几天的动摇。\n\n其实我总有另一个想法，我出了门来广州打工。用车的需求不大。大城市道路虽宽广，可是公共交通更适合我这随性的人。即便是只坐地铁去哪也都方便。出了地铁即使离目的地还有一段距离。这共享单车不就派上用场了。\n\n我有一辆美利达公爵山地车。19寸的架子，现在是我的上下班代步工具，去公司现在只有3公里的路程。骑车只需要十几分钟。骑车很方便。偶而周末也会骑，边骑车边听电台。这两年听歌很少，倒是很喜欢听电台。听几个会说话的人聊各种话题的电台。就边听边漫无目的的骑车，或许去城市中心，或许去城市边缘，很适合我。\n\n我想，如果我有车了，我会周末开车去哪哪吗？或许能远远扩大我的活动范围。但骑行我可以漫无目的去任何可以去的地方，不管道路好坏，不管道路限行、拥挤，不考虑停车，不考虑消耗，用钱就是个大问题，出门没目的的瞎逛还花钱，还有还有还能当作锻炼，还有还能随时停下来看看。当然有车有更多可能。我现在还没有，我设想有些狭隘。',
-                author=admin_user
-            )
-            db.session.add(sample_post)
-            db.session.commit()
-    app.run(debug=True)
\ No newline at end of file
+        bootstrap()
+    app.run(debug=True)
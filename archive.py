@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# 博客归档的导出和导入：用户、文章、评论和主题逐行写成 JSON Lines，按主键分批流式读写
+#
+# 导出按 id 做键集分页，每批只在内存中保留 batch_size 行，内存占用与数据量无关；
+# 所有批次在同一个显式开启的读事务中读取，得到一致的快照（WAL 模式下不阻塞写入）。
+# 第一行是头部（格式版本、数据库版本和各表的列名），之后每行是 ["表名", 值...]，
+# 值直接取自 SQLite，日期等保持数据库中的文本格式，导入后逐字节一致。
+# .jsonl.gz 为 gzip 压缩的单个文件；.zip 中包含 archive.jsonl 和 avatars/ 下的头像文件，
+# 头像在数据写完后再按 id 分批读一遍用户写入（只有 zip 自身的目录随头像文件数增长）。
+#
+# 导入要求目标数据库为空（只执行过迁移），按表的依赖顺序保留原 id 批量插入，每批一个事务，
+# 进度与数据在同一个事务中写入 archive_import 表。中断后重新执行同一命令即可从上次提交的位置继续，
+# 全部完成后重新计算热度和旧版本归档中没有的计数列，重建搜索索引并删除进度表。
+import gzip
+import io
+import json
+import os
+import time
+import uuid
+import zipfile
+from datetime import datetime
+
+import fulltext
+import migrations
+import ranking
+from avatars import AVATAR_SIZES, avatar_filename, is_digest
+
+FORMAT = 'blog-archive'
+FORMAT_VERSION = 1
+# 按外键依赖排列，导入时先插入被引用的表
+TABLES = ['theme', 'user', 'post', 'comment']
+DATA_NAME = 'archive.jsonl'
+AVATAR_PREFIX = 'avatars/'
+PROGRESS_TABLE = 'archive_import'
+
+class ArchiveError(Exception):
+    pass
+
+def table_columns(conn, table):
+    # id 放在第一列，分页和断点续传都按它定位
+    columns = [row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table}")')]
+    return ['id'] + [column for column in columns if column != 'id']
+
+def iter_rows(conn, table, batch_size, after=0, columns=None):
+    # 键集分页：每批从上一批最大的 id 之后取，内存中只保留一批；columns 为 None 时读取所有列，否则第一列须为 id
+    columns = ', '.join(f'"{column}"' for column in columns or table_columns(conn, table))
+    while True:
+        rows = conn.exec_driver_sql(f'SELECT {columns} FROM "{table}" WHERE id > ? ORDER BY id LIMIT ?',
+                                    (after, batch_size)).all()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+def avatar_files(folder, picture):
+    if is_digest(picture):
+        names = [avatar_filename(picture, size) for size in AVATAR_SIZES]
+    else:
+        names = [picture] if picture else []
+    return [name for name in names if os.path.basename(name) == name and os.path.isfile(os.path.join(folder, name))]
+
+def export_archive(conn, path, avatar_folder=None, batch_size=5000):
+    # avatar_folder 不为 None 时写入 zip 并附带头像文件；返回 {表名: 行数}，zip 另有 avatars 为头像文件数
+    # pysqlite 不会为 SELECT 开启事务，显式 BEGIN 让头部和所有批次读取同一个快照，读完后回滚结束读事务
+    conn.exec_driver_sql('BEGIN')
+    try:
+        header = {
+            'format': FORMAT,
+            'version': FORMAT_VERSION,
+            'id': uuid.uuid4().hex,
+            'created': datetime.utcnow().isoformat(),
+            'schema_version': migrations.current_version(conn),
+            'columns': {table: table_columns(conn, table) for table in TABLES},
+        }
+        counts = {table: 0 for table in TABLES}
+        if avatar_folder is None:
+            archive, raw = None, gzip.open(path, 'wb')
+        else:
+            archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+            raw = archive.open(DATA_NAME, 'w', force_zip64=True)
+        with raw, io.TextIOWrapper(raw, encoding='utf-8') as out:
+            out.write(json.dumps(header, ensure_ascii=False) + '\n')
+            for table in TABLES:
+                for rows in iter_rows(conn, table, batch_size):
+                    out.write(''.join(json.dumps([table, *row], ensure_ascii=False) + '\n' for row in rows))
+                    counts[table] += len(rows)
+        if archive is not None:
+            # 数据流关闭后在同一快照中再按 id 分批读一遍用户的头像，边读边写入 zip，不在内存中收集文件列表
+            counts['avatars'] = write_avatars(conn, archive, avatar_folder, batch_size)
+            archive.close()
+    finally:
+        conn.rollback()
+    return counts
+
+def write_avatars(conn, archive, avatar_folder, batch_size):
+    written = 0
+    for rows in iter_rows(conn, 'user', batch_size, columns=['id', 'profile_picture']):
+        for _, picture in rows:
+            for name in avatar_files(avatar_folder, picture):
+                # 同一头像可能被多个用户使用（如默认头像），zip 的目录中已有时不再写入
+                try:
+                    archive.getinfo(AVATAR_PREFIX + name)
+                except KeyError:
+                    archive.write(os.path.join(avatar_folder, name), AVATAR_PREFIX + name)
+                    written += 1
+    return written
+
+def open_archive(path):
+    # 返回 (逐行读取的文本流, zip 对象或 None)
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        return io.TextIOWrapper(archive.open(DATA_NAME), encoding='utf-8'), archive
+    return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8'), None
+
+def read_progress(conn, archive_id):
+    # 返回 {表名: 已导入的最大 id}；目标库有其他数据或另一个归档的导入未完成时报错
+    exists = conn.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (PROGRESS_TABLE,)).first()
+    if exists:
+        rows = conn.exec_driver_sql(f'SELECT archive, table_name, last_id FROM {PROGRESS_TABLE}').all()
+        if any(row.archive != archive_id for row in rows):
+            raise ArchiveError('目标数据库中有另一个归档的导入尚未完成')
+        return {row.table_name: row.last_id for row in rows}
+    for table in TABLES:
+        if conn.exec_driver_sql(f'SELECT 1 FROM "{table}" LIMIT 1').first():
+            raise ArchiveError(f'目标数据库的 {table} 表不为空，只能导入到新建的数据库')
+    conn.exec_driver_sql(f'CREATE TABLE {PROGRESS_TABLE} (archive TEXT NOT NULL, table_name TEXT PRIMARY KEY, '
+                         'last_id INTEGER NOT NULL)')
+    conn.commit()
+    return {}
+
+def import_archive(conn, path, avatar_folder=None, batch_size=20000, report=None):
+    # 返回 {表名: 本次导入的行数}；report(表名, 行数, 秒数) 在每张表导入完成时调用
+    stream, archive = open_archive(path)
+    with stream:
+        header = json.loads(stream.readline())
+        if header.get('format') != FORMAT or header.get('version') != FORMAT_VERSION:
+            raise ArchiveError('不是可识别的博客归档文件')
+        if migrations.current_version(conn) < header['schema_version']:
+            raise ArchiveError(f"归档来自第 {header['schema_version']} 版数据库，请先执行 flask upgrade-db")
+        progress = read_progress(conn, header['id'])
+
+        statements = {}
+        for table, columns in header['columns'].items():
+            missing = set(columns) - set(table_columns(conn, table))
+            if missing:
+                raise ArchiveError(f"目标数据库的 {table} 表缺少列：{', '.join(sorted(missing))}")
+            names = ', '.join(f'"{column}"' for column in columns)
+            statements[table] = f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?" * len(columns))})'
+        save_progress = (f'INSERT OR REPLACE INTO {PROGRESS_TABLE} (archive, table_name, last_id) '
+                         'VALUES (?, ?, ?)')
+
+        counts = {table: 0 for table in TABLES}
+        current, batch, started = None, [], time.perf_counter()
+
+        def flush():
+            if batch:
+                conn.exec_driver_sql(statements[current], batch)
+                conn.exec_driver_sql(save_progress, (header['id'], current, batch[-1][0]))
+                conn.commit()
+                counts[current] += len(batch)
+                batch.clear()
+
+        for line in stream:
+            table, *row = json.loads(line)
+            if table != current:
+                flush()
+                if current is not None and report:
+                    report(current, counts[current], time.perf_counter() - started)
+                current, started = table, time.perf_counter()
+            # 上次中断前已经提交的行直接跳过
+            if row[0] <= progress.get(table, 0):
+                continue
+            batch.append(tuple(row))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        if current is not None and report:
+            report(current, counts[current], time.perf_counter() - started)
+
+    if archive is not None:
+        if avatar_folder is not None:
+            os.makedirs(avatar_folder, exist_ok=True)
+            for name in archive.namelist():
+                target = os.path.join(avatar_folder, os.path.basename(name))
+                if name.startswith(AVATAR_PREFIX) and not os.path.exists(target):
+                    with archive.open(name) as source, open(target, 'wb') as f:
+                        f.write(source.read())
+        archive.close()
+
+    # 旧版本归档没有 hot_score 等派生列，导入后为默认值，按导入的文章和评论重新计算
+    ranking.refresh_scores(conn)
+    if 'received_comment_count' not in header['columns']['user']:
+        migrations.backfill_received_comment_counts(conn)
+    fulltext.rebuild_index(conn)
+    conn.exec_driver_sql(f'DROP TABLE {PROGRESS_TABLE}')
+    conn.commit()
+    return counts
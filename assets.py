@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# 静态资源构建：压缩 CSS/JS，按内容摘要命名，并预先生成 gzip/brotli 版本
+#
+# 构建结果写入 static/dist/，manifest.json 记录源文件到带摘要文件名的映射，
+# 模板中的 url_for('static', filename='css/style.css') 会按清单解析为
+# dist/css/style.<摘要>.css。文件名随内容变化，响应可以设置一年的 immutable 缓存。
+import gzip
+import hashlib
+import json
+import os
+import re
+
+ASSETS = ['css/style.css', 'js/script.js']
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# 预压缩版本：(Accept-Encoding 名称, 文件后缀)，按优先顺序排列
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+STRING_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|`(?:\\.|[^`\\])*`)''', re.S)
+
+def _split_strings(source):
+    # 奇数下标为字符串字面量，压缩时原样保留
+    return STRING_RE.split(source)
+
+def minify_css(source):
+    parts = _split_strings(re.sub(r'/\*.*?\*/', '', source, flags=re.S))
+    for i in range(0, len(parts), 2):
+        code = re.sub(r'\s+', ' ', parts[i])
+        # 冒号前的空格在选择器中有意义（如 "a :hover"），只去掉冒号后的空格
+        code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+        code = re.sub(r':\s+', ':', code)
+        parts[i] = code.replace(';}', '}')
+    return ''.join(parts).strip()
+
+def minify_js(source):
+    # 只去掉注释和缩进，保留换行，不改变自动分号插入的行为
+    out = []
+    i, n = 0, len(source)
+    while i < n:
+        c = source[i]
+        if c in '"\'`':
+            match = STRING_RE.match(source, i)
+            end = match.end() if match else n
+            out.append(source[i:end])
+            i = end
+        elif source.startswith('//', i):
+            i = source.find('\n', i)
+            i = n if i < 0 else i
+        elif source.startswith('/*', i):
+            i = source.find('*/', i + 2)
+            i = n if i < 0 else i + 2
+        else:
+            out.append(c)
+            i += 1
+    lines = (line.strip() for line in ''.join(out).splitlines())
+    return '\n'.join(line for line in lines if line)
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+def _write(path, data):
+    # 先写临时文件再改名，正在运行的 worker 不会读到写了一半的文件
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+def build(static_folder, assets=ASSETS):
+    brotli = _brotli()
+    manifest = {}
+    report = []
+    for name in assets:
+        with open(os.path.join(static_folder, name), encoding='utf-8') as f:
+            source = f.read()
+        base, ext = os.path.splitext(name)
+        data = MINIFIERS[ext](source).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed = f'{DIST_DIR}/{base}.{digest}{ext}'
+        path = os.path.join(static_folder, hashed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write(path, data)
+        sizes = {'source': len(source.encode('utf-8')), 'minified': len(data)}
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        _write(path + '.gz', compressed)
+        sizes['gzip'] = len(compressed)
+        if brotli is not None:
+            compressed = brotli.compress(data, quality=11)
+            _write(path + '.br', compressed)
+            sizes['br'] = len(compressed)
+        manifest[name] = hashed
+        report.append((name, hashed, sizes))
+
+    _write(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME),
+           json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    return report
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        # 未执行构建时直接使用源文件
+        return {}
+
+def is_hashed(filename):
+    return filename.startswith(DIST_DIR + '/')
+
+def pick_encoding(folder, filename, accept_encodings):
+    # 按质量值判断，客户端以 q=0 拒绝的编码不使用，回退到未压缩的文件
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] > 0 and os.path.exists(os.path.join(folder, filename + suffix)):
+            return encoding, filename + suffix
+    return None, filename
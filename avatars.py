@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# 头像处理：上传请求只计算摘要并提交任务，解码和缩放在后台线程池中完成
+#
+# 文件按内容摘要命名（<摘要>-<尺寸>.webp），相同图片只处理和存储一次。
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# 各尺寸按显示大小的两倍生成，兼顾高分屏
+AVATAR_SIZES = {'comment': 48, 'feed': 64, 'profile': 300}
+AVATAR_FORMAT = 'webp'
+
+logger = logging.getLogger(__name__)
+
+# 上传时按文件头判断格式，不是图片的文件（如改了扩展名的文件）在请求中直接拒绝，不交给后台线程
+IMAGE_SIGNATURES = {
+    b'\xff\xd8\xff': 'JPEG',
+    b'\x89PNG\r\n\x1a\n': 'PNG',
+}
+
+def image_format(data):
+    for signature, name in IMAGE_SIGNATURES.items():
+        if data.startswith(signature):
+            return name
+    return None
+
+def avatar_filename(digest, size):
+    return f'{digest}-{size}.{AVATAR_FORMAT}'
+
+def is_digest(name):
+    # 旧版本上传的头像文件名带扩展名，新头像只保存摘要
+    return bool(name) and '.' not in name
+
+class AvatarProcessor:
+    def __init__(self, folder, on_complete, workers=2):
+        self.folder = folder
+        self.on_complete = on_complete
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='avatar')
+
+    def submit(self, user_id, data):
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        future = self.executor.submit(self._process, user_id, data, digest)
+        future.add_done_callback(self._log_failure)
+        return digest, future
+
+    def _log_failure(self, future):
+        if future.exception() is not None:
+            logger.error('头像处理失败', exc_info=future.exception())
+
+    def _process(self, user_id, data, digest):
+        self.ensure(data, digest)
+        # 其他用户换掉同一头像时可能在这之后删除文件，on_complete 在数据库写锁内再确认一次
+        self.on_complete(user_id, digest, partial(self.ensure, data, digest))
+
+    def ensure(self, data, digest):
+        if not self.exists(digest):
+            self.render(data, digest)
+
+    def exists(self, digest):
+        return all(os.path.exists(os.path.join(self.folder, avatar_filename(digest, size)))
+                   for size in AVATAR_SIZES)
+
+    def render(self, data, digest):
+        # PIL 只在后台线程中导入，Web 进程启动时不加载
+        from io import BytesIO
+        from PIL import Image, ImageOps
+
+        os.makedirs(self.folder, exist_ok=True)
+        with Image.open(BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            largest = max(AVATAR_SIZES.values())
+            square = ImageOps.fit(image, (largest, largest), Image.LANCZOS)
+            for size, pixels in AVATAR_SIZES.items():
+                path = os.path.join(self.folder, avatar_filename(digest, size))
+                resized = square if pixels == largest else square.resize((pixels, pixels), Image.LANCZOS)
+                # 先写临时文件再改名，其他进程不会读到写了一半的图片；临时文件名唯一，
+                # 同一图片被同时提交两次时两个线程各写各的，后改名的覆盖先改名的
+                fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.folder)
+                os.close(fd)
+                try:
+                    resized.save(tmp_path, AVATAR_FORMAT.upper(), quality=80, method=4)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+
+    def remove(self, name):
+        if is_digest(name):
+            paths = [os.path.join(self.folder, avatar_filename(name, size)) for size in AVATAR_SIZES]
+        else:
+            paths = [os.path.join(self.folder, name)]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,69 @@
+import os
+import re
+import sys
+import tempfile
+
+# 使用临时数据库，避免污染 instance/blog.db
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+
+import assets
+from app import create_app, ensure_schema
+
+app = create_app()
+
+ASSET_RE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+HEADERS = {'Accept-Encoding': 'br, gzip'}
+
+def visit(client, cache):
+    # 模拟浏览器：缓存仍然新鲜的资源不发请求，过期的资源带上验证器发条件请求
+    html = client.get('/community?nocache=1', buffered=True).get_data(as_text=True)
+    requests, transferred = 0, 0
+    for url in ASSET_RE.findall(html):
+        cached = cache.get(url)
+        if cached and cached.cache_control.max_age:
+            continue
+        headers = dict(HEADERS)
+        if cached and cached.headers.get('ETag'):
+            headers['If-None-Match'] = cached.headers['ETag']
+        response = client.get(url, headers=headers)
+        requests += 1
+        transferred += len(response.get_data())
+        if response.status_code == 200:
+            cache[url] = response
+        response.close()
+    return requests, transferred
+
+def measure(manifest):
+    app.extensions['asset_manifest'] = manifest
+    client = app.test_client()
+    cache = {}
+    return visit(client, cache), visit(client, cache)
+
+def main():
+    with app.app_context():
+        ensure_schema()
+    for name, hashed, sizes in assets.build(app.static_folder):
+        print(f"构建 {name} -> {hashed}：{sizes['source']} -> {sizes['minified']} 字节，"
+              + '，'.join(f'{encoding} {sizes[encoding]} 字节' for encoding in ('gzip', 'br') if encoding in sizes))
+
+    results = {
+        '源文件': measure({}),
+        '构建后': measure(assets.load_manifest(app.static_folder)),
+    }
+    print(f"{'模式':<8}{'首次请求数':>10}{'首次字节':>10}{'再次请求数':>10}{'再次字节':>10}")
+    for name, ((first_requests, first_bytes), (repeat_requests, repeat_bytes)) in results.items():
+        print(f'{name:<8}{first_requests:>12}{first_bytes:>12}{repeat_requests:>12}{repeat_bytes:>12}')
+
+    os.close(db_fd)
+    os.remove(db_path)
+    (_, source_bytes), _ = results['源文件']
+    (_, built_bytes), (repeat_requests, _) = results['构建后']
+    # 构建后再次访问不应再请求任何静态资源，首次访问的字节数应明显减少
+    if repeat_requests or built_bytes >= source_bytes / 2:
+        print('✗ 静态资源缓存或压缩未生效')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from werkzeug.serving import make_server
+
+from passwords import PasswordHasher
+
+def seed(blog, app):
+    db, User, Post = blog.db, blog.User, blog.Post
+    with app.app_context():
+        blog.ensure_schema()
+        user = User(username='bench', password=app.extensions['password_hasher'].hash('benchpass'))
+        db.session.add(user)
+        db.session.flush()
+        for i in range(50):
+            db.session.add(Post(title=f'文章 {i}', content='内容' * 500, author=user))
+        db.session.commit()
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # 登录成功后的跳转不计入登录耗时
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+opener = urllib.request.build_opener(NoRedirect)
+
+def worker(url, data, stop, latencies, errors):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            opener.open(url, data=data, timeout=30).read()
+        except urllib.error.HTTPError as error:
+            if error.code != 302:
+                errors.append(1)
+                continue
+        except Exception:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+def run(base_url, login_threads, feed_threads, duration):
+    stop = threading.Event()
+    login_latencies, feed_latencies, errors = [], [], []
+    login_data = urllib.parse.urlencode({'username': 'bench', 'password': 'benchpass'}).encode()
+    threads = [threading.Thread(target=worker, args=(base_url + '/login', login_data, stop, login_latencies, errors))
+               for _ in range(login_threads)]
+    # 跳过页面缓存，让每次请求都真正渲染
+    threads += [threading.Thread(target=worker, args=(base_url + '/community?nocache=1', None, stop, feed_latencies, errors))
+                for _ in range(feed_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return login_latencies, feed_latencies, len(errors)
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100)[pct - 1] * 1000 if len(values) > 1 else values[0] * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='登录吞吐量与并发文章流延迟基准测试')
+    parser.add_argument('--login-threads', type=int, default=4)
+    parser.add_argument('--feed-threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=2, help='进程池模式下的哈希进程数')
+    args = parser.parse_args()
+
+    # 使用临时数据库，避免污染 instance/blog.db；哈希子进程会重新导入本模块，
+    # 因此应用只在这里导入
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    import app as blog
+    app = blog.create_app({'WTF_CSRF_ENABLED': False, 'RATE_LIMIT_ENABLED': False})
+
+    seed(blog, app)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    modes = [
+        ('请求线程内哈希', PasswordHasher(workers=0, rounds=app.config['PASSWORD_HASH_ROUNDS'])),
+        (f'进程池哈希（{args.workers} 进程）', PasswordHasher(workers=args.workers, rounds=app.config['PASSWORD_HASH_ROUNDS'])),
+    ]
+    print(f"{'模式':<20}{'登录/秒':>10}{'文章流/秒':>12}{'文章流 p50':>12}{'文章流 p95':>12}{'错误':>6}")
+    for name, hasher in modes:
+        app.extensions['password_hasher'] = hasher
+        # 预热进程池，避免把子进程启动时间计入结果
+        hasher.hash('warmup')
+        logins, feeds, errors = run(base_url, args.login_threads, args.feed_threads, args.duration)
+        print(f'{name:<20}{len(logins) / args.duration:>10.1f}{len(feeds) / args.duration:>12.1f}'
+              f'{percentile(feeds, 50):>10.1f}ms{percentile(feeds, 95):>10.1f}ms{errors:>6}')
+
+    server.shutdown()
+    os.close(db_fd)
+    os.remove(db_path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+# 端到端基准：依次压测各个路由，统计吞吐量、p50/p95/p99 延迟、每个请求的 SQL 次数和进程内存峰值，
+# 结果保存为 JSON，之后的运行可以用 --compare 对比。
+# 不指定 --database 时在临时数据库中生成小规模数据；指向 seed_data.py 生成的数据库时，
+# 发表评论的路由会写入少量评论，请勿指向线上数据库。
+#
+#   python seed_data.py --database instance/bench.db --users 100000 --posts 1000000 --comments 10000000
+#   python bench_routes.py --database instance/bench.db --requests 200
+#   python bench_routes.py --database instance/bench.db --server --concurrency 8 --compare bench_results/<文件>.json
+
+SEARCH_TERMS = ['山地车', '电台', '城市边缘', 'python', '晚霞 照片']
+
+# (名称, 方法, 生成地址, 登录身份, 生成请求体, 预期状态码)
+# 登录身份：None 为匿名，'fresh' 为每个请求一个新的匿名会话（登录成功后旧会话会直接跳转）
+ROUTES = [
+    ('首页', 'GET', lambda s: '/', None, None, 200),
+    ('社区第一页', 'GET', lambda s: '/community', None, None, 200),
+    ('社区深分页', 'GET', lambda s: '/community?before=' + s.choice('cursors'), None, None, 200),
+    ('文章流 API', 'GET', lambda s: '/api/posts?before=' + s.choice('cursors'), None, None, 200),
+    ('热门第一页', 'GET', lambda s: '/community?sort=hot', None, None, 200),
+    ('热门深分页', 'GET', lambda s: '/community?sort=hot&before=' + s.choice('hot_cursors'), None, None, 200),
+    ('文章详情', 'GET', lambda s: f"/community/post/{s.choice('post_ids')}", None, None, 200),
+    ('作者页', 'GET', lambda s: f"/user/{s.choice('authors')}", None, None, 200),
+    ('搜索', 'GET', lambda s: '/search?q=' + urllib.parse.quote(s.choice('terms')), None, None, 200),
+    ('RSS', 'GET', lambda s: '/feed.xml', None, None, 200),
+    ('管理概览', 'GET', lambda s: '/admin', 'admin', None, 200),
+    ('用户管理', 'GET', lambda s: '/admin/users?sort=posts', 'admin', None, 200),
+    ('文章管理', 'GET', lambda s: '/admin/posts', 'admin', None, 200),
+    ('评论管理', 'GET', lambda s: '/admin/comments', 'admin', None, 200),
+    ('登录', 'POST', lambda s: '/login', 'fresh', lambda s: {'form': s.member_credentials}, 302),
+    ('发表评论', 'POST', lambda s: f"/api/posts/{s.choice('post_ids')}/comments", 'member',
+     lambda s: {'payload': {'content': '基准测试评论'}}, 201),
+]
+
+class Samples:
+    # 从数据库中随机抽取文章、作者和翻页游标，各路由从中随机选择
+    def __init__(self, blog, member_password, admin_password, rng, size=200):
+        self.rng = rng
+        with blog.db.engine.connect() as conn:
+            last = conn.exec_driver_sql('SELECT coalesce(max(id), 0) FROM post').scalar()
+            ids = list({rng.randint(1, max(last, 1)) for _ in range(size)})
+            rows = conn.exec_driver_sql(
+                'SELECT post.id, post.date_posted, post.hot_score, "user".username FROM post JOIN "user" ON "user".id = post.user_id '
+                f"WHERE post.id IN ({','.join('?' * len(ids))})", tuple(ids)).all()
+            member = conn.exec_driver_sql(
+                "SELECT username FROM \"user\" WHERE username != 'admin' ORDER BY post_count DESC LIMIT 1").scalar()
+        posts = [blog.Post(id=row.id, date_posted=datetime.fromisoformat(row.date_posted), hot_score=row.hot_score)
+                 for row in rows]
+        self.values = {
+            'post_ids': [post.id for post in posts],
+            'cursors': [blog.encode_cursor(post) for post in posts],
+            'hot_cursors': [blog.encode_cursor(post, 'hot') for post in posts],
+            'authors': [row.username for row in rows],
+            'terms': SEARCH_TERMS,
+        }
+        self.member_credentials = {'username': member, 'password': member_password}
+        self.admin_credentials = {'username': 'admin', 'password': admin_password}
+
+    def choice(self, name):
+        return self.rng.choice(self.values[name])
+
+class TestClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, url, form=None, payload=None):
+        return self.client.open(url, method=method, data=form, json=payload, buffered=True).status_code
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class HTTPClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(NoRedirect(), urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, url, form=None, payload=None):
+        data, headers = None, {}
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        elif payload is not None:
+            data = json.dumps(payload).encode()
+            headers['Content-Type'] = 'application/json'
+        request = urllib.request.Request(self.base_url + url, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+class QueryCounter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+
+    def __call__(self, *args):
+        with self.lock:
+            self.count += 1
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，是进程启动以来的峰值
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def percentile(values, pct):
+    if len(values) < 2:
+        return values[0] * 1000 if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1] * 1000
+
+def with_nocache(url):
+    return url + ('&' if '?' in url else '?') + 'nocache=1'
+
+def run_route(route, make_client, samples, requests, concurrency, warmup, use_cache, queries):
+    name, method, make_url, identity, make_body, expected = route
+    clients = {}
+
+    def client_for(worker):
+        # 每个线程一个会话；'fresh' 每个请求都新建
+        if identity == 'fresh':
+            return make_client()
+        if worker not in clients:
+            client = clients[worker] = make_client()
+            if identity is not None:
+                credentials = samples.admin_credentials if identity == 'admin' else samples.member_credentials
+                client.request('POST', '/login', form=credentials)
+        return clients[worker]
+
+    def call(worker):
+        url = make_url(samples)
+        if method == 'GET' and not use_cache:
+            url = with_nocache(url)
+        body = make_body(samples) if make_body else {}
+        client = client_for(worker)
+        started = time.perf_counter()
+        status = client.request(method, url, **body)
+        return time.perf_counter() - started, status
+
+    # 登录等准备工作不计入统计
+    for index in range(concurrency):
+        client_for(index)
+    for _ in range(warmup):
+        call(0)
+
+    latencies, errors = [], {}
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(index):
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            elapsed, status = call(index)
+            with lock:
+                latencies.append(elapsed)
+                if status != expected:
+                    errors[status] = errors.get(status, 0) + 1
+
+    before = queries.count
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'sql_per_request': (queries.count - before) / max(len(latencies), 1),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def pad(text, width):
+    # 按终端显示宽度对齐，汉字占两列
+    shown = sum(2 if unicodedata.east_asian_width(char) in 'WF' else 1 for char in text)
+    return text + ' ' * max(width - shown, 0)
+
+COLUMNS = [('请求/秒', 'throughput', '.1f'), ('p50 ms', 'p50_ms', '.1f'), ('p95 ms', 'p95_ms', '.1f'),
+           ('p99 ms', 'p99_ms', '.1f'), ('SQL/请求', 'sql_per_request', '.1f'), ('内存峰值 MB', 'peak_rss_mb', '.0f')]
+
+def print_results(results, previous=None):
+    print(pad('路由', 14) + ''.join(pad(title, 14) for title, _, _ in COLUMNS) + '错误')
+    for name, stats in results['routes'].items():
+        print(pad(name, 14) + ''.join(pad(format(stats[key], spec), 14) for _, key, spec in COLUMNS)
+              + str(stats['errors'] or ''))
+        old = previous and previous['routes'].get(name)
+        if old:
+            changes = [f'{(stats[key] - old[key]) / old[key] * 100:+.0f}%' if old[key] else '-' for _, key, _ in COLUMNS]
+            print(pad('  对比', 14) + ''.join(pad(change, 14) for change in changes))
+
+def main():
+    parser = argparse.ArgumentParser(description='各路由的吞吐量、延迟、SQL 次数和内存基准测试')
+    parser.add_argument('--database', help='seed_data.py 生成的数据库，不指定时使用临时数据库')
+    parser.add_argument('--users', type=int, default=200, help='临时数据库的用户数')
+    parser.add_argument('--posts', type=int, default=2000, help='临时数据库的文章数')
+    parser.add_argument('--comments', type=int, default=20000, help='临时数据库的评论数')
+    parser.add_argument('--requests', type=int, default=100, help='每个路由的请求数')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--server', action='store_true', help='启动本地 HTTP 服务器，而不是使用 Flask 测试客户端')
+    parser.add_argument('--concurrency', type=int, default=4, help='--server 模式下的并发线程数')
+    parser.add_argument('--cache', action='store_true', help='允许页面缓存（默认带 nocache=1 测量实际渲染）')
+    parser.add_argument('--routes', help='只运行名称包含该文字的路由，逗号分隔')
+    parser.add_argument('--password', default='password123', help='生成用户的密码')
+    parser.add_argument('--admin-password', default='admin123')
+    parser.add_argument('--output', default='bench_results', help='结果保存目录')
+    parser.add_argument('--compare', help='与之前保存的结果文件对比')
+    args = parser.parse_args()
+
+    temporary = args.database is None
+    if temporary:
+        db_fd, path = tempfile.mkstemp(suffix='.db')
+    else:
+        path = os.path.abspath(args.database)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    import app as blog
+    import seed_data
+
+    app = blog.create_app({'WTF_CSRF_ENABLED': False, 'RATE_LIMIT_ENABLED': False, 'PASSWORD_HASH_WORKERS': 0})
+    with app.app_context():
+        blog.bootstrap()
+        if temporary:
+            password_hash = app.extensions['password_hasher'].hash(args.password)
+            seed_data.seed(path, args.users, args.posts, args.comments, password_hash)
+        counts = {table: blog.db.session.execute(text(f'SELECT count(*) FROM "{table}"')).scalar()
+                  for table in ('user', 'post', 'comment')}
+        samples = Samples(blog, args.password, args.admin_password, random.Random(1))
+        queries = QueryCounter()
+        event.listen(blog.db.engine, 'before_cursor_execute', queries)
+
+    if args.server:
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        make_client, concurrency = (lambda: HTTPClient(base_url)), args.concurrency
+    else:
+        # 测试客户端在当前线程内处理请求，只能顺序执行
+        make_client, concurrency = (lambda: TestClient(app)), 1
+
+    wanted = args.routes.split(',') if args.routes else None
+    results = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'mode': 'server' if args.server else 'test_client',
+        'concurrency': concurrency,
+        'cache': args.cache,
+        'rows': counts,
+        'routes': {},
+    }
+    print(f"数据：{counts['user']} 个用户、{counts['post']} 篇文章、{counts['comment']} 条评论；"
+          f"{results['mode']}，并发 {concurrency}")
+    for route in ROUTES:
+        if wanted and not any(part in route[0] for part in wanted):
+            continue
+        results['routes'][route[0]] = run_route(route, make_client, samples, args.requests, concurrency,
+                                                args.warmup, args.cache, queries)
+        print(f'  {route[0]} 完成', flush=True)
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = json.load(f)
+    print_results(results, previous)
+
+    os.makedirs(args.output, exist_ok=True)
+    output = os.path.join(args.output, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f'结果已保存到 {output}')
+
+    if args.server:
+        server.shutdown()
+    if temporary:
+        os.close(db_fd)
+        os.remove(path)
+    failed = sum(sum(stats['errors'].values()) for stats in results['routes'].values())
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染 instance/blog.db
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+
+from sqlalchemy import insert
+
+from app import create_app, db, ensure_schema, rebuild_search_index, reconcile_counters, search_index, User, Post, Comment
+
+app = create_app()
+
+SENTENCES = [
+    '已经起床，可身体还未苏醒。', '其实如果早起出门跑个步是很好的一个选择。', '在这样的清晨，在广州还有些热。',
+    '崭新的道路，稀少的行人，几乎没有车辆。', '我还没有属于自己的小车。', '老家虽是在村里，但现在四通的都是宽宽的水泥路。',
+    '大城市道路虽宽广，可是公共交通更适合我这随性的人。', '这共享单车不就派上用场了。', '我有一辆美利达公爵山地车。',
+    '这两年听歌很少，倒是很喜欢听电台。', '或许去城市中心，或许去城市边缘，很适合我。', 'Python and Flask make a small blog easy.',
+    '周末写了一篇关于 SQLite 全文搜索的笔记。', '今天的晚霞很好看，拍了几张照片。', '读完了一本关于城市规划的书。',
+]
+# 高频词会命中大量文章，低频词（随机生成的词语）只命中少数文章
+QUERIES = ['山地车', '电台', '城市边缘', 'python', '晚霞 照片', '车']
+
+def random_word(rng):
+    return ''.join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(3))
+
+def random_text(rng, sentences, words=None):
+    parts = []
+    for _ in range(sentences):
+        word = random_word(rng)
+        if words is not None:
+            words.append(word)
+        parts.append(rng.choice(SENTENCES) + word)
+    return ''.join(parts)
+
+def seed(posts, comments_per_post, rng):
+    rare_words = []
+    ensure_schema()
+    db.session.execute(insert(User), [{'username': f'user{i}', 'password': 'x'} for i in range(100)])
+    base = datetime(2020, 1, 1)
+    batch = []
+    for i in range(posts):
+        words = rare_words if i % max(posts // 3, 1) == 0 else None
+        batch.append({'title': random_text(rng, 2)[:100], 'content': random_text(rng, 40, words),
+                      'date_posted': base + timedelta(minutes=i), 'user_id': rng.randint(1, 100)})
+        if len(batch) == 5000:
+            db.session.execute(insert(Post), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Post), batch)
+    db.session.execute(insert(Comment), [
+        {'content': random_text(rng, 3), 'date_posted': base, 'user_id': rng.randint(1, 100),
+         'post_id': rng.randint(1, posts)}
+        for _ in range(posts * comments_per_post)
+    ])
+    db.session.commit()
+    # 批量插入绕过了计数器，统一回填
+    reconcile_counters()
+    return rare_words[::40][:3]
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description='全文搜索基准测试')
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments-per-post', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with app.app_context():
+        started = time.perf_counter()
+        rare_words = seed(args.posts, args.comments_per_post, rng)
+        print(f'生成 {args.posts} 篇文章、{args.posts * args.comments_per_post} 条评论：{time.perf_counter() - started:.1f} 秒')
+
+        started = time.perf_counter()
+        counts = rebuild_search_index()
+        print(f"重建索引（{counts['post_fts']} 篇文章、{counts['comment_fts']} 条评论）：{time.perf_counter() - started:.1f} 秒")
+        print(f'数据库大小：{os.path.getsize(db_path) / 1024 / 1024:.1f} MB\n')
+
+        print(f"{'查询':<12}{'FTS5 (ms)':>12}{'LIKE (ms)':>12}{'命中':>8}")
+        for query in QUERIES + rare_words:
+            with app.test_request_context():
+                fts_ms = timed(lambda: search_index(query, 1, 20), args.repeat)
+                hits = len(search_index(query, 1, 20)[0])
+            term = query.split()[0]
+            like_ms = timed(lambda: Post.query.filter(
+                Post.title.contains(term) | Post.content.contains(term)
+            ).order_by(Post.date_posted.desc()).limit(20).all(), args.repeat)
+            print(f'{query:<12}{fts_ms:>12.2f}{like_ms:>12.2f}{hits:>8}')
+
+    os.close(db_fd)
+    os.remove(db_path)
+
+if __name__ == '__main__':
+    main()
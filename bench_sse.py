@@ -0,0 +1,123 @@
+import argparse
+import logging
+import os
+import selectors
+import socket
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# 使用临时数据库，避免污染 instance/blog.db
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+
+from werkzeug.serving import make_server
+
+from app import create_app, db, ensure_schema, User, Post
+from broadcast import Broadcaster
+
+app = create_app({'WTF_CSRF_ENABLED': False, 'SSE_MAX_SUBSCRIBERS': 100000})
+
+def seed():
+    with app.app_context():
+        ensure_schema()
+        admin = User(username='admin', password='x')
+        db.session.add(admin)
+        db.session.flush()
+        post = Post(title='文章', content='内容', author=admin)
+        db.session.add(post)
+        db.session.commit()
+        return admin.id, post.id
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+def subscribers():
+    return app.extensions['broadcaster'].snapshot()['subscribers']
+
+def connect(port, post_id):
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(f'GET /community/post/{post_id}/events HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    sock.setblocking(False)
+    return sock
+
+def wait_for_event(sockets, name, timeout):
+    # 等待所有连接都收到指定事件，返回收到的连接数
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for sock in sockets:
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b''
+    pending = set(sockets)
+    marker = f'event: {name}'.encode()
+    deadline = time.perf_counter() + timeout
+    while pending and time.perf_counter() < deadline:
+        for key, _ in selector.select(timeout=0.1):
+            sock = key.fileobj
+            buffers[sock] += sock.recv(65536)
+            if marker in buffers[sock] and sock in pending:
+                pending.discard(sock)
+                selector.unregister(sock)
+    selector.close()
+    return len(sockets) - len(pending)
+
+def broadcaster_cost(count):
+    # 只计算订阅对象本身（不含连接和线程）的内存
+    broadcaster = Broadcaster(max_subscribers=count)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [broadcaster.subscribe('post:%d' % (i % 100)) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(kept)
+
+def main():
+    parser = argparse.ArgumentParser(description='评论推送连接数与每个订阅者的内存')
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    admin_id, post_id = seed()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(admin_id)
+        sess['_fresh'] = True
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    baseline = rss_kb()
+    started = time.perf_counter()
+    sockets = [connect(server.server_port, post_id) for _ in range(args.connections)]
+    while subscribers() < args.connections and time.perf_counter() - started < args.timeout:
+        time.sleep(0.05)
+    connected = subscribers()
+    elapsed = time.perf_counter() - started
+    memory = rss_kb() - baseline
+
+    started = time.perf_counter()
+    response = client.post(f'/api/posts/{post_id}/comments', json={'content': '新评论'})
+    assert response.status_code == 201
+    received = wait_for_event(sockets, 'created', args.timeout)
+    fanout = time.perf_counter() - started
+
+    print(f'连接数：{connected} / {args.connections}（建立用时 {elapsed:.2f} 秒）')
+    print(f'进程内存增加：{memory / 1024:.1f} MB，每个连接 {memory / max(connected, 1):.1f} KB（含线程栈和套接字）')
+    print(f'订阅对象本身：每个 {broadcaster_cost(10000):.0f} 字节')
+    print(f'广播一条评论：{received} 个连接收到，用时 {fanout * 1000:.1f}ms')
+
+    for sock in sockets:
+        sock.close()
+    server.shutdown()
+    os.close(db_fd)
+    os.remove(db_path)
+    return 0 if connected == args.connections and received == connected else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# 在全新的解释器中导入 WSGI 入口并处理第一个请求，测量 worker 冷启动耗时
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import wsgi
+imported = time.perf_counter()
+response = wsgi.app.test_client().get('/community', buffered=True)
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'first_request': served - imported,
+    'status': response.status_code,
+    'heavy_modules': [name for name in ('PIL', 'passlib') if name in sys.modules],
+}))
+'''
+
+def file_state(db_path):
+    return [(os.stat(path).st_mtime_ns, os.stat(path).st_size) if os.path.exists(path) else None
+            for path in (db_path, db_path + '-wal')]
+
+def main():
+    parser = argparse.ArgumentParser(description='worker 冷启动耗时')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + db_path)
+
+    failures = 0
+    try:
+        # 初始化命令可以重复执行
+        for _ in range(2):
+            subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'bootstrap'],
+                           cwd=root, env=env, check=True, capture_output=True)
+        conn = sqlite3.connect(db_path)
+        admins, posts = conn.execute(
+            "SELECT (SELECT count(*) FROM user WHERE username = 'admin'), (SELECT count(*) FROM post)").fetchone()
+        conn.close()
+        if (admins, posts) != (1, 1):
+            failures += 1
+            print(f'✗ 重复初始化后有 {admins} 个管理员、{posts} 篇文章')
+
+        imports, requests = [], []
+        for _ in range(args.runs):
+            before = file_state(db_path)
+            output = subprocess.run([sys.executable, '-c', CHILD], cwd=root, env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            imports.append(result['import'])
+            requests.append(result['first_request'])
+            # 只读请求不应修改数据库文件
+            if file_state(db_path) != before or result['status'] != 200 or result['heavy_modules']:
+                failures += 1
+                print(f"✗ 状态码 {result['status']}，数据库文件{'已' if file_state(db_path) != before else '未'}修改，"
+                      f"已导入 {result['heavy_modules']}")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    print(f'{"阶段":<12}{"p50":>10}{"最大":>10}')
+    for name, values in (('导入与创建应用', imports), ('首个请求', requests)):
+        print(f'{name:<12}{statistics.median(values) * 1000:>8.1f}ms{max(values) * 1000:>8.1f}ms')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
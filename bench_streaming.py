@@ -0,0 +1,93 @@
+import argparse
+import http.client
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染 instance/blog.db
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+
+from werkzeug.serving import make_server
+
+from app import create_app, db, ensure_schema, User, Post
+
+app = create_app()
+
+MODES = [
+    ('整页渲染', False, 'identity'),
+    ('流式渲染', True, 'identity'),
+    ('流式 + gzip', True, 'gzip'),
+    ('流式 + br', True, 'br'),
+]
+
+def seed(posts):
+    with app.app_context():
+        ensure_schema()
+        admin = User(username='admin', password='x')
+        db.session.add(admin)
+        db.session.flush()
+        base = datetime(2024, 1, 1)
+        for i in range(posts):
+            db.session.add(Post(title=f'文章 {i}', content='已经起床，可身体还未苏醒。' * 30, author=admin,
+                                date_posted=base + timedelta(minutes=i)))
+        db.session.commit()
+        return admin.id
+
+def fetch(port, path, encoding, cookie):
+    headers = {'Accept-Encoding': encoding}
+    if cookie:
+        headers['Cookie'] = cookie
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    started = time.perf_counter()
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - started
+    body = first + response.read()
+    total = time.perf_counter() - started
+    conn.close()
+    return ttfb, total, len(body), response.status
+
+def main():
+    parser = argparse.ArgumentParser(description='大页面首字节时间与传输字节数')
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--per-page', type=int, default=500, help='社区文章流每页文章数')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app.config['POSTS_PER_PAGE'] = args.per_page
+    admin_id = seed(args.posts)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(admin_id)
+        sess['_fresh'] = True
+    admin_cookie = 'session=' + client.get_cookie('session').value
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    pages = [(f'/community?nocache=1（{args.per_page} 篇）', '/community?nocache=1', None),
+             (f'/admin（{args.posts} 篇）', '/admin', admin_cookie)]
+    for title, path, cookie in pages:
+        print(title)
+        print(f"  {'模式':<14}{'首字节 p50':>12}{'完成 p50':>12}{'传输字节':>12}")
+        for name, stream, encoding in MODES:
+            app.config['STREAM_TEMPLATES'] = stream
+            results = [fetch(server.server_port, path, encoding, cookie) for _ in range(args.runs)]
+            assert all(status == 200 for *_, status in results)
+            ttfb = statistics.median(result[0] for result in results) * 1000
+            total = statistics.median(result[1] for result in results) * 1000
+            print(f'  {name:<14}{ttfb:>10.1f}ms{total:>10.1f}ms{results[0][2]:>12}')
+
+    server.shutdown()
+    os.close(db_fd)
+    os.remove(db_path)
+
+if __name__ == '__main__':
+    main()
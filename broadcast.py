@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# 进程内发布/订阅：文章详情页通过 Server-Sent Events 接收评论的新增、删除和置顶
+#
+# 每个订阅只是一个小对象和一个待发送列表，空闲的订阅者阻塞在所在频道的条件变量上，
+# 不占用 CPU。每个频道保留最近的事件，断线重连时按 Last-Event-ID 补发；没有订阅者的频道
+# 最多保留 max_idle_channels 个，超出时丢弃最早空闲的频道。
+# 只有本进程内提交的写操作会被广播，多进程部署见 README。
+import itertools
+import threading
+from collections import OrderedDict, deque
+
+class Subscription:
+    __slots__ = ('channel', 'pending', 'overflowed')
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = []
+        self.overflowed = False
+
+class Broadcaster:
+    def __init__(self, history=100, max_pending=100, max_subscribers=10000, max_idle_channels=1000):
+        self.history = history
+        self.max_pending = max_pending
+        self.max_subscribers = max_subscribers
+        self.max_idle_channels = max_idle_channels
+        self.lock = threading.Lock()
+        # 频道 -> (条件变量, 订阅集合, 最近事件)
+        self.channels = {}
+        self.idle = OrderedDict()
+        self.subscribers = 0
+        self.ids = itertools.count(1)
+        self.stats = {'published': 0, 'delivered': 0, 'overflows': 0, 'rejected': 0}
+
+    def _channel(self, name):
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.channels[name] = (threading.Condition(self.lock), set(), deque(maxlen=self.history))
+        return channel
+
+    def watched(self, name):
+        # 频道有订阅者或仍保留着补发用的事件
+        return name in self.channels
+
+    def subscribe(self, name, last_event_id=None):
+        with self.lock:
+            if self.subscribers >= self.max_subscribers:
+                self.stats['rejected'] += 1
+                return None
+            _, subscriptions, recent = self._channel(name)
+            self.idle.pop(name, None)
+            subscription = Subscription(name)
+            if last_event_id is not None:
+                subscription.pending.extend(event for event in recent if event[0] > last_event_id)
+            subscriptions.add(subscription)
+            self.subscribers += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            channel = self.channels.get(subscription.channel)
+            if channel is None or subscription not in channel[1]:
+                return
+            channel[1].discard(subscription)
+            self.subscribers -= 1
+            if not channel[1]:
+                self.idle[subscription.channel] = True
+                while len(self.idle) > self.max_idle_channels:
+                    name, _ = self.idle.popitem(last=False)
+                    del self.channels[name]
+
+    def publish(self, name, event, data):
+        with self.lock:
+            # 从未有人订阅的频道不保存事件
+            if name not in self.channels:
+                return
+            condition, subscriptions, recent = self.channels[name]
+            item = (next(self.ids), event, data)
+            recent.append(item)
+            self.stats['published'] += 1
+            for subscription in subscriptions:
+                # 长时间不读取的订阅者不再积压事件，断开后由客户端重连补发
+                if len(subscription.pending) >= self.max_pending:
+                    subscription.overflowed = True
+                    self.stats['overflows'] += 1
+                    continue
+                subscription.pending.append(item)
+            condition.notify_all()
+
+    def listen(self, subscription, timeout):
+        # 返回待发送的事件列表，超时返回空列表；积压溢出时返回 None
+        with self.lock:
+            condition = self.channels[subscription.channel][0]
+            if not subscription.pending and not subscription.overflowed:
+                condition.wait(timeout)
+            if subscription.overflowed:
+                return None
+            events, subscription.pending = subscription.pending, []
+            self.stats['delivered'] += len(events)
+            return events
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, subscribers=self.subscribers, channels=len(self.channels))
@@ -0,0 +1,176 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+# 归档导出/导入检查：导出后导入到新数据库，逐行比对；导入中途中断（归档被截断）后重新执行能从断点继续；
+# zip 归档附带头像文件；旧版本归档导入后重新计算派生列；导出过程中的写入不影响导出的快照（使用临时数据库和目录）
+work_dir = tempfile.mkdtemp()
+source_path = os.path.join(work_dir, 'source.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + source_path
+
+from sqlalchemy import text
+
+import archive
+import seed_data
+from avatars import AVATAR_SIZES, avatar_filename
+from app import create_app, db, ensure_schema, bootstrap
+
+def table_digest(path, table):
+    conn = sqlite3.connect(path)
+    digest = hashlib.sha256()
+    for row in conn.execute(f'SELECT * FROM "{table}" ORDER BY id'):
+        digest.update(repr(row).encode())
+    conn.close()
+    return digest.hexdigest()
+
+def make_app(path, avatar_folder):
+    return create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, 'AVATAR_FOLDER': avatar_folder,
+                       'PASSWORD_HASH_WORKERS': 0})
+
+def check(failures, name, ok, detail=''):
+    print(f"{'✓' if ok else '✗'} {name}{'：' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def main():
+    failures = []
+    source_avatars = os.path.join(work_dir, 'avatars')
+    os.makedirs(source_avatars)
+    app = make_app(source_path, source_avatars)
+    with app.app_context():
+        bootstrap()
+    seed_data.seed(source_path, 200, 2000, 20000, 'x')
+    # 给两个用户设置同一个头像，zip 归档应包含它的各个尺寸，每个文件只写一次
+    digest = 'a' * 64
+    for size, pixels in AVATAR_SIZES.items():
+        with open(os.path.join(source_avatars, avatar_filename(digest, size)), 'wb') as f:
+            f.write(b'webp' * pixels)
+    conn = sqlite3.connect(source_path)
+    conn.execute('UPDATE "user" SET profile_picture = ? WHERE id IN (2, 3)', (digest,))
+    conn.commit()
+    conn.close()
+
+    gz_path = os.path.join(work_dir, 'blog.jsonl.gz')
+    zip_path = os.path.join(work_dir, 'blog.zip')
+    with app.app_context(), db.engine.connect() as conn:
+        counts = archive.export_archive(conn, gz_path, batch_size=500)
+        zip_counts = archive.export_archive(conn, zip_path, source_avatars, batch_size=500)
+    check(failures, '导出', counts['comment'] == 20000 and zip_counts.get('avatars') == 3, str(zip_counts))
+
+    # 截断的归档模拟导入中途中断：已提交的批次保留，重新导入完整归档时从断点继续
+    partial_path = os.path.join(work_dir, 'partial.jsonl.gz')
+    with gzip.open(gz_path, 'rb') as f:
+        data = f.read()
+    with gzip.open(partial_path, 'wb') as f:
+        # 在评论部分的中间截断
+        start = data.index(b'["comment"')
+        f.write(data[:start + (len(data) - start) // 2])
+    target_path = os.path.join(work_dir, 'target.db')
+    target = make_app(target_path, os.path.join(work_dir, 'restored'))
+    with target.app_context():
+        ensure_schema()
+        with db.engine.connect() as conn:
+            try:
+                archive.import_archive(conn, partial_path, batch_size=1000)
+                interrupted = False
+            except ValueError:
+                interrupted = True
+        partial_comments = db.session.execute(text('SELECT count(*) FROM comment')).scalar()
+        db.session.remove()
+        with db.engine.connect() as conn:
+            resumed = archive.import_archive(conn, gz_path, batch_size=1000)
+        check(failures, '中断后继续导入', interrupted and 0 < partial_comments < 20000
+              and partial_comments + resumed['comment'] == 20000,
+              f'中断前 {partial_comments} 条评论，继续导入 {resumed["comment"]} 条')
+        with db.engine.connect() as conn:
+            try:
+                archive.import_archive(conn, gz_path)
+                rejected = False
+            except archive.ArchiveError:
+                rejected = True
+        check(failures, '拒绝导入到非空数据库', rejected)
+        indexed = db.session.execute(text('SELECT count(*) FROM comment_fts')).scalar()
+        check(failures, '搜索索引', indexed == 20000, f'{indexed} 条评论')
+
+    for table in archive.TABLES:
+        same = table_digest(source_path, table) == table_digest(target_path, table)
+        check(failures, f'{table} 表逐行一致', same)
+
+    zip_target = os.path.join(work_dir, 'zip.db')
+    restored = os.path.join(work_dir, 'restored-zip')
+    target = make_app(zip_target, restored)
+    with target.app_context():
+        ensure_schema()
+        with db.engine.connect() as conn:
+            archive.import_archive(conn, zip_path, restored)
+    files = sorted(os.listdir(restored)) if os.path.isdir(restored) else []
+    check(failures, 'zip 归档恢复头像', len(files) == 3 and table_digest(source_path, 'user') == table_digest(zip_target, 'user'),
+          f'{len(files)} 个文件')
+
+    # 旧版本的归档没有 hot_score 和 received_comment_count 列：导入后按文章和评论重新计算，与源数据库一致
+    old_path = os.path.join(work_dir, 'old.jsonl.gz')
+    with gzip.open(gz_path, 'rt', encoding='utf-8') as source, gzip.open(old_path, 'wt', encoding='utf-8') as out:
+        header = json.loads(source.readline())
+        dropped = {'post': header['columns']['post'].index('hot_score'),
+                   'user': header['columns']['user'].index('received_comment_count')}
+        for table, index in dropped.items():
+            del header['columns'][table][index]
+        out.write(json.dumps(header, ensure_ascii=False) + '\n')
+        for line in source:
+            row = json.loads(line)
+            if row[0] in dropped:
+                del row[dropped[row[0]] + 1]
+            out.write(json.dumps(row, ensure_ascii=False) + '\n')
+    old_target = os.path.join(work_dir, 'old.db')
+    target = make_app(old_target, os.path.join(work_dir, 'restored-old'))
+    with target.app_context():
+        ensure_schema()
+        with db.engine.connect() as conn:
+            archive.import_archive(conn, old_path)
+    conn = sqlite3.connect(source_path)
+    conn.execute('ATTACH DATABASE ? AS old', (old_target,))
+    drift = conn.execute('SELECT max(abs(a.hot_score - b.hot_score)) FROM main.post a JOIN old.post b USING (id)'
+                         ).fetchone()[0]
+    mismatched, received = conn.execute(
+        'SELECT sum(a.received_comment_count != b.received_comment_count), sum(b.received_comment_count) '
+        'FROM main.user a JOIN old.user b USING (id)').fetchone()
+    conn.close()
+    check(failures, '导入旧版本归档', drift < 1e-6 and mismatched == 0 and received == 20000,
+          f'热度最大偏差 {drift:.1e}，收到评论数不一致的用户 {mismatched} 个')
+
+    # WAL 模式下导出不阻塞写入：第一批评论读出后另一个连接写入一条评论，导出的仍是开始时的快照
+    conn = sqlite3.connect(source_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.close()
+    iter_rows = archive.iter_rows
+
+    def write_midway(conn, table, batch_size, after=0):
+        for index, rows in enumerate(iter_rows(conn, table, batch_size, after)):
+            yield rows
+            if table == 'comment' and index == 0:
+                writer = sqlite3.connect(source_path, timeout=1)
+                columns = ', '.join(row[1] for row in writer.execute('PRAGMA table_info(comment)') if row[1] != 'id')
+                writer.execute(f'INSERT INTO comment ({columns}) SELECT {columns} FROM comment WHERE id = 1')
+                writer.commit()
+                writer.close()
+
+    archive.iter_rows = write_midway
+    try:
+        with app.app_context(), db.engine.connect() as conn:
+            snapshot = archive.export_archive(conn, os.path.join(work_dir, 'snapshot.jsonl.gz'), batch_size=500)
+            written = conn.exec_driver_sql('SELECT count(*) FROM comment').scalar()
+    finally:
+        archive.iter_rows = iter_rows
+    check(failures, '导出期间的写入', snapshot['comment'] == 20000 and written == 20001,
+          f'导出 {snapshot["comment"]} 条评论，数据库中 {written} 条')
+
+    shutil.rmtree(work_dir)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
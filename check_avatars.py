@@ -0,0 +1,82 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+from functools import partial
+
+# 头像处理检查：旧头像的清理与其他用户换用同一头像交错时，后者的文件会重新生成；
+# 不是图片的上传在请求中被拒绝（使用临时数据库和目录）
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+avatar_dir = tempfile.mkdtemp()
+
+from PIL import Image
+
+from app import create_app, db, ensure_schema, apply_avatar, User
+
+app = create_app({
+    'TESTING': True,
+    'WTF_CSRF_ENABLED': False,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+    'AVATAR_FOLDER': avatar_dir,
+    'RATE_LIMIT_ENABLED': False,
+})
+
+def check(failures, name, ok, detail=''):
+    print(f"{'✓' if ok else '✗'} {name}{'：' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def image_bytes(color, format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, format)
+    return buffer.getvalue()
+
+def main():
+    failures = []
+    processor = app.extensions['avatar_processor']
+    with app.app_context():
+        ensure_schema()
+        users = [User(username=name, password='x') for name in ('alice', 'bob')]
+        db.session.add_all(users)
+        db.session.commit()
+        alice, bob = (user.id for user in users)
+
+    # alice 使用头像 D；bob 上传同一张图片，后台任务看到文件已存在而跳过渲染，
+    # 提交之前 alice 换成头像 E，D 无人引用而被删除；bob 的任务提交时应重新生成 D
+    red, blue = image_bytes('red'), image_bytes('blue')
+    digest, future = processor.submit(alice, red)
+    future.result()
+    skipped = processor.exists(digest)
+    other, future = processor.submit(alice, blue)
+    future.result()
+    removed = not processor.exists(digest)
+    apply_avatar(app, bob, digest, partial(processor.ensure, red, digest))
+    with app.app_context():
+        picture = db.session.get(User, bob).profile_picture
+    check(failures, '清理与换用交错', skipped and removed and picture == digest and processor.exists(digest),
+          f'bob 的头像文件{"存在" if processor.exists(digest) else "缺失"}')
+
+    # 改了扩展名的文本文件：直接提示失败，不提交后台任务
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(alice)
+        sess['_fresh'] = True
+    files = set(os.listdir(avatar_dir))
+    form = {'settings-username': 'alice', 'settings-theme_preference': 'light'}
+    response = client.post('/settings', data=dict(form, **{'settings-profile_picture': (io.BytesIO(b'not an image'), 'a.png')}),
+                           content_type='multipart/form-data', follow_redirects=True)
+    text = response.get_data(as_text=True)
+    check(failures, '拒绝无效图片', '不是有效的 JPG 或 PNG 图片' in text and set(os.listdir(avatar_dir)) == files)
+    response = client.post('/settings', data=dict(form, **{'settings-profile_picture': (io.BytesIO(image_bytes('green', 'JPEG')), 'b.jpg')}),
+                           content_type='multipart/form-data', follow_redirects=True)
+    check(failures, '接受有效图片', '新头像处理完成后自动生效' in response.get_data(as_text=True))
+    processor.executor.shutdown(wait=True)
+
+    os.close(db_fd)
+    os.remove(db_path)
+    shutil.rmtree(avatar_dir)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+
+# 响应压缩检查：按 Accept-Encoding 的质量值选择编码，q=0 表示拒绝该编码，此时返回未压缩的内容；
+# 预压缩的静态资源同样按质量值选择 .br/.gz 文件（使用临时数据库和目录）
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+import assets
+from app import create_app, db, ensure_schema, User, Post
+
+app = create_app({
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+    'RATE_LIMIT_ENABLED': False,
+})
+
+# (Accept-Encoding, 期望的 Content-Encoding；None 表示不压缩)
+CASES = [
+    ('gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=0, identity', None),
+    ('', None),
+]
+
+def check(failures, name, ok, detail=''):
+    print(f"{'✓' if ok else '✗'} {name}{'：' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def main():
+    failures = []
+    with app.app_context():
+        ensure_schema()
+        user = User(username='alice', password='x')
+        db.session.add_all([Post(title=f'文章 {i}', content='内容' * 100, author=user) for i in range(10)])
+        db.session.commit()
+
+    client = app.test_client()
+    cases = CASES + ([('br', 'br'), ('br;q=0', None)] if app.extensions['compressor'].brotli else [])
+    for header, expected in cases:
+        response = client.get('/community', headers={'Accept-Encoding': header}, buffered=True)
+        encoding = response.headers.get('Content-Encoding')
+        body = response.get_data()
+        if encoding == expected == 'gzip':
+            body = gzip.decompress(body)
+        elif encoding == expected == 'br':
+            body = app.extensions['compressor'].brotli.decompress(body)
+        readable = body.lstrip().startswith(b'<!')
+        check(failures, f'Accept-Encoding: {header or "（无）"}', encoding == expected and readable,
+              f'Content-Encoding {encoding or "identity"}')
+
+    # 预压缩的静态资源：客户端拒绝的编码回退到下一种，都被拒绝时返回原文件
+    folder = tempfile.mkdtemp()
+    for name in ('app.css', 'app.css.br', 'app.css.gz'):
+        open(os.path.join(folder, name), 'wb').close()
+    for header, expected in (('br, gzip', 'app.css.br'), ('br;q=0, gzip', 'app.css.gz'),
+                             ('br;q=0, gzip;q=0', 'app.css'), ('', 'app.css')):
+        encoding, path = assets.pick_encoding(folder, 'app.css', parse_accept_header(header, Accept))
+        check(failures, f'静态资源 Accept-Encoding: {header or "（无）"}', path == expected, path)
+    shutil.rmtree(folder)
+
+    os.close(db_fd)
+    os.remove(db_path)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
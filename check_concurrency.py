@@ -0,0 +1,159 @@
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# 并发压力测试：多个进程同时读取页面和发表评论，模拟多 worker 部署。
+# 每个子进程都会重新导入应用，因此应用只在子进程中导入。
+
+def load_app(db_path, profile):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ['DATABASE_PROFILE'] = profile
+    import app as blog
+    # 异常直接抛出，便于统计 "database is locked"
+    return blog, blog.create_app({'WTF_CSRF_ENABLED': False, 'PROPAGATE_EXCEPTIONS': True,
+                                  'RATE_LIMIT_ENABLED': False})
+
+def seed(db_path, profile, posts):
+    blog, app = load_app(db_path, profile)
+    with app.app_context():
+        blog.ensure_schema()
+        users = [blog.User(username=f'user{i}', password='x') for i in range(8)]
+        blog.db.session.add_all(users)
+        blog.db.session.flush()
+        for i in range(posts):
+            blog.db.session.add(blog.Post(title=f'文章 {i}', content='内容' * 200, author=users[i % len(users)]))
+        blog.db.session.commit()
+        return blog.dbengine.describe(blog.db.engine)
+
+def worker(role, index, db_path, profile, posts, duration, results):
+    from sqlalchemy.exc import OperationalError
+
+    blog, app = load_app(db_path, profile)
+    client = app.test_client()
+    if role == 'writer':
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(index % 8 + 1)
+            sess['_fresh'] = True
+
+    done, locked, failed, latencies = 0, 0, 0, []
+    deadline = time.perf_counter() + duration
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        post_id = (index * 7 + n) % posts + 1
+        started = time.perf_counter()
+        try:
+            if role == 'writer':
+                response = client.post(f'/community/post/{post_id}', data={'content': f'评论 {index}-{n}'})
+                ok = response.status_code == 302
+            elif n % 2:
+                ok = client.get('/community?nocache=1', buffered=True).status_code == 200
+            else:
+                ok = client.get(f'/community/post/{post_id}?nocache=1', buffered=True).status_code == 200
+        except OperationalError as error:
+            ok = False
+            if 'locked' in str(error):
+                locked += 1
+                failed -= 1
+            with app.app_context():
+                blog.db.session.rollback()
+        latencies.append(time.perf_counter() - started)
+        if ok:
+            done += 1
+        else:
+            failed += 1
+    results.put((role, done, locked, failed, latencies))
+
+def verify(db_path):
+    # 成功发表的评论数与文章、用户的评论计数列（包括作者收到的评论数）必须一致
+    conn = sqlite3.connect(db_path)
+    try:
+        comments = conn.execute('SELECT count(*) FROM comment').fetchone()[0]
+        mismatched = conn.execute(
+            'SELECT count(*) FROM post WHERE comment_count != '
+            '(SELECT count(*) FROM comment WHERE comment.post_id = post.id)'
+        ).fetchone()[0] + conn.execute(
+            'SELECT count(*) FROM user WHERE comment_count != '
+            '(SELECT count(*) FROM comment WHERE comment.user_id = user.id) OR received_comment_count != '
+            '(SELECT count(*) FROM comment JOIN post ON post.id = comment.post_id WHERE post.user_id = user.id)'
+        ).fetchone()[0]
+        return comments, mismatched
+    finally:
+        conn.close()
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] * 1000
+
+def run(profile, args, ctx):
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+    try:
+        with ctx.Pool(1) as pool:
+            settings = pool.apply(seed, (db_path, profile, args.posts))
+        results = ctx.Queue()
+        processes = [ctx.Process(target=worker, args=(role, i, db_path, profile, args.posts, args.duration, results))
+                     for role, count in (('reader', args.readers), ('writer', args.writers))
+                     for i in range(count)]
+        for process in processes:
+            process.start()
+        rows = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        comments, mismatched = verify(db_path)
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    stats = {}
+    for role in ('reader', 'writer'):
+        role_rows = [row for row in rows if row[0] == role]
+        stats[role] = {
+            'done': sum(row[1] for row in role_rows),
+            'locked': sum(row[2] for row in role_rows),
+            'failed': sum(row[3] for row in role_rows),
+            'latencies': [latency for row in role_rows for latency in row[4]],
+        }
+    return settings, stats, comments, mismatched
+
+def main():
+    parser = argparse.ArgumentParser(description='并发读写压力测试')
+    parser.add_argument('--profile', action='append', help='要测试的引擎配置档，默认测试全部')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--posts', type=int, default=50)
+    args = parser.parse_args()
+
+    from dbengine import PROFILES
+    profiles = args.profile or list(PROFILES)
+    ctx = multiprocessing.get_context('spawn')
+
+    failures = 0
+    for profile in profiles:
+        settings, stats, comments, mismatched = run(profile, args, ctx)
+        print(f"配置档 {profile}: journal_mode={settings['journal_mode']} synchronous={settings['synchronous']} "
+              f"busy_timeout={settings['busy_timeout']}ms")
+        for role, name in (('reader', '读取'), ('writer', '写入')):
+            role_stats = stats[role]
+            print(f"  {name}: {role_stats['done'] / args.duration:.1f} 次/秒，"
+                  f"p50 {percentile(role_stats['latencies'], 50):.1f}ms，p95 {percentile(role_stats['latencies'], 95):.1f}ms，"
+                  f"database is locked {role_stats['locked']} 次，其他失败 {role_stats['failed']} 次")
+        consistent = comments == stats['writer']['done'] and not mismatched
+        print(f"  评论 {comments} 条（成功写入 {stats['writer']['done']} 次），计数不一致的文章和用户 {mismatched} 个")
+        # production 配置档不允许出现任何错误
+        if profile == 'production' and (not consistent or any(stats[role]['locked'] or stats[role]['failed']
+                                                             for role in stats)):
+            failures += 1
+            print('✗ production 配置档在并发读写下出现错误')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
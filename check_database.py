@@ -1,4 +1,6 @@
-from app import app, db, User, Post
+from app import create_app, db, User, Post
+
+app = create_app()
 
 with app.app_context():
     # 检查用户数量
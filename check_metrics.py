@@ -0,0 +1,123 @@
+import logging
+import os
+import re
+import sys
+import tempfile
+
+from flask.logging import default_handler
+from sqlalchemy import event
+
+# 性能指标检查：请求计数、SQL 计数、慢查询日志（不含参数）、访问限制（代理转发、Bearer 令牌）和采样分析器输出（使用临时数据库和目录）
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+profile_dir = tempfile.mkdtemp()
+
+from app import create_app, db, ensure_schema, User, Post
+
+app = create_app({
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+    'METRICS_SLOW_QUERY_SECONDS': 0,
+    'PROFILER_ENABLED': True,
+    'PROFILER_THRESHOLD': 0,
+    'PROFILER_INTERVAL': 0.001,
+    'PROFILER_FOLDER': profile_dir,
+    'METRICS_TOKEN': 'scrape-token',
+})
+
+class Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def sample_value(text, name, **labels):
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = re.escape(name + ('{' + label_text + '}' if labels else '')) + r' (\S+)'
+    match = re.search(pattern, text)
+    return float(match.group(1)) if match else None
+
+def main():
+    with app.app_context():
+        ensure_schema()
+        user = User(username='alice', password='x')
+        db.session.add(user)
+        for i in range(30):
+            db.session.add(Post(title=f'文章 {i}', content='内容' * 100, author=user))
+        db.session.commit()
+        engine = db.engine
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    # 阈值为 0 时每条 SQL 都会记录，只收集不输出
+    handler = Collect()
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+
+    client = app.test_client()
+    for _ in range(3):
+        client.get('/community?nocache=1', buffered=True)
+    community_queries = len(statements)
+
+    failures = []
+    remote = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+    if remote.status_code != 403:
+        failures.append(f'非本机匿名访问 /metrics 返回 {remote.status_code}，应为 403')
+    # 未设置 PROXY_FIX_HOPS 时，经代理转发的请求来源总是本机，不能按地址放行；Bearer 令牌不受来源限制
+    proxied = client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.9'})
+    if proxied.status_code != 403:
+        failures.append(f'经代理转发的匿名请求访问 /metrics 返回 {proxied.status_code}，应为 403')
+    scrape = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.1'},
+                        headers={'Authorization': 'Bearer scrape-token'})
+    wrong = client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.1'}, headers={'Authorization': 'Bearer x'})
+    if scrape.status_code != 200 or wrong.status_code != 403:
+        failures.append(f'Bearer 令牌访问 /metrics 返回 {scrape.status_code}，错误令牌返回 {wrong.status_code}')
+    # 设置 PROXY_FIX_HOPS 后按 X-Forwarded-For 中的真实地址判断
+    proxy_app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path, 'PROXY_FIX_HOPS': 1})
+    forwarded = [proxy_app.test_client().get('/metrics', headers={'X-Forwarded-For': address}).status_code
+                 for address in ('203.0.113.9', '127.0.0.1')]
+    if forwarded != [403, 200]:
+        failures.append(f'PROXY_FIX_HOPS=1 时外部地址、本机地址访问 /metrics 返回 {forwarded}，应为 [403, 200]')
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+    if response.status_code != 200 or not response.content_type.startswith('text/plain'):
+        failures.append(f'本机访问 /metrics 返回 {response.status_code} {response.content_type}')
+
+    checks = [
+        ('请求数', sample_value(text, 'blog_request_duration_seconds_count', endpoint='blog.community'), 3),
+        ('SQL 次数', sample_value(text, 'blog_sql_queries_total', endpoint='blog.community'), community_queries),
+        ('状态码计数', sample_value(text, 'blog_requests_total', endpoint='blog.community', method='GET', status=200), 3),
+        ('+Inf 区间', sample_value(text, 'blog_request_duration_seconds_bucket', endpoint='blog.community', le='+Inf'), 3),
+    ]
+    for name, actual, expected in checks:
+        status = '✓' if actual == expected else '✗'
+        print(f'{status} {name}：{actual}（预期 {expected}）')
+        if actual != expected:
+            failures.append(name)
+
+    slow_logs = [message for message in handler.messages if message.startswith('慢查询') and 'FROM post' in message]
+    print(f"{'✓' if slow_logs else '✗'} 慢查询日志：{len(slow_logs)} 条")
+    if not slow_logs:
+        failures.append('慢查询日志')
+    # 慢查询日志只有 SQL 文本，不包含绑定参数
+    client.get('/search?q=secretterm', buffered=True)
+    leaked = [message for message in handler.messages if 'secretterm' in message]
+    print(f"{'✗' if leaked else '✓'} 慢查询日志不记录参数：{len(leaked)} 条含参数")
+    if leaked:
+        failures.append('慢查询日志不记录参数')
+
+    folded = os.path.join(profile_dir, 'blog.community.folded')
+    stacks = open(folded, encoding='utf-8').read().splitlines() if os.path.exists(folded) else []
+    print(f"{'✓' if stacks else '✗'} 采样分析器：{len(stacks)} 条调用栈")
+    if not stacks:
+        failures.append('采样分析器')
+
+    for failure in failures:
+        print('✗ ' + failure)
+    os.close(db_fd)
+    os.remove(db_path)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
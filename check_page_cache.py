@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+# 页面缓存检查：多个进程共享失效日志时，一个进程的失效只删除其他进程中带有相同标签的缓存项，
+# 日志被替换后其他进程清空本地缓存（使用临时目录）
+import pagecache
+from pagecache import PageCache
+
+def check(failures, name, ok, detail=''):
+    print(f"{'✓' if ok else '✗'} {name}{'：' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def fill(cache):
+    for key, tags in (('/community', ['feed']), ('/post/1', ['post:1']), ('/post/2', ['post:2']),
+                      ('/feed.xml', ['syndication'])):
+        cache.set(key, key.encode(), 'text/html', tags, cache.generation)
+
+def worker(log_path, commands, results):
+    # 在子进程中维护自己的缓存，按命令失效或读取
+    cache = PageCache(1024 * 1024, log_path)
+    fill(cache)
+    results.put('ready')
+    for command, value in iter(commands.get, None):
+        if command == 'invalidate':
+            cache.invalidate(value)
+            results.put('done')
+        else:
+            results.put(sorted(key for key in ('/community', '/post/1', '/post/2', '/feed.xml')
+                               if cache.get(key) is not None))
+
+def main():
+    failures = []
+    work_dir = tempfile.mkdtemp()
+    log_path = os.path.join(work_dir, 'page_cache.log')
+    commands, results = multiprocessing.Queue(), multiprocessing.Queue()
+    child = multiprocessing.Process(target=worker, args=(log_path, commands, results))
+    child.start()
+    results.get()
+
+    cache = PageCache(1024 * 1024, log_path)
+    fill(cache)
+    cache.invalidate(['post:1'])
+    commands.put(('get', None))
+    remaining = results.get()
+    check(failures, '其他进程按标签失效', remaining == ['/community', '/feed.xml', '/post/2'], str(remaining))
+
+    commands.put(('invalidate', ['feed']))
+    results.get()
+    remaining = [key for key in ('/community', '/post/2', '/feed.xml') if cache.get(key) is not None]
+    check(failures, '重放其他进程的失效', remaining == ['/post/2', '/feed.xml'], str(remaining))
+
+    # 日志超过上限时换成新文件，其他进程清空本地缓存
+    fill(cache)
+    pagecache.LOG_MAX_BYTES = 0
+    cache.invalidate(['post:2'])
+    pagecache.LOG_MAX_BYTES = 1024 * 1024
+    commands.put(('get', None))
+    remaining = results.get()
+    check(failures, '日志替换后清空', remaining == [], str(remaining))
+    check(failures, '替换日志的进程保留其他缓存', cache.get('/community') is not None and cache.get('/post/2') is None)
+
+    commands.put(None)
+    child.join()
+    shutil.rmtree(work_dir)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染 instance/blog.db
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+
+from sqlalchemy import event
+
+from app import create_app, db, ensure_schema, User, Post, Comment
+
+app = create_app({'WTF_CSRF_ENABLED': False})
+
+# 每个路由允许的 SQL 查询数量上限，与文章和评论数量无关
+QUERY_BUDGETS = {
+    '社区文章流': ('/community', None, 1),
+    '首页（已登录）': ('/', 'alice', 2),
+    '文章详情': ('/post/{post_id}', None, 1),
+    '社区文章详情': ('/community/post/{post_id}', 'alice', 3),
+    '作者主页': ('/user/alice', None, 2),
+    '作者主页（按ID）': ('/user_profile/{user_id}', 'bob', 3),
+    '文章流 API': ('/api/posts', None, 1),
+    '管理面板': ('/admin', 'admin', 6),
+    '用户管理': ('/admin/users', 'admin', 3),
+    '文章管理': ('/admin/posts?author=alice', 'admin', 3),
+    '评论管理': ('/admin/comments?q=文章', 'admin', 3),
+    '搜索': ('/search?q=评论', None, 3),
+    'RSS 订阅源': ('/feed.xml', None, 1),
+    '作者 Atom 订阅源': ('/user/alice/atom.xml', None, 2),
+    '站点地图': ('/sitemap.xml?page=1', None, 1),
+    '作者站点地图索引': ('/user/alice/sitemap.xml', None, 2),
+}
+
+# 列表类路由只读取摘要，不允许查询文章正文
+LISTING_ROUTES = {'社区文章流', '首页（已登录）', '作者主页', '作者主页（按ID）', '文章流 API', '管理面板', '文章管理'}
+
+@contextmanager
+def count_queries(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+def seed():
+    ensure_schema()
+    users = [User(username=name, password='x') for name in ('admin', 'alice', 'bob', 'carol')]
+    db.session.add_all(users)
+    db.session.flush()
+    base = datetime(2024, 1, 1)
+    for i in range(40):
+        author = users[i % len(users)]
+        post = Post(title=f'文章 {i}', content='内容' * 200, author=author,
+                    date_posted=base + timedelta(hours=i))
+        db.session.add(post)
+        for j in range(i % 5):
+            db.session.add(Comment(content=f'评论 {j}', author=users[j % len(users)], post=post,
+                                   date_posted=base + timedelta(hours=i, minutes=j)))
+    db.session.commit()
+
+def main():
+    with app.app_context():
+        seed()
+        user_ids = {user.username: user.id for user in User.query.all()}
+        post_id = Post.query.filter(Post.comment_count > 0).first().id
+        engine = db.engine
+
+    # 每个请求使用独立的应用上下文，与线上行为一致
+    failures = 0
+    for name, (url, username, budget) in QUERY_BUDGETS.items():
+        url = url.format(post_id=post_id, user_id=user_ids['alice'])
+        client = app.test_client()
+        if username:
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(user_ids[username])
+                sess['_fresh'] = True
+        with count_queries(engine) as statements:
+            response = client.get(url, buffered=True)
+        reads_content = name in LISTING_ROUTES and any('post.content' in statement for statement in statements)
+        if response.status_code != 200 or len(statements) > budget or reads_content:
+            failures += 1
+            note = '，读取了文章正文' if reads_content else ''
+            print(f'✗ {name} {url}: 状态码 {response.status_code}，{len(statements)} 次查询（上限 {budget}）{note}')
+            for statement in statements:
+                print('    ' + ' '.join(statement.split())[:160])
+        else:
+            print(f'✓ {name} {url}: {len(statements)} 次查询（上限 {budget}）')
+
+    # 匿名页面第二次访问应命中页面缓存，不执行任何查询；带 ETag 的条件请求返回 304
+    client = app.test_client()
+    with count_queries(engine) as statements:
+        response = client.get('/community', buffered=True)
+    conditional = client.get('/community', buffered=True, headers={'If-None-Match': response.headers.get('ETag', '')})
+    if response.headers.get('X-Cache') != 'HIT' or statements or conditional.status_code != 304:
+        failures += 1
+        print(f"✗ 页面缓存 /community: X-Cache {response.headers.get('X-Cache')}，{len(statements)} 次查询，条件请求状态码 {conditional.status_code}")
+    else:
+        print('✓ 页面缓存 /community: 命中缓存，0 次查询，条件请求返回 304')
+
+    # 站点地图索引不列出空区间：id 恰好填满最后一页时没有多余的一页，作者索引只列出含有其文章的区间
+    app.config['SITEMAP_PAGE_SIZE'] = 10
+    site = client.get('/sitemap.xml', buffered=True).get_data(as_text=True).count('<sitemap>')
+    with app.app_context():
+        dave = User(username='dave', password='x')
+        db.session.add(Post(title='文章 40', content='内容', author=dave))
+        db.session.commit()
+    author = client.get('/user/dave/sitemap.xml', buffered=True).get_data(as_text=True)
+    if site != 4 or author.count('<sitemap>') != 1 or 'page=5' not in author:
+        failures += 1
+        print(f'✗ 站点地图索引: 40 篇文章 {site} 页（应为 4 页），dave 的索引 {author.count("<sitemap>")} 页（应为 1 页）')
+    else:
+        print('✓ 站点地图索引: 40 篇文章 4 页，dave 的索引只列出第 5 页')
+
+    os.close(db_fd)
+    os.remove(db_path)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
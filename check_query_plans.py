@@ -0,0 +1,158 @@
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# 使用临时数据库，避免污染 instance/blog.db
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+
+from sqlalchemy import event, text
+
+from app import create_app, db, ensure_schema, encode_cursor, User, Post, Comment
+
+app = create_app({'WTF_CSRF_ENABLED': False})
+
+# 需要检查执行计划的路由：(地址, 登录用户, 是否允许临时排序)
+# 按前缀筛选后再按日期排序、按作者筛选后对区间去重时，排序只作用于索引筛选出的行，允许使用临时排序
+ROUTES = {
+    '社区文章流': ('/community', None, False),
+    '社区文章流（下一页）': ('/community?before={cursor}', None, False),
+    '社区文章流（热门）': ('/community?sort=hot', None, False),
+    '社区文章流（热门下一页）': ('/community?sort=hot&before={hot_cursor}', None, False),
+    '社区文章流（讨论最多下一页）': ('/community?sort=discussed&before={discussed_cursor}', None, False),
+    '热门文章 API': ('/api/posts?sort=hot&after={hot_cursor}', None, False),
+    '首页（已登录）': ('/', 'alice', False),
+    '文章详情': ('/post/{post_id}', None, False),
+    '社区文章详情': ('/community/post/{post_id}', 'alice', False),
+    '作者主页': ('/user/alice', None, False),
+    '作者主页（下一页）': ('/user/alice?before={cursor}', None, False),
+    '作者主页（按ID）': ('/user_profile/{user_id}', 'bob', False),
+    '文章流 API': ('/api/posts?before={cursor}', None, False),
+    '作者文章 API': ('/api/posts?user=alice', None, False),
+    '搜索': ('/search?q=评论', None, False),
+    'RSS 订阅源': ('/feed.xml', None, False),
+    '作者订阅源': ('/user/alice/feed.json', None, False),
+    '站点地图索引': ('/sitemap.xml', None, False),
+    '站点地图': ('/sitemap.xml?page=1', None, False),
+    '作者站点地图索引': ('/user/alice/sitemap.xml', None, True),
+    '作者站点地图': ('/user/alice/sitemap.xml?page=1', None, False),
+    '管理面板': ('/admin', 'admin', False),
+    '用户管理': ('/admin/users', 'admin', False),
+    '用户管理（用户名前缀）': ('/admin/users?q=al', 'admin', True),
+    '文章管理': ('/admin/posts', 'admin', False),
+    '文章管理（筛选）': ('/admin/posts?author=alice&from=2024-01-02&to=2024-01-05', 'admin', False),
+    '文章管理（标题前缀）': ('/admin/posts?q=文章 1', 'admin', True),
+    '评论管理': ('/admin/comments?from=2024-01-02', 'admin', False),
+}
+
+WHERE_RE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+PAREN_RE = re.compile(r'\([^()]*\)')
+
+def outer_clause(statement):
+    # 去掉括号里的子查询，只留下外层语句
+    while True:
+        stripped = PAREN_RE.sub('', statement)
+        if stripped == statement:
+            return statement
+        statement = stripped
+
+def seed():
+    ensure_schema()
+    users = [User(username=name, password='x') for name in ('admin', 'alice', 'bob', 'carol')]
+    # 足够多的用户，让用户名前缀筛选走索引
+    db.session.add_all(users + [User(username=f'reader{i}', password='x') for i in range(100)])
+    db.session.flush()
+    base = datetime(2024, 1, 1)
+    for i in range(200):
+        post = Post(title=f'文章 {i}', content='内容' * 50, author=users[i % len(users)],
+                    date_posted=base + timedelta(hours=i))
+        db.session.add(post)
+        for j in range(i % 5):
+            db.session.add(Comment(content=f'评论 {j}', author=users[j % len(users)], post=post,
+                                   date_posted=base + timedelta(hours=i, minutes=j), is_pinned=j == 3))
+    db.session.commit()
+    # 让查询规划器使用真实的统计信息
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+
+def plan_problems(conn, statement, parameters, allow_temp_sort):
+    plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    details = [row[-1] for row in plan]
+    problems = []
+    for detail in details:
+        # 常量行和物化后的子查询结果不是数据表
+        if detail == 'SCAN CONSTANT ROW' or detail.startswith('SCAN anon_'):
+            continue
+        if detail.startswith('SCAN ') and 'VIRTUAL TABLE' not in detail:
+            # 没有过滤条件的整表遍历只有在按索引（或主键）顺序读取、读到 LIMIT 即停止时才可以接受
+            outer = outer_clause(statement)
+            in_order = 'USING' in detail or (
+                'LIMIT' in outer.upper() and not any('USE TEMP B-TREE' in d for d in details))
+            if WHERE_RE.search(outer) or not in_order:
+                problems.append(detail)
+        # 全文搜索按相关度排序、统计查询对分组结果排序，参与排序的行数有限，允许临时排序
+        elif ('USE TEMP B-TREE' in detail and not allow_temp_sort
+              and '_fts' not in statement and 'GROUP BY' not in statement):
+            problems.append(detail)
+    return problems, details
+
+def main():
+    with app.app_context():
+        seed()
+        user_ids = {user.username: user.id for user in User.query.all()}
+        post_id = Post.query.filter(Post.comment_count > 0).first().id
+        middle = Post.query.order_by(Post.date_posted.desc(), Post.id.desc()).offset(50).first()
+        cursor = encode_cursor(middle)
+        hot_cursor = encode_cursor(Post.query.order_by(Post.hot_score.desc(), Post.id.desc()).offset(50).first(), 'hot')
+        discussed_cursor = encode_cursor(
+            Post.query.order_by(Post.comment_count.desc(), Post.id.desc()).offset(50).first(), 'discussed')
+        engine = db.engine
+
+    failures = 0
+    for name, (url, username, allow_temp_sort) in ROUTES.items():
+        url = url.format(post_id=post_id, user_id=user_ids['alice'], cursor=cursor, hot_cursor=hot_cursor,
+                         discussed_cursor=discussed_cursor)
+        client = app.test_client()
+        if username:
+            with client.session_transaction() as sess:
+                sess['_user_id'] = str(user_ids[username])
+                sess['_fresh'] = True
+
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = client.get(url, buffered=True)
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+        route_problems = []
+        with engine.connect() as conn:
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                problems, details = plan_problems(conn, statement, parameters, allow_temp_sort)
+                if problems:
+                    route_problems.append((statement, details))
+
+        if response.status_code != 200 or route_problems:
+            failures += 1
+            print(f'✗ {name} {url}: 状态码 {response.status_code}')
+            for statement, details in route_problems:
+                print('    ' + ' '.join(statement.split())[:160])
+                for detail in details:
+                    print('      ' + detail)
+        else:
+            print(f'✓ {name} {url}: {len(statements)} 条查询均使用索引')
+
+    os.close(db_fd)
+    os.remove(db_path)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
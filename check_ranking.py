@@ -0,0 +1,141 @@
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# 热门排序检查：发表和删除评论时增量更新的热度与按评论重新计算的结果一致，
+# 按热度、评论数翻页不重复不遗漏，排序页面随评论失效缓存而订阅源不失效，评论和文章增删后计数器一致（使用临时数据库）
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+
+import ranking
+from app import create_app, db, ensure_schema, encode_cursor, reconcile_counters, User, Post, Comment
+
+app = create_app({
+    'TESTING': True,
+    'WTF_CSRF_ENABLED': False,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+    'RATE_LIMIT_ENABLED': False,
+    'POSTS_PER_PAGE': 7,
+})
+
+def check(failures, name, ok, detail=''):
+    print(f"{'✓' if ok else '✗'} {name}{'：' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def log_in(client, user_id):
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+def walk(client, sort, direction='before', cursor=None):
+    # 沿游标翻完整个列表，返回文章 id 的顺序
+    ids = []
+    while True:
+        url = f'/api/posts?sort={sort}' + (f'&{direction}={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        posts = data['posts'] if direction == 'before' else data['posts'][::-1]
+        ids.extend(post['id'] for post in posts)
+        cursor = data['older_cursor'] if direction == 'before' else data['newer_cursor']
+        if not cursor:
+            return ids
+
+def main():
+    failures = []
+    now = datetime.utcnow()
+    with app.app_context():
+        ensure_schema()
+        users = [User(username=name, password='x') for name in ('admin', 'alice', 'bob')]
+        db.session.add_all(users)
+        db.session.flush()
+        # 40 篇文章，每 6 小时一篇；部分旧文章有较多评论
+        posts = [Post(title=f'文章 {i}', content='内容', author=users[i % 2 + 1],
+                      date_posted=now - timedelta(hours=6 * (40 - i))) for i in range(40)]
+        db.session.add_all(posts)
+        db.session.flush()
+        for i, post in enumerate(posts):
+            for j in range((i * 7) % 11 if i % 3 == 0 else 0):
+                db.session.add(Comment(content=f'评论 {j}', author=users[2], post=post,
+                                       date_posted=post.date_posted + timedelta(minutes=10 * j)))
+        fresh = Post(title='新文章', content='内容', author=users[1])
+        db.session.add(fresh)
+        db.session.commit()
+        user_ids, fresh_id = [user.id for user in users], fresh.id
+        check(failures, '新文章的热度', abs(fresh.hot_score - ranking.activity(fresh.date_posted)) < 1e-9,
+              f'{fresh.hot_score:.4f}')
+        checked, drifted = ranking.refresh_scores(db.session.connection())
+        db.session.rollback()
+        check(failures, '批量写入评论后的热度', checked == 41 and drifted == 0, f'{drifted}/{checked} 篇有偏差')
+        target = posts[3].id
+
+    client = app.test_client()
+    page = client.get('/community?sort=hot', buffered=True)
+    check(failures, '热门页面', page.status_code == 200 and page.headers.get('X-Cache') == 'MISS'
+          and client.get('/community?sort=hot', buffered=True).headers.get('X-Cache') == 'HIT')
+    before = walk(client, 'hot')
+    if target in before[:3]:
+        failures.append('测试数据')
+    client.get('/feed.xml', buffered=True)
+
+    # 通过页面发表评论：文章的热度增加、排名上升，超过没有评论的最新文章，排序页面的缓存失效
+    commenter = app.test_client()
+    log_in(commenter, user_ids[1])
+    for _ in range(3):
+        commenter.post(f'/community/post/{target}', data={'content': '新评论'})
+    after = walk(client, 'hot')
+    check(failures, '评论后排名上升', after.index(target) < min(before.index(target), after.index(fresh_id)),
+          f'第 {before.index(target) + 1} 名 -> 第 {after.index(target) + 1} 名')
+    check(failures, '评论后缓存失效', client.get('/community?sort=hot', buffered=True).headers.get('X-Cache') == 'MISS')
+    check(failures, '评论不失效订阅源', client.get('/feed.xml', buffered=True).headers.get('X-Cache') == 'HIT')
+
+    # 逐条删除和批量删除评论后回到原来的排名；对数减法的误差由 refresh_scores 修正
+    with app.app_context():
+        comments = Comment.query.filter_by(post_id=target).order_by(Comment.id.desc()).limit(3).all()
+        comment_ids = [comment.id for comment in comments]
+    for comment_id in comment_ids[:2]:
+        commenter.post(f'/comment/{comment_id}/delete')
+    admin = app.test_client()
+    log_in(admin, user_ids[0])
+    admin.post('/admin/comments/bulk', data={'action': 'delete', 'ids': comment_ids[2:]})
+    restored = walk(client, 'hot')
+    with app.app_context():
+        incremental = db.session.get(Post, target).hot_score
+        checked, drifted = ranking.refresh_scores(db.session.connection())
+        db.session.commit()
+        exact = db.session.get(Post, target).hot_score
+    check(failures, '删除评论后恢复原排名', restored == before and abs(incremental - exact) < 1e-6,
+          f'增量结果偏差 {abs(incremental - exact):.2e}，重新计算修正 {drifted} 篇')
+
+    # 各种排序都能沿游标向后、再从最后一篇向前翻完，结果与直接排序一致
+    with app.app_context():
+        expected, last_cursors = {}, {}
+        for sort, column in (('new', Post.date_posted), ('hot', Post.hot_score), ('discussed', Post.comment_count)):
+            ordered = Post.query.order_by(column.desc(), Post.id.desc()).all()
+            expected[sort] = [post.id for post in ordered]
+            last_cursors[sort] = encode_cursor(ordered[-1], sort)
+    for sort, ids in expected.items():
+        forward = walk(client, sort)
+        backward = walk(client, sort, 'after', last_cursors[sort])
+        check(failures, f'{sort} 排序翻页', forward == ids and backward == ids[-2::-1], f'{len(forward)} 篇')
+    html = client.get('/community?sort=discussed', buffered=True).get_data(as_text=True)
+    link = re.search(r'href="([^"]*)" class="btn btn-secondary pagination-older"', html)
+    check(failures, '翻页链接保留排序', link is not None and 'sort=discussed' in link.group(1))
+    check(failures, '未知排序按发布时间', client.get('/api/posts?sort=unknown').get_json()['posts'][0]['id']
+          == expected['new'][0])
+
+    # 表单发表、逐条删除、批量删除评论和删除带评论的文章之后，各计数器（包括作者收到的评论数）与实际行数一致
+    owner = app.test_client()
+    log_in(owner, user_ids[2])
+    owner.post(f'/post/{target}/delete')
+    with app.app_context():
+        drift = {name: rows for name, (rows, _) in reconcile_counters(fix=False).items() if rows}
+        received = db.session.get(User, user_ids[2]).received_comment_count
+    check(failures, '计数器与实际行数一致', not drift and received > 0, str(drift or received))
+
+    os.close(db_fd)
+    os.remove(db_path)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 限流与降载检查：令牌桶的扣减和补充、429/503 响应、按用户计数且被拒绝时不扣 IP 令牌，以及多进程共享的 SQLite 存储
+# （使用临时数据库和目录）
+db_fd, db_path = tempfile.mkstemp(suffix='.db')
+store_dir = tempfile.mkdtemp()
+
+from app import create_app, db, ensure_schema, User, Post
+from ratelimit import Limit, MemoryStore, SQLiteStore, parse_limit
+
+app = create_app({
+    'TESTING': True,
+    'WTF_CSRF_ENABLED': False,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + db_path,
+    'RATE_LIMITS': {
+        'login': {'ip': '3/minute'},
+        'comment': {'ip': '100/minute', 'user': '2/minute'},
+        'preferences': {'ip': '3/minute', 'user': '2/minute'},
+    },
+    'LOAD_SHED_QUEUE_SECONDS': 1.0,
+})
+
+def take_many(path, count, results):
+    store = SQLiteStore(path)
+    limit = Limit(0.001, 30)
+    results.put(sum(1 for _ in range(count) if store.take([('shared', limit)]) == 0))
+
+def check(failures, name, ok, detail=''):
+    print(f"{'✓' if ok else '✗'} {name}{'：' + detail if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+def main():
+    with app.app_context():
+        ensure_schema()
+        users = [User(username=f'user{i}', password='x') for i in range(2)]
+        db.session.add_all(users)
+        db.session.flush()
+        post = Post(title='文章', content='内容', author=users[0])
+        db.session.add(post)
+        db.session.commit()
+        user_ids, post_id = [user.id for user in users], post.id
+
+    failures = []
+
+    # 令牌桶：容量用完后按速率补充
+    store, limit = MemoryStore(), parse_limit('2/second')
+    waits = [store.take([('k', limit)], now=0.0) for _ in range(3)] + [store.take([('k', limit)], now=0.5)]
+    check(failures, '令牌桶扣减与补充', waits[:2] == [0, 0] and waits[2] == 0.5 and waits[3] == 0, str(waits))
+
+    client = app.test_client()
+    codes = [client.post('/login', data={'username': 'nobody', 'password': 'x'}).status_code for _ in range(4)]
+    limited = client.post('/login', data={'username': 'nobody', 'password': 'x'})
+    check(failures, '登录按 IP 限流', codes == [200, 200, 200, 429] and limited.headers.get('Retry-After') == '20',
+          f'{codes}，Retry-After {limited.headers.get("Retry-After")}')
+    check(failures, '浏览登录页不受限', client.get('/login').status_code == 200)
+    other = client.post('/login', data={'username': 'nobody', 'password': 'x'}, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    check(failures, '其他 IP 不受影响', other.status_code == 200, str(other.status_code))
+
+    # 同一用户换 IP 发表评论仍然按用户计数
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_ids[0])
+        sess['_fresh'] = True
+    codes = [client.post(f'/api/posts/{post_id}/comments', json={'content': '评论'},
+                         environ_base={'REMOTE_ADDR': f'10.0.1.{i}'}).status_code for i in range(2)]
+    response = client.post(f'/community/post/{post_id}', data={'content': '评论'},
+                           environ_base={'REMOTE_ADDR': '10.0.1.9'})
+    api = client.post(f'/api/posts/{post_id}/comments', json={'content': '评论'})
+    check(failures, '评论按用户限流', codes == [201, 201] and response.status_code == 429 and api.status_code == 429
+          and api.get_json().get('status') == 'error', f'{codes} {response.status_code} {api.status_code}')
+    codes = [client.post('/api/update-theme', json={'theme': 'dark'}).status_code for _ in range(3)]
+    check(failures, '设置接口限流', codes == [200, 200, 429], str(codes))
+    # 被用户限额拒绝的请求不消耗 IP 的令牌，同一 IP 的其他用户还剩一次
+    neighbour = app.test_client()
+    with neighbour.session_transaction() as sess:
+        sess['_user_id'] = str(user_ids[1])
+        sess['_fresh'] = True
+    codes = [neighbour.post('/api/update-theme', json={'theme': 'dark'}).status_code for _ in range(2)]
+    check(failures, '用户限额拒绝时不扣 IP 令牌', codes == [200, 429], str(codes))
+
+    # 降载：排队时间超过阈值的写请求返回 503，浏览不受影响
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_ids[1])
+    stale = f't={time.time() - 5:.3f}'
+    shed = client.post(f'/api/posts/{post_id}/comments', json={'content': '评论'}, headers={'X-Request-Start': stale})
+    fresh = client.post(f'/api/posts/{post_id}/comments', json={'content': '评论'},
+                        headers={'X-Request-Start': str(int(time.time() * 1000))})
+    browse = client.get(f'/community/post/{post_id}', headers={'X-Request-Start': stale})
+    check(failures, '排队过久时降载', shed.status_code == 503 and 'Retry-After' in shed.headers
+          and fresh.status_code == 201 and browse.status_code == 200,
+          f'{shed.status_code} {fresh.status_code} {browse.status_code}')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    check(failures, '拒绝计数', 'blog_rejected_requests_total{reason="rate_limit",scope="login"} 2' in text
+          and 'blog_rejected_requests_total{reason="overload",scope="comment"} 1' in text)
+
+    # 多个进程共享 SQLite 存储：总放行数等于桶容量
+    path = os.path.join(store_dir, 'ratelimit.db')
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=take_many, args=(path, 20, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    granted = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    check(failures, 'SQLite 存储跨进程共享', granted == 30, f'4 个进程共放行 {granted} 次（容量 30）')
+
+    os.close(db_fd)
+    os.remove(db_path)
+    shutil.rmtree(store_dir)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
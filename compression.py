@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# 响应压缩：按 Accept-Encoding 对 HTML 和 JSON 响应做 gzip/brotli 压缩
+#
+# 普通响应整体压缩，过小的响应不压缩；流式响应逐块压缩并立即刷新，
+# 客户端仍然可以边接收边解析。已经带有 Content-Encoding 的响应（如预压缩的静态资源）不处理。
+import zlib
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+class GzipStream:
+    def __init__(self, level):
+        # wbits=31：带 gzip 头和校验的 deflate 流
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self.compressor.flush(zlib.Z_FINISH)
+
+class BrotliStream:
+    def __init__(self, brotli, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+class ResponseCompressor:
+    def __init__(self, mimetypes, min_size=500, gzip_level=6, brotli_quality=5):
+        self.mimetypes = set(mimetypes)
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli = _brotli()
+
+    def choose(self, accept_encodings):
+        # 按质量值判断：'gzip' in accept_encodings 对 gzip;q=0 也成立，而 q=0 表示客户端拒绝该编码
+        if self.brotli is not None and accept_encodings['br'] > 0:
+            return 'br'
+        if accept_encodings['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def stream(self, encoding):
+        if encoding == 'br':
+            return BrotliStream(self.brotli, self.brotli_quality)
+        return GzipStream(self.gzip_level)
+
+    def compress(self, request, response):
+        response.vary.add('Accept-Encoding')
+        if (request.method == 'HEAD' or response.direct_passthrough or response.status_code < 200
+                or response.status_code in (204, 304) or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.mimetypes):
+            return response
+        encoding = self.choose(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self._compress_chunks(response.iter_encoded(), response.response, self.stream(encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            stream = self.stream(encoding)
+            response.set_data(stream.compress(data) + stream.finish())
+
+        response.content_encoding = encoding
+        # 压缩后的内容与原始内容字节不同，ETag 改为弱校验，条件请求仍然可以匹配
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _compress_chunks(self, chunks, source, stream):
+        try:
+            for chunk in chunks:
+                data = stream.compress(chunk)
+                if data:
+                    yield data
+            yield stream.finish()
+        finally:
+            # 客户端提前断开时也要关闭原始迭代器，释放请求上下文
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
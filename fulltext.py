@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+# 全文搜索：SQLite FTS5 索引 + 中文二元分词
+#
+# unicode61 分词器会把连续的汉字当成一个词，因此写入索引前先在 Python 中
+# 把中日韩文字切成重叠的二元组（"中文字" -> "中文 文字 字"），英文和数字保持
+# 原样。查询使用同样的切分，并把每个词的二元组组成短语，保证相邻匹配。
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import text
+
+CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+WORD_RE = re.compile(r'\w+')
+
+SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5(title, content, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5(content, tokenize='unicode61 remove_diacritics 2')",
+]
+
+# 标题命中的权重高于正文
+POST_RANK = 'bm25(post_fts, 10.0, 1.0)'
+COMMENT_RANK = 'bm25(comment_fts)'
+
+def split_word(word):
+    # 把一个词拆成汉字段和非汉字段
+    pos = 0
+    for match in CJK_RE.finditer(word):
+        if match.start() > pos:
+            yield False, word[pos:match.start()]
+        yield True, match.group()
+        pos = match.end()
+    if pos < len(word):
+        yield False, word[pos:]
+
+def tokenize(text):
+    tokens = []
+    for word in WORD_RE.findall(text.lower()):
+        for is_cjk, segment in split_word(word):
+            if not is_cjk:
+                tokens.append(segment)
+                continue
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+            # 末尾单字单独索引，单字查询才能命中
+            tokens.append(segment[-1])
+    return tokens
+
+def index_text(text):
+    return ' '.join(tokenize(text or ''))
+
+def query_terms(query):
+    # 查询中的每个词（汉字段按整段计），用于构造 MATCH 表达式和高亮
+    terms = []
+    for word in WORD_RE.findall(query.lower()):
+        terms.extend(segment for _, segment in split_word(word))
+    return terms
+
+def match_expression(query):
+    phrases = []
+    for term in query_terms(query):
+        if CJK_RE.fullmatch(term) and len(term) == 1:
+            # 单字：前缀匹配覆盖以该字开头的二元组和末尾单字
+            phrases.append(f'"{term}"*')
+        elif CJK_RE.fullmatch(term):
+            bigrams = [term[i:i + 2] for i in range(len(term) - 1)]
+            phrases.append('"%s"' % ' '.join(bigrams))
+        else:
+            phrases.append(f'"{term}"')
+    return ' '.join(phrases)
+
+def highlight(text, query, width=120):
+    # 在原文中截取第一个命中附近的片段，并用 <mark> 标出所有命中
+    terms = sorted(set(query_terms(query)), key=len, reverse=True)
+    text = text or ''
+    if not terms:
+        return escape(text[:width])
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - width // 3) if first else 0
+    fragment = text[start:start + width]
+
+    parts = []
+    pos = 0
+    for match in pattern.finditer(fragment):
+        parts.append(escape(fragment[pos:match.start()]))
+        parts.append(Markup('<mark>%s</mark>') % match.group())
+        pos = match.end()
+    parts.append(escape(fragment[pos:]))
+
+    snippet = Markup('').join(parts)
+    if start > 0:
+        snippet = '...' + snippet
+    if start + width < len(text):
+        snippet = snippet + '...'
+    return snippet
+
+def rebuild_index(conn, batch_size=1000):
+    # 删除并重建索引表，分批读取原文写入，内存占用与数据量无关
+    for table in ('post_fts', 'comment_fts'):
+        conn.execute(text(f'DROP TABLE IF EXISTS {table}'))
+    for statement in SCHEMA:
+        conn.execute(text(statement))
+
+    sources = [
+        ('post_fts', 'SELECT id, title, content FROM post',
+         'INSERT INTO post_fts (rowid, title, content) VALUES (:id, :title, :content)',
+         lambda row: {'id': row.id, 'title': index_text(row.title), 'content': index_text(row.content)}),
+        ('comment_fts', 'SELECT id, content FROM comment',
+         'INSERT INTO comment_fts (rowid, content) VALUES (:id, :content)',
+         lambda row: {'id': row.id, 'content': index_text(row.content)}),
+    ]
+    counts = {}
+    for table, select, insert, to_params in sources:
+        counts[table] = 0
+        result = conn.execute(text(select))
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                break
+            conn.execute(text(insert), [to_params(row) for row in rows])
+            counts[table] += len(rows)
+        conn.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
+    return counts
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# 性能指标：按路由统计请求耗时直方图、SQL 次数和耗时，输出 Prometheus 文本格式
+#
+# 指标保存在进程内，多进程部署时每个 worker 各自统计，由 Prometheus 分别抓取后汇总。
+# Sampler 是可选的采样分析器：后台线程定时读取请求线程的调用栈，按
+# flamegraph.pl / speedscope 使用的折叠格式（"a;b;c 次数"）输出。
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        # 路由 -> [各区间计数..., 总耗时, 总次数]
+        self.latency = {}
+        # 路由 -> [SQL 次数, SQL 总耗时]
+        self.sql = {}
+        self.slow = {'requests': 0, 'queries': 0}
+        # (原因, 限流分组) -> 被拒绝的请求数，原因为 rate_limit 或 overload
+        self.rejected = Counter()
+
+    def observe_request(self, endpoint, method, status, seconds, queries, query_seconds):
+        with self.lock:
+            self.requests[endpoint, method, status] += 1
+            histogram = self.latency.setdefault(endpoint, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += seconds
+            histogram[-1] += 1
+            sql = self.sql.setdefault(endpoint, [0, 0.0])
+            sql[0] += queries
+            sql[1] += query_seconds
+
+    def count_slow(self, kind):
+        with self.lock:
+            self.slow[kind] += 1
+
+    def count_rejected(self, reason, scope):
+        with self.lock:
+            self.rejected[reason, scope] += 1
+
+    def render(self, extra=()):
+        # extra 为附加的 (名称, 类型, 说明, 数值) 列表，如页面缓存的命中次数
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self.lock:
+            header('blog_requests_total', 'counter', '按路由、方法和状态码统计的请求数')
+            for (endpoint, method, status), count in sorted(self.requests.items(), key=str):
+                labels = format_labels([('endpoint', endpoint), ('method', method), ('status', status)])
+                lines.append(f'blog_requests_total{labels} {count}')
+
+            header('blog_request_duration_seconds', 'histogram', '请求耗时（包括流式响应的发送时间）')
+            for endpoint, histogram in sorted(self.latency.items(), key=str):
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram):
+                    cumulative += count
+                    labels = format_labels([('endpoint', endpoint), ('le', bound)])
+                    lines.append(f'blog_request_duration_seconds_bucket{labels} {cumulative}')
+                labels = format_labels([('endpoint', endpoint), ('le', '+Inf')])
+                lines.append(f'blog_request_duration_seconds_bucket{labels} {histogram[-1]}')
+                labels = format_labels([('endpoint', endpoint)])
+                lines.append(f'blog_request_duration_seconds_sum{labels} {histogram[-2]:.6f}')
+                lines.append(f'blog_request_duration_seconds_count{labels} {histogram[-1]}')
+
+            header('blog_sql_queries_total', 'counter', '各路由执行的 SQL 语句数')
+            for endpoint, (queries, _) in sorted(self.sql.items(), key=str):
+                lines.append(f'blog_sql_queries_total{format_labels([("endpoint", endpoint)])} {queries}')
+            header('blog_sql_seconds_total', 'counter', '各路由执行 SQL 的总耗时')
+            for endpoint, (_, seconds) in sorted(self.sql.items(), key=str):
+                lines.append(f'blog_sql_seconds_total{format_labels([("endpoint", endpoint)])} {seconds:.6f}')
+
+            header('blog_slow_requests_total', 'counter', '超过阈值的慢请求数')
+            lines.append(f"blog_slow_requests_total {self.slow['requests']}")
+            header('blog_slow_queries_total', 'counter', '超过阈值的慢查询数')
+            lines.append(f"blog_slow_queries_total {self.slow['queries']}")
+
+            header('blog_rejected_requests_total', 'counter', '被限流（429）或降载（503）拒绝的请求数')
+            for (reason, scope), count in sorted(self.rejected.items()):
+                lines.append(f'blog_rejected_requests_total{format_labels([("reason", reason), ("scope", scope)])} {count}')
+
+        for name, kind, help_text, value in extra:
+            header(name, kind, help_text)
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+class Sampler:
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.lock = threading.Lock()
+        # 线程 id -> 折叠调用栈计数
+        self.targets = {}
+        self.thread = None
+
+    def start(self, thread_id):
+        with self.lock:
+            self.targets[thread_id] = Counter()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+                self.thread.start()
+
+    def stop(self, thread_id):
+        with self.lock:
+            return self.targets.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.lock:
+                if not self.targets:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[fold(frame)] += 1
+
+def fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def dump_stacks(folder, name, stacks):
+    # 同一路由的多次采样追加到同一个文件，flamegraph.pl 会合并相同的调用栈
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, name + '.folded'), 'a', encoding='utf-8') as f:
+        for stack, count in stacks.items():
+            f.write(f'{stack} {count}\n')
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# 数据库迁移：按版本号顺序执行，当前版本记录在 SQLite 的 PRAGMA user_version 中
+#
+# db.create_all() 只会创建缺失的表，不会修改已有的表，因此表结构的变化都
+# 以迁移的形式追加到 MIGRATIONS 末尾。每个迁移在单独的事务中执行，
+# 并且可以在旧版本创建的数据库（如 instance/blog.db）上重复执行。
+from sqlalchemy import inspect, text
+
+import fulltext
+import ranking
+import rendering
+
+def create_tables(conn, metadata):
+    metadata.create_all(conn)
+
+def add_post_excerpt(conn, metadata):
+    columns = {column['name'] for column in inspect(conn).get_columns('post')}
+    if 'excerpt' not in columns:
+        conn.execute(text('ALTER TABLE post ADD COLUMN excerpt TEXT'))
+    # 与 app.make_excerpt 的规则一致：超过 EXCERPT_LENGTH 字截断并加省略号
+    conn.execute(text(
+        "UPDATE post SET excerpt = CASE WHEN length(content) > :length "
+        "THEN substr(content, 1, :length) || '...' ELSE content END WHERE excerpt IS NULL"
+    ), {'length': rendering.EXCERPT_LENGTH})
+
+def create_search_index(conn, metadata):
+    if not inspect(conn).has_table('post_fts'):
+        fulltext.rebuild_index(conn)
+
+def add_query_indexes(conn, metadata):
+    # 社区文章流和游标分页：ORDER BY date_posted, id
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_post_date_posted_id ON post (date_posted, id)'))
+    # 作者主页：WHERE user_id = ? ORDER BY date_posted, id
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_post_user_id_date_posted ON post (user_id, date_posted, id)'))
+    # 文章详情页评论：WHERE post_id = ? ORDER BY is_pinned, date_posted
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_comment_post_id_pinned ON comment (post_id, is_pinned, date_posted)'))
+    # 按用户查找评论（删除用户、管理面板）
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_comment_user_id ON comment (user_id)'))
+    conn.execute(text('ANALYZE'))
+
+def add_admin_indexes(conn, metadata):
+    # 管理面板按标题、用户名前缀筛选（LIKE 不区分大小写，需要 NOCASE 索引）
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_post_title_nocase ON post (title COLLATE NOCASE)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_username_nocase ON user (username COLLATE NOCASE)'))
+    # 管理面板评论列表按日期排序、按日期范围筛选和按天统计
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_comment_date_posted ON comment (date_posted, id)'))
+    conn.execute(text('ANALYZE'))
+
+def add_user_counters(conn, metadata):
+    columns = {column['name'] for column in inspect(conn).get_columns('user')}
+    for name in ('post_count', 'comment_count'):
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE user ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0'))
+    # 管理面板按发文数、评论数排序
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_post_count ON user (post_count)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_comment_count ON user (comment_count)'))
+    # 回填计数，同时修正旧版本按 COUNT 维护时留下的空值和偏差
+    conn.execute(text('UPDATE user SET post_count = (SELECT count(*) FROM post WHERE post.user_id = user.id), '
+                      'comment_count = (SELECT count(*) FROM comment WHERE comment.user_id = user.id)'))
+    conn.execute(text('UPDATE post SET comment_count = (SELECT count(*) FROM comment WHERE comment.post_id = post.id)'))
+    conn.execute(text('ANALYZE'))
+
+def add_rendered_content(conn, metadata):
+    columns = {column['name'] for column in inspect(conn).get_columns('post')}
+    if 'content_html' not in columns:
+        conn.execute(text('ALTER TABLE post ADD COLUMN content_html TEXT'))
+    if 'renderer_version' not in columns:
+        conn.execute(text('ALTER TABLE post ADD COLUMN renderer_version INTEGER'))
+    rendering.rerender_stale(conn)
+
+def add_hot_scores(conn, metadata):
+    columns = {column['name'] for column in inspect(conn).get_columns('post')}
+    if 'hot_score' not in columns:
+        conn.execute(text('ALTER TABLE post ADD COLUMN hot_score FLOAT NOT NULL DEFAULT 0'))
+    conn.execute(text('UPDATE post SET comment_count = 0 WHERE comment_count IS NULL'))
+    ranking.refresh_scores(conn)
+    # 社区文章流按热度、评论数排序和游标分页：ORDER BY hot_score, id / comment_count, id
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_post_hot_score_id ON post (hot_score, id)'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_post_comment_count_id ON post (comment_count, id)'))
+    conn.execute(text('ANALYZE'))
+
+def add_received_comment_counts(conn, metadata):
+    columns = {column['name'] for column in inspect(conn).get_columns('user')}
+    if 'received_comment_count' not in columns:
+        conn.execute(text('ALTER TABLE user ADD COLUMN received_comment_count INTEGER NOT NULL DEFAULT 0'))
+    backfill_received_comment_counts(conn)
+
+def backfill_received_comment_counts(conn):
+    # 作者各篇文章的评论计数之和；导入旧版本的归档后也用它回填
+    conn.execute(text('UPDATE user SET received_comment_count = '
+                      '(SELECT coalesce(sum(comment_count), 0) FROM post WHERE post.user_id = user.id)'))
+
+MIGRATIONS = [
+    (1, '创建基础表', create_tables),
+    (2, '文章摘要列', add_post_excerpt),
+    (3, '全文搜索索引', create_search_index),
+    (4, '热点查询索引', add_query_indexes),
+    (5, '管理面板索引', add_admin_indexes),
+    (6, '用户计数器', add_user_counters),
+    (7, '预渲染文章正文', add_rendered_content),
+    (8, '文章热度排序', add_hot_scores),
+    (9, '作者收到的评论数', add_received_comment_counts),
+]
+
+def current_version(conn):
+    return conn.execute(text('PRAGMA user_version')).scalar()
+
+def upgrade(engine, metadata):
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        with engine.begin() as conn:
+            if current_version(conn) >= version:
+                continue
+            migrate(conn, metadata)
+            conn.execute(text(f'PRAGMA user_version = {version}'))
+        applied.append((version, description))
+    return applied
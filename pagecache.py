@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# 页面缓存：进程内 LRU，按标签精确失效
+#
+# 每个缓存项带有若干标签（如 "feed"、"post:3"），写操作提交后按标签删除
+# 相关缓存项。多进程部署时，每次失效的标签追加一行到共享的日志文件，其他
+# 进程在下次读取缓存时从上次读到的位置重放新增的行，同样只删除相关缓存项。
+# 日志超过 LOG_MAX_BYTES 时换成新文件，发现日志被替换的进程清空本地缓存。
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+CachedPage = namedtuple('CachedPage', 'body mimetype etag last_modified tags')
+
+LOG_MAX_BYTES = 1024 * 1024
+
+class PageCache:
+    def __init__(self, max_bytes, log_path=None):
+        self.max_bytes = max_bytes
+        self.log_path = log_path
+        self.entries = OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        # 新进程的缓存为空，从日志当前的末尾开始读
+        self._log_inode, self._log_offset = self._log_position()
+
+    def _log_position(self):
+        if not self.log_path:
+            return None, 0
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None, 0
+        return stat.st_ino, stat.st_size
+
+    def _sync(self):
+        # 重放其他进程追加的失效记录
+        inode, size = self._log_position()
+        if self._log_inode is None and inode is not None:
+            # 日志是本进程启动后才创建的，从头读
+            self._log_inode, self._log_offset = inode, 0
+        if inode != self._log_inode or size < self._log_offset:
+            # 日志被替换，无法知道中间失效过哪些标签，本地缓存全部作废
+            self._log_inode, self._log_offset = inode, size
+            self._clear()
+            return
+        if size == self._log_offset:
+            return
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read(size - self._log_offset)
+        # 只处理完整的行，写了一半的行留到下次
+        end = data.rfind(b'\n') + 1
+        self._log_offset += end
+        for line in data[:end].decode('utf-8').splitlines():
+            self._drop(set(line.split()))
+
+    def _append_log(self, tags):
+        if not self.log_path:
+            return
+        line = (' '.join(sorted(tags)) + '\n').encode('utf-8')
+        if self._log_offset + len(line) > LOG_MAX_BYTES:
+            # 换成新的空日志；其他进程发现 inode 变化后清空缓存，本进程已按 tags 失效，无需清空
+            temp_path = f'{self.log_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            open(temp_path, 'wb').close()
+            os.replace(temp_path, self.log_path)
+            self._log_inode, self._log_offset = self._log_position()
+        # O_APPEND 保证多个进程同时追加时每一行都完整地写在文件末尾；
+        # 写入期间日志恰好被其他进程替换时，这一行写到了旧文件里，需要在新文件中再写一次
+        while True:
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                stat = os.fstat(fd)
+            finally:
+                os.close(fd)
+            if self._log_position()[0] == stat.st_ino:
+                break
+        if self._log_inode is None:
+            self._log_inode, self._log_offset = stat.st_ino, 0
+        if stat.st_ino == self._log_inode and stat.st_size == self._log_offset + len(line):
+            # 期间没有其他进程写入，跳过自己刚写的行；否则留给下次 _sync 重放（重复失效没有副作用）
+            self._log_offset = stat.st_size
+
+    def _drop(self, tags):
+        if '*' in tags:
+            self._clear()
+            return
+        for key in [key for key, entry in self.entries.items() if entry.tags & tags]:
+            self.size -= len(self.entries.pop(key).body)
+        self.generation += 1
+
+    def _clear(self):
+        self.entries.clear()
+        self.size = 0
+        self.generation += 1
+
+    def get(self, key):
+        with self.lock:
+            self._sync()
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def set(self, key, body, mimetype, tags, generation):
+        entry = CachedPage(
+            body=body,
+            mimetype=mimetype,
+            etag=hashlib.sha1(body).hexdigest(),
+            last_modified=datetime.now(timezone.utc).replace(microsecond=0),
+            tags=frozenset(tags),
+        )
+        with self.lock:
+            # 渲染期间发生过失效，结果可能已过期，不写入缓存
+            if generation != self.generation or len(body) > self.max_bytes:
+                return entry
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self.entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.body)
+                self.stats['evictions'] += 1
+        return entry
+
+    def invalidate(self, tags):
+        tags = set(tags)
+        with self.lock:
+            self._sync()
+            self._drop(tags)
+            self.stats['invalidations'] += 1
+            self._append_log(tags)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.size, max_bytes=self.max_bytes)
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# 密码哈希：在独立的进程池中计算，避免占用 Web 线程和 GIL
+#
+# 同时提交给进程池的任务数由信号量限制（max_in_flight，不是排队上限）：超出时请求线程最多
+# 阻塞等待 timeout 秒，仍然拿不到名额时抛出 HasherBusy，调用方应返回 503。
+# 登录成功时如果存储的哈希使用了旧算法或轮数不足，会返回新的哈希用于升级。
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+# 历史上使用过的算法，仍然可以验证，验证通过后升级为当前算法
+LEGACY_SCHEMES = ['sha256_crypt']
+
+class HasherBusy(Exception):
+    pass
+
+# policy 是可哈希的 CryptContext 参数元组，可以直接传给子进程；
+# passlib 只在真正计算哈希的进程中导入，Web 进程启动时不加载
+@lru_cache(maxsize=4)
+def _context(policy):
+    from passlib.context import CryptContext
+    return CryptContext(**dict(policy))
+
+def _hash(policy, password):
+    return _context(policy).hash(password)
+
+def _verify_and_update(policy, password, stored):
+    return _context(policy).verify_and_update(password, stored)
+
+def make_policy(scheme, rounds):
+    schemes = [scheme] + [legacy for legacy in LEGACY_SCHEMES if legacy != scheme]
+    settings = {'schemes': tuple(schemes), 'deprecated': 'auto'}
+    if rounds:
+        settings[f'{scheme}__default_rounds'] = rounds
+        settings[f'{scheme}__min_rounds'] = rounds
+    return tuple(sorted(settings.items()))
+
+class PasswordHasher:
+    def __init__(self, scheme='sha256_crypt', rounds=None, workers=2, max_in_flight=16, timeout=5.0):
+        self.policy = make_policy(scheme, rounds)
+        self.workers = workers
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.executor_pid = None
+        # completed 和 hash_seconds 只统计成功的任务，抛出异常的任务（包括进程池损坏）计入 failed
+        self.stats = {'waiting': 0, 'in_flight': 0, 'max_waiting': 0, 'completed': 0, 'failed': 0, 'rejected': 0,
+                      'wait_seconds': 0.0, 'hash_seconds': 0.0}
+
+    def _get_executor(self):
+        # 进程池在首次使用时创建；预派生的多个 Web 进程各自拥有自己的进程池
+        with self.lock:
+            if self.executor is None or self.executor_pid != os.getpid():
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+                self.executor_pid = os.getpid()
+            return self.executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(self.policy, *args)
+
+        queued = time.perf_counter()
+        with self.lock:
+            self.stats['waiting'] += 1
+            self.stats['max_waiting'] = max(self.stats['max_waiting'], self.stats['waiting'])
+        acquired = self.slots.acquire(timeout=self.timeout)
+        started = time.perf_counter()
+        with self.lock:
+            self.stats['waiting'] -= 1
+            if not acquired:
+                self.stats['rejected'] += 1
+            else:
+                self.stats['in_flight'] += 1
+                self.stats['wait_seconds'] += started - queued
+        if not acquired:
+            raise HasherBusy()
+
+        succeeded = False
+        try:
+            result = self._get_executor().submit(fn, self.policy, *args).result()
+            succeeded = True
+            return result
+        except BrokenProcessPool:
+            # 子进程异常退出后进程池不可再用，丢弃它，下次调用时重建
+            with self.lock:
+                self.executor = None
+            raise
+        finally:
+            self.slots.release()
+            with self.lock:
+                self.stats['in_flight'] -= 1
+                if succeeded:
+                    self.stats['completed'] += 1
+                    self.stats['hash_seconds'] += time.perf_counter() - started
+                else:
+                    self.stats['failed'] += 1
+
+    def hash(self, password):
+        return self._run(_hash, password)
+
+    def verify(self, password, stored):
+        return self._run(_verify_and_update, password, stored)[0]
+
+    def verify_and_update(self, password, stored):
+        return self._run(_verify_and_update, password, stored)
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# 社区文章流的热门排序：评论越多、越新的文章越靠前
+#
+# 热度是按半衰期衰减的活动量之和：文章发布和每条评论各算一次活动，每过 HALF_LIFE_HOURS 小时权重减半。
+# 所有文章按同样的速度衰减，衰减本身不改变先后顺序，因此分数以固定的 EPOCH 为基准，
+# 在对数空间中记录为 log2(Σ 2^((活动时间 - EPOCH) / 半衰期))，不需要定期改写每一行：
+# 新增评论时对所在文章做一次对数加法，删除评论时做对数减法，(hot_score, id) 索引上的一次范围读取就是排好序的一页。
+# 对数减法的浮点误差和绕过 ORM 的批量修改由 refresh_scores 按评论日期重新计算来修正。
+import math
+from datetime import datetime
+
+from sqlalchemy import DateTime, text
+
+HALF_LIFE_HOURS = 12.0
+EPOCH = datetime(2020, 1, 1)
+# 重新计算时偏差小于该值的分数不改写
+TOLERANCE = 1e-9
+
+def activity(moment):
+    # 一次活动在对数空间中的分数，每晚一个半衰期加 1
+    return (moment - EPOCH).total_seconds() / 3600.0 / HALF_LIFE_HOURS
+
+def activity_sql(column):
+    # 与 activity() 相同的计算，在 SQL 中按日期列求值
+    return f"((julianday({column}) - julianday('{EPOCH:%Y-%m-%d}')) * 24.0 / {HALF_LIFE_HOURS})"
+
+def log_add(score, amount):
+    high, low = max(score, amount), min(score, amount)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+def log_sub(score, amount, floor):
+    # 结果不低于 floor（文章发布本身的活动），被减去的活动占绝大部分时不会因为抵消误差跌出范围
+    remainder = 1.0 - 2.0 ** (amount - score)
+    if remainder <= 0.0:
+        return floor
+    return max(score + math.log2(remainder), floor)
+
+def log_sum(scores):
+    high = max(scores)
+    return high + math.log2(sum(2.0 ** (score - high) for score in scores))
+
+def register_functions(dbapi_connection, connection_record):
+    # 供增量更新使用：UPDATE post SET hot_score = hot_add(hot_score, ?)，在数据库内原子地完成读改写
+    dbapi_connection.create_function('hot_add', 2, log_add, deterministic=True)
+    dbapi_connection.create_function('hot_sub', 3, log_sub, deterministic=True)
+
+def refresh_scores(conn, batch_size=1000):
+    # 按 id 分批，从文章和评论的日期重新计算热度，只改写有偏差的行；返回 (检查的篇数, 修正的篇数)
+    checked, updated, last_id = 0, 0, 0
+    while True:
+        posts = conn.execute(text(
+            'SELECT id, date_posted, hot_score FROM post WHERE id > :last_id ORDER BY id LIMIT :limit'
+        ).columns(date_posted=DateTime), {'last_id': last_id, 'limit': batch_size}).all()
+        if not posts:
+            return checked, updated
+        first_id, last_id = posts[0].id, posts[-1].id
+        activities = {post.id: [activity(post.date_posted)] for post in posts}
+        # (post_id, is_pinned, date_posted) 索引覆盖这次读取，不需要回表
+        comments = conn.execute(text(
+            'SELECT post_id, date_posted FROM comment WHERE post_id BETWEEN :first_id AND :last_id'
+        ).columns(date_posted=DateTime), {'first_id': first_id, 'last_id': last_id})
+        for comment in comments:
+            if comment.post_id in activities:
+                activities[comment.post_id].append(activity(comment.date_posted))
+        changes = []
+        for post in posts:
+            score = log_sum(activities[post.id])
+            if post.hot_score is None or abs(score - post.hot_score) > TOLERANCE:
+                changes.append({'id': post.id, 'score': score})
+        if changes:
+            conn.execute(text('UPDATE post SET hot_score = :score WHERE id = :id'), changes)
+        checked += len(posts)
+        updated += len(changes)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# 令牌桶限流：登录、注册、发表评论和设置接口按客户端 IP 和登录用户限制请求速率
+#
+# 每个键（如 "login:ip:10.0.0.1"）一个令牌桶，容量为 burst，每秒补充 rate 个令牌，
+# 每次请求消耗一个，令牌不足时返回需要等待的秒数。桶的状态只有 (令牌数, 更新时间)，
+# 补充量在取令牌时按经过的时间计算，不需要后台线程。
+# 一个请求同时计入 IP 和用户两个桶，只有所有桶都有令牌时才一起扣除：被用户限额拒绝的请求
+# 不消耗同一 IP（如 NAT 后的其他用户）的令牌。
+# MemoryStore 保存在进程内，多进程部署时每个 worker 各自计数（实际限额为 worker 数倍）；
+# SQLiteStore 把状态保存在单独的 SQLite 文件中，同一台机器上的所有 worker 共享限额。
+#
+# 降载：反向代理在 X-Request-Start 头中记录收到请求的时间，请求在代理和 worker 队列中
+# 等待过久说明服务器已经过载，此时直接拒绝开销大的写请求（抛出 Overloaded，返回 503）。
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+Limit = namedtuple('Limit', 'rate burst')
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+class Overloaded(Exception):
+    pass
+
+def parse_limit(spec):
+    # "10/minute" -> 容量 10，每 6 秒补充一个
+    count, period = spec.split('/')
+    count = int(count)
+    return Limit(count / PERIODS[period.strip()], count)
+
+def take_token(state, limit, now):
+    # 返回 (新的令牌数, 需要等待的秒数)，等待 0 秒表示放行并已扣除一个令牌
+    tokens = limit.burst if state is None else min(limit.burst, state[0] + (now - state[1]) * limit.rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / limit.rate
+
+def queue_seconds(header, now):
+    # 支持 "t=1690000000.123"（nginx $msec，秒）以及毫秒、微秒形式的时间戳，无法解析时返回 None
+    try:
+        started = float(header.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, now - started)
+
+class MemoryStore:
+    def __init__(self, max_keys=100000, expire=86400):
+        self.max_keys = max_keys
+        self.expire = expire
+        self.lock = threading.Lock()
+        # 键 -> (令牌数, 更新时间)
+        self.buckets = {}
+
+    def take(self, buckets, now=None):
+        # buckets 为 [(键, Limit), ...]，全部放行时才扣除，返回各桶中最长的等待秒数
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            results = [take_token(self.buckets.get(key), limit, now) for key, limit in buckets]
+            wait = max((wait for _, wait in results), default=0.0)
+            if wait == 0:
+                for (key, _), (tokens, _) in zip(buckets, results):
+                    self.buckets[key] = (tokens, now)
+                if len(self.buckets) > self.max_keys:
+                    self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        # 先丢弃长时间没有请求的桶，仍然超出时按创建顺序丢弃最早的
+        self.buckets = {key: state for key, state in self.buckets.items() if now - state[1] < self.expire}
+        for key in list(self.buckets)[:len(self.buckets) - self.max_keys * 9 // 10]:
+            del self.buckets[key]
+
+class SQLiteStore:
+    def __init__(self, path, expire=86400, timeout=1.0):
+        self.path = path
+        self.expire = expire
+        self.timeout = timeout
+        # 每个线程一个连接，在第一次使用时打开，预派生的 worker 不会共享父进程的连接
+        self.local = threading.local()
+        self.takes = 0
+
+    def _connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket ('
+                         'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID')
+            self.local.conn = conn
+        return conn
+
+    def take(self, buckets, now=None):
+        # 与 MemoryStore.take 相同；不同进程的单调时钟不可比较，这里使用系统时间
+        now = time.time() if now is None else now
+        try:
+            conn = self._connection()
+            # BEGIN IMMEDIATE 立即取得写锁，读取和更新之间不会被其他进程插入
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                results = [take_token(conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?',
+                                                   (key,)).fetchone(), limit, now) for key, limit in buckets]
+                wait = max((wait for _, wait in results), default=0.0)
+                if wait == 0:
+                    conn.executemany('INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                                     [(key, tokens, now) for (key, _), (tokens, _) in zip(buckets, results)])
+                self.takes += 1
+                if self.takes % 1000 == 0:
+                    conn.execute('DELETE FROM bucket WHERE updated < ?', (now - self.expire,))
+                conn.execute('COMMIT')
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                raise
+        except sqlite3.OperationalError:
+            # 限流库被锁或不可用时放行，不因限流本身让正常请求失败
+            return 0.0
+        return wait
+
+class RateLimiter:
+    def __init__(self, store, limits):
+        self.store = store
+        # 分组 -> {维度: Limit}，维度为 ip 或 user
+        self.limits = {scope: {kind: parse_limit(spec) for kind, spec in rules.items()}
+                       for scope, rules in limits.items()}
+
+    def hit(self, scope, identities):
+        # identities 为 {维度: 标识}，标识为 None 的维度不计数；返回各维度中最长的等待秒数
+        buckets = [(f'{scope}:{kind}:{identities[kind]}', limit)
+                   for kind, limit in self.limits.get(scope, {}).items() if identities.get(kind) is not None]
+        return self.store.take(buckets) if buckets else 0.0
@@ -0,0 +1,239 @@
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+# 批量生成测试数据：按指定数量写入用户、文章和评论，在本地复现生产规模的数据量。
+# 绕过 ORM，用驱动的 executemany 按批插入，每批一个事务；摘要、渲染后的正文、计数器和搜索索引
+# 和热度分数在生成时一并写入，结果与通过页面发表的数据一致。
+# 发帖和评论集中在少数活跃用户，评论集中在少数热门文章（帕累托分布），与真实社区相近。
+#
+#   python seed_data.py --database instance/bench.db --users 100000 --posts 1000000 --comments 10000000
+
+SENTENCES = [
+    '已经起床，可身体还未苏醒。', '其实如果早起出门跑个步是很好的一个选择。', '在这样的清晨，在广州还有些热。',
+    '崭新的道路，稀少的行人，几乎没有车辆。', '我还没有属于自己的小车。', '老家虽是在村里，但现在四通的都是宽宽的水泥路。',
+    '大城市道路虽宽广，可是公共交通更适合我这随性的人。', '这共享单车不就派上用场了。', '我有一辆美利达公爵山地车。',
+    '这两年听歌很少，倒是很喜欢听电台。', '或许去城市中心，或许去城市边缘，很适合我。', '周末写了一篇关于 SQLite 全文搜索的笔记。',
+    '今天的晚霞很好看，拍了几张照片。', '读完了一本关于城市规划的书。', '下班路上买了一杯奶茶，排队的人比平时多。',
+    '楼下新开了一家面馆，牛肉面的汤头很浓。', '想把阳台改成一个小花园，先从几盆薄荷开始。', '雨下了一整天，适合在家整理照片。',
+    '最近在学做饭，番茄炒蛋总算不会糊了。', '早上的地铁总是很挤，换了早一班车就好多了。', 'Python and Flask make a small blog easy.',
+    '和老朋友约了周末去爬白云山。', '把旧电脑装成了家里的小服务器。', '这本小说的结尾出乎意料。',
+]
+COMMENTS = [
+    '写得真好！', '同感，我也是这样想的。', '照片在哪里可以看到？', '学到了，谢谢分享。', '哈哈，太真实了。',
+    '下次一起去吧。', '这个地方我去过，确实不错。', '请问用的是什么相机？', '期待更新！', '支持一下。',
+    '我家附近也有类似的店。', '最后一段很有感触。', 'Nice post, thanks!', '第一次看到这个说法，长见识了。',
+]
+# 常用汉字，组成随机词语，让搜索索引里既有高频词也有大量低频词
+COMMON_CHARS = ('的一是在不了有和人这中大为上个我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说'
+                '产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使'
+                '点从业本去把性好应开它合还因由其些然前外天四日那社义事平形相全表间样与关各重新线内数正心反你明看'
+                '原又么利比或但质气第向道命此变条只没结解问意建月公无系很情者最立代想已通并提直题程展五果料象员位'
+                '入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强'
+                '放决西被干做必战先回则任取据处理世车')
+THEMES = ['light', 'light', 'light', 'dark', 'system']
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+def random_word(rng):
+    return ''.join(rng.choice(COMMON_CHARS) for _ in range(rng.randint(2, 4)))
+
+def paragraph(rng, sentences):
+    return ''.join(rng.choice(SENTENCES) + (random_word(rng) if rng.random() < 0.3 else '') for _ in range(sentences))
+
+def post_text(rng):
+    title = (rng.choice(SENTENCES).rstrip('。') + random_word(rng))[:100]
+    content = '\n\n'.join(paragraph(rng, rng.randint(2, 6)) for _ in range(rng.randint(2, 8)))
+    return title, content
+
+def comment_text(rng):
+    parts = [rng.choice(COMMENTS)]
+    if rng.random() < 0.4:
+        parts.append(paragraph(rng, rng.randint(1, 2)))
+    return ''.join(parts)
+
+def skewed_weights(rng, count, alpha):
+    # 帕累托分布：alpha 越小越集中
+    return [rng.paretovariate(alpha) for _ in range(count)]
+
+def comment_counts(rng, posts, comments, cap):
+    comments = min(comments, cap * posts)
+    weights = skewed_weights(rng, posts, 1.5)
+    scale = comments / sum(weights)
+    counts = [min(cap, int(weight * scale + rng.random())) for weight in weights]
+    # 超出上限被截掉的评论随机补给其他文章，总数与要求一致
+    deficit = comments - sum(counts)
+    while deficit > 0 and posts:
+        i = rng.randrange(posts)
+        if counts[i] < cap:
+            counts[i] += 1
+            deficit -= 1
+    return counts
+
+def max_id(conn, table):
+    return conn.execute(f'SELECT coalesce(max(id), 0) FROM "{table}"').fetchone()[0]
+
+class Batcher:
+    # 累计到 batch_size 行时执行一次 executemany 并提交
+    def __init__(self, conn, batch_size, statements):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.statements = statements
+        self.rows = {name: [] for name in statements}
+        self.count = 0
+
+    def add(self, name, row):
+        self.rows[name].append(row)
+        if len(self.rows[name]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for name, rows in self.rows.items():
+            if rows:
+                self.conn.executemany(self.statements[name], rows)
+                if name == 'main':
+                    self.count += len(rows)
+                rows.clear()
+        self.conn.commit()
+
+def report(label, count, started):
+    elapsed = time.perf_counter() - started
+    print(f'{label}：{count} 行，用时 {elapsed:.1f} 秒（{count / max(elapsed, 1e-9):.0f} 行/秒）', flush=True)
+
+def seed(path, users, posts, comments, password_hash, seed=1, batch_size=10000, days=1095,
+         max_comments_per_post=1000, search_index=True):
+    # 在已有数据之后追加，返回新增的 (用户数, 文章数, 评论数)
+    import fulltext
+    import ranking
+    import rendering
+    from app import make_excerpt
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    # 生成的数据可以重新生成，写入时不需要每个事务都落盘
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -200000')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    user_base, post_base, comment_base = max_id(conn, 'user'), max_id(conn, 'post'), max_id(conn, 'comment')
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    step = timedelta(days=days) / max(posts, 1)
+
+    started = time.perf_counter()
+    batcher = Batcher(conn, batch_size, {'main': (
+        'INSERT INTO "user" (id, username, password, profile_picture, bio, theme_preference, blur_effect_enabled, '
+        'post_count, comment_count, received_comment_count) VALUES (?, ?, ?, ?, ?, ?, ?, 0, 0, 0)')})
+    for user_id in range(user_base + 1, user_base + users + 1):
+        bio = paragraph(rng, 1) if rng.random() < 0.3 else ''
+        batcher.add('main', (user_id, f'seed{user_id}', password_hash, 'default.jpg', bio,
+                             rng.choice(THEMES), rng.random() < 0.8))
+    batcher.flush()
+    report('用户', batcher.count, started)
+
+    # 活跃度：每次抽取作者都按累积权重二分查找
+    user_ids = range(user_base + 1, user_base + users + 1)
+    author_weights = list(itertools.accumulate(skewed_weights(rng, users, 1.16)))
+    post_counts, user_comment_counts, received_counts = {}, {}, {}
+    counts = comment_counts(rng, posts, comments, max_comments_per_post)
+
+    started = time.perf_counter()
+    statements = {'main': (
+        'INSERT INTO post (id, title, content, date_posted, user_id, comment_count, excerpt, content_html, '
+        'renderer_version, hot_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')}
+    if search_index:
+        statements['fts'] = 'INSERT INTO post_fts (rowid, title, content) VALUES (?, ?, ?)'
+    batcher = Batcher(conn, batch_size, statements)
+    for i in range(posts):
+        post_id = post_base + i + 1
+        title, content = post_text(rng)
+        author = rng.choices(user_ids, cum_weights=author_weights)[0]
+        post_counts[author] = post_counts.get(author, 0) + 1
+        received_counts[author] = received_counts.get(author, 0) + counts[i]
+        posted = start + step * i
+        batcher.add('main', (post_id, title, content, posted.strftime(DATE_FORMAT), author, counts[i],
+                             make_excerpt(content), str(rendering.render(content)), rendering.RENDERER_VERSION,
+                             ranking.activity(posted)))
+        if search_index:
+            batcher.add('fts', (post_id, fulltext.index_text(title), fulltext.index_text(content)))
+    batcher.flush()
+    report('文章', batcher.count, started)
+
+    # 评论按文章顺序生成，时间在文章发表之后，越靠近发表时间越密集；有评论的文章最后统一改写热度
+    started = time.perf_counter()
+    hot_scores = []
+    statements = {'main': 'INSERT INTO comment (id, content, date_posted, user_id, post_id, is_pinned) '
+                          'VALUES (?, ?, ?, ?, ?, ?)'}
+    if search_index:
+        statements['fts'] = 'INSERT INTO comment_fts (rowid, content) VALUES (?, ?)'
+    batcher = Batcher(conn, batch_size, statements)
+    comment_id = comment_base
+    for i, count in enumerate(counts):
+        posted = start + step * i
+        span = (now - posted).total_seconds()
+        activities = [ranking.activity(posted)]
+        for author in rng.choices(user_ids, cum_weights=author_weights, k=count):
+            comment_id += 1
+            user_comment_counts[author] = user_comment_counts.get(author, 0) + 1
+            content = comment_text(rng)
+            date = posted + timedelta(seconds=min(span, rng.expovariate(1 / 86400)))
+            activities.append(ranking.activity(date))
+            batcher.add('main', (comment_id, content, date.strftime(DATE_FORMAT), author, post_base + i + 1,
+                                 rng.random() < 0.001))
+            if search_index:
+                batcher.add('fts', (comment_id, fulltext.index_text(content)))
+        if count:
+            hot_scores.append((ranking.log_sum(activities), post_base + i + 1))
+    batcher.flush()
+    report('评论', batcher.count, started)
+
+    conn.executemany('UPDATE "user" SET post_count = post_count + ?, comment_count = comment_count + ?, '
+                     'received_comment_count = received_comment_count + ? WHERE id = ?',
+                     [(post_counts.get(user_id, 0), user_comment_counts.get(user_id, 0),
+                       received_counts.get(user_id, 0), user_id)
+                      for user_id in post_counts.keys() | user_comment_counts.keys()])
+    conn.executemany('UPDATE post SET hot_score = ? WHERE id = ?', hot_scores)
+    conn.commit()
+    conn.close()
+    return users, posts, comment_id - comment_base
+
+def main():
+    parser = argparse.ArgumentParser(description='批量生成用户、文章和评论')
+    parser.add_argument('--database', default=os.path.join('instance', 'bench.db'))
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=100000)
+    parser.add_argument('--max-comments-per-post', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=1095, help='文章发表时间的跨度（天）')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=1, help='随机数种子，相同参数生成相同的数据')
+    parser.add_argument('--password', default='password123', help='所有生成用户的登录密码')
+    parser.add_argument('--no-search-index', action='store_true', help='不写入搜索索引，之后可用 flask rebuild-search-index 重建')
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.database)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    from app import create_app, bootstrap
+
+    # 在请求线程内计算哈希，不启动进程池；所有生成用户共用一个哈希
+    app = create_app({'PASSWORD_HASH_WORKERS': 0})
+    with app.app_context():
+        bootstrap()
+        password_hash = app.extensions['password_hasher'].hash(args.password)
+
+    started = time.perf_counter()
+    users, posts, comments = seed(path, args.users, args.posts, args.comments, password_hash, seed=args.seed,
+                                  batch_size=args.batch_size, days=args.days,
+                                  max_comments_per_post=args.max_comments_per_post,
+                                  search_index=not args.no_search_index)
+    # '*' 标签追加到页面缓存的失效日志（instance/page_cache.log），运行中的 worker 下次处理请求时重放日志，清空各自的页面缓存
+    app.extensions['page_cache'].invalidate({'*'})
+    print(f'共写入 {users} 个用户、{posts} 篇文章、{comments} 条评论，用时 {time.perf_counter() - started:.1f} 秒，'
+          f'数据库 {os.path.getsize(path) / 1024 / 1024:.0f} MB')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -247,4 +247,222 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     });
-});
\ No newline at end of file
+
+    // 社区文章无限滚动：滚动到分页导航时通过 /api/posts 加载更早的文章
+    const feedList = document.querySelector('.posts-list[data-feed-url]');
+    const pagination = document.querySelector('.pagination[data-older-cursor]');
+
+    if (feedList && pagination && 'IntersectionObserver' in window) {
+        let loading = false;
+
+        const appendPost = function(post) {
+            const article = document.createElement('article');
+            article.className = 'post-card';
+
+            const title = document.createElement('h3');
+            title.className = 'post-title';
+            const titleLink = document.createElement('a');
+            titleLink.href = post.url;
+            titleLink.textContent = post.title;
+            title.appendChild(titleLink);
+
+            const meta = document.createElement('div');
+            meta.className = 'post-meta';
+            const authorInfo = document.createElement('div');
+            authorInfo.className = 'author-info';
+            const authorLink = document.createElement('a');
+            authorLink.href = post.author_url;
+            const avatar = document.createElement('img');
+            avatar.className = 'author-avatar';
+            avatar.src = post.author.avatar_url;
+            avatar.alt = post.author.username;
+            avatar.width = 30;
+            avatar.height = 30;
+            avatar.loading = 'lazy';
+            authorLink.appendChild(avatar);
+            const authorName = document.createElement('span');
+            authorName.className = 'author-name';
+            authorName.textContent = post.author.username;
+            authorLink.appendChild(authorName);
+            authorInfo.appendChild(authorLink);
+            const date = document.createElement('span');
+            date.className = 'post-date';
+            date.textContent = post.date_posted.slice(0, 10);
+            const comments = document.createElement('span');
+            comments.className = 'comments-count';
+            comments.textContent = post.comment_count + ' 条评论';
+            meta.append(authorInfo, date, comments);
+
+            const excerpt = document.createElement('div');
+            excerpt.className = 'post-excerpt';
+            excerpt.textContent = post.excerpt;
+
+            const readMore = document.createElement('a');
+            readMore.className = 'read-more';
+            readMore.href = post.url;
+            readMore.textContent = '阅读全文';
+
+            article.append(title, meta, excerpt, readMore);
+            feedList.appendChild(article);
+        };
+
+        const observer = new IntersectionObserver(function(entries) {
+            if (!entries[0].isIntersecting || loading) return;
+            const cursor = pagination.dataset.olderCursor;
+            if (!cursor) return;
+
+            loading = true;
+            // 文章流地址可能带有 sort 参数，游标追加到已有的查询参数之后
+            const feedUrl = new URL(feedList.dataset.feedUrl, window.location.href);
+            feedUrl.searchParams.set('before', cursor);
+            fetch(feedUrl)
+                .then(response => response.json())
+                .then(data => {
+                    data.posts.forEach(appendPost);
+                    if (data.older_cursor) {
+                        pagination.dataset.olderCursor = data.older_cursor;
+                        const olderLink = pagination.querySelector('.pagination-older');
+                        if (olderLink) {
+                            const olderUrl = new URL(olderLink.href);
+                            olderUrl.searchParams.set('before', data.older_cursor);
+                            olderLink.href = olderUrl.toString();
+                        }
+                    } else {
+                        observer.disconnect();
+                        pagination.remove();
+                    }
+                })
+                .catch(error => {
+                    console.error('Error loading more posts:', error);
+                })
+                .finally(() => {
+                    loading = false;
+                });
+        });
+        observer.observe(pagination);
+    }
+
+    // 评论实时推送：通过 EventSource 接收新增、删除和置顶事件，发表评论不再刷新整页
+    const commentsSection = document.querySelector('.comments-section[data-events-url]');
+
+    if (commentsSection && 'EventSource' in window) {
+        const commentList = commentsSection.querySelector('.comment-list');
+        const total = commentsSection.querySelector('.comments-total');
+
+        const findComment = function(id) {
+            return commentList.querySelector('.comment-item[data-comment-id="' + id + '"]');
+        };
+
+        const addToTotal = function(delta) {
+            total.textContent = Math.max(0, parseInt(total.textContent, 10) + delta);
+        };
+
+        const setPinned = function(item, isPinned) {
+            item.classList.toggle('pinned', isPinned);
+            const header = item.querySelector('.comment-header');
+            let badge = header.querySelector('.pinned-badge');
+            if (isPinned && !badge) {
+                badge = document.createElement('span');
+                badge.className = 'pinned-badge';
+                badge.textContent = '置顶';
+                header.appendChild(badge);
+            } else if (!isPinned && badge) {
+                badge.remove();
+            }
+        };
+
+        const insertComment = function(comment) {
+            if (findComment(comment.id)) return;
+
+            const item = document.createElement('div');
+            item.className = 'comment-item';
+            item.dataset.commentId = comment.id;
+
+            const header = document.createElement('div');
+            header.className = 'comment-header';
+            const author = document.createElement('span');
+            author.className = 'comment-author';
+            const authorLink = document.createElement('a');
+            authorLink.href = comment.author_url;
+            const avatar = document.createElement('img');
+            avatar.className = 'comment-avatar';
+            avatar.src = comment.author.avatar_url;
+            avatar.alt = comment.author.username;
+            avatar.width = 24;
+            avatar.height = 24;
+            authorLink.append(avatar, comment.author.username);
+            author.appendChild(authorLink);
+            const date = document.createElement('span');
+            date.className = 'comment-date';
+            date.textContent = comment.date_posted.slice(0, 16).replace('T', ' ');
+            header.append(author, date);
+
+            const content = document.createElement('div');
+            content.className = 'comment-content';
+            content.textContent = comment.content;
+
+            item.append(header, content);
+            setPinned(item, comment.is_pinned);
+
+            // 评论按置顶、时间倒序排列：新评论放在置顶评论之后
+            const firstUnpinned = commentList.querySelector('.comment-item:not(.pinned)');
+            commentList.insertBefore(item, comment.is_pinned ? commentList.firstChild : firstUnpinned);
+            addToTotal(1);
+        };
+
+        const events = new EventSource(commentsSection.dataset.eventsUrl);
+        events.addEventListener('created', function(e) {
+            insertComment(JSON.parse(e.data));
+        });
+        events.addEventListener('deleted', function(e) {
+            const item = findComment(JSON.parse(e.data).id);
+            if (item) {
+                item.remove();
+                addToTotal(-1);
+            }
+        });
+        events.addEventListener('pinned', function(e) {
+            const data = JSON.parse(e.data);
+            const item = findComment(data.id);
+            if (item) {
+                setPinned(item, data.is_pinned);
+                const pinButton = item.querySelector('.pin-comment-btn');
+                if (pinButton) pinButton.textContent = data.is_pinned ? '取消置顶' : '置顶';
+            }
+        });
+
+        const commentForm = commentsSection.querySelector('.comment-form form');
+        if (commentForm && window.fetch) {
+            commentForm.addEventListener('submit', function(e) {
+                if (e.defaultPrevented) return;
+                e.preventDefault();
+                const formData = new FormData(commentForm);
+                fetch(commentsSection.dataset.commentsUrl, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        csrf_token: formData.get('csrf_token'),
+                        content: formData.get('content')
+                    })
+                })
+                .then(response => response.json().then(data => ({ ok: response.ok, data: data })))
+                .then(result => {
+                    if (result.ok) {
+                        insertComment(result.data.comment);
+                        commentForm.reset();
+                    } else {
+                        const messages = Object.values(result.data.errors || {}).flat();
+                        alert(messages.join('\n') || '评论发表失败');
+                    }
+                })
+                .catch(error => {
+                    // 接口不可用时退回普通表单提交
+                    console.error('Error posting comment:', error);
+                    commentForm.submit();
+                });
+            });
+        }
+    }
+});
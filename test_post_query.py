@@ -1,4 +1,6 @@
-from app import app, db, Post
+from app import create_app, db, Post
+
+app = create_app()
 
 with app.app_context():
     # 直接测试Post.query.all()
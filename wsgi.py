@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# WSGI 入口，供多进程服务器使用，例如：gunicorn -w 4 wsgi:app
+# 部署时先执行一次 flask --app app bootstrap 初始化数据库，worker 启动时不写数据库
+from app import create_app
+
+app = create_app()